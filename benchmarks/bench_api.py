@@ -0,0 +1,126 @@
+"""Load test the headless API, with several workers on the fake LLM backend.
+
+The server is started in a subprocess with its stores in a temporary folder,
+then concurrent clients play whole sessions through the HTTP API.
+Run it with ``--workers 1`` and more to compare the scaling across cores.
+
+Usage:
+    python benchmarks/bench_api.py [--workers 4] [--sessions 40] [--concurrency 8]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+from convo_craft.api.client import ApiClientError, ConvoCraftClient
+
+
+class TimedClient(ConvoCraftClient):
+    """A client recording the latency of each request."""
+
+    def __init__(self, base_url: str) -> None:
+        super().__init__(base_url)
+        self.latencies: list[float] = []
+
+    def request(self, method: str, path: str, data: dict | None = None) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return super().request(method, path, data)
+        finally:
+            self.latencies.append(time.perf_counter() - t0)
+
+
+def get_free_port() -> int:
+    """Get a free local port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(base_url: str, timeout_s: float = 30) -> None:
+    """Wait until the server answers."""
+    client = ConvoCraftClient(base_url, timeout=1)
+    start = time.perf_counter()
+    while True:
+        try:
+            client.request("GET", "/health")
+            return
+        except (OSError, ApiClientError):
+            if time.perf_counter() - start > timeout_s:
+                raise
+            time.sleep(0.1)
+
+
+def run_session(base_url: str, index: int) -> tuple[list[float], int]:
+    """Play a whole session, returning the request latencies and the guesses."""
+    client = TimedClient(base_url)
+    client.create_session()
+    topics = client.set_api_key("fake").topics
+    client.choose_topic(topics[index % len(topics)])
+    num_guesses = client.play_conversation()
+    client.delete_session()
+    return client.latencies, num_guesses
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    port = get_free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp_fol:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "convo_craft.api.server",
+                "--fake-llm",
+                f"--port={port}",
+                f"--workers={args.workers}",
+                f"--store-fol={Path(tmp_fol) / 'lessons'}",
+                f"--sessions-fp={Path(tmp_fol) / 'sessions.sqlite'}",
+                f"--llm-cache-fp={Path(tmp_fol) / 'llm_cache.sqlite'}",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_server(base_url)
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                results = list(
+                    executor.map(
+                        lambda i: run_session(base_url, i), range(args.sessions)
+                    )
+                )
+            elapsed = time.perf_counter() - t0
+        finally:
+            server.terminate()
+            server.wait()
+    latencies_ms = sorted(t * 1e3 for lats, _ in results for t in lats)
+    num_guesses = sum(guesses for _, guesses in results)
+    p95 = latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.95))]
+    print(f"workers: {args.workers}, concurrency: {args.concurrency}")
+    print(
+        f"requests: {len(latencies_ms)}, median {statistics.median(latencies_ms):.1f}"
+        f" ms, p95 {p95:.1f} ms, max {latencies_ms[-1]:.1f} ms"
+    )
+    print(
+        f"throughput: {len(latencies_ms) / elapsed:.1f} requests/s,"
+        f" {num_guesses / elapsed:.1f} guesses/s,"
+        f" {args.sessions / elapsed:.2f} sessions/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Time the app flows end to end, against the fake LLM backend.
+
+Each session enters the key, picks a topic and guesses through
+the whole conversation, like a user of the web app.
+The fake calls sleep for a latency sampled from a log-normal distribution,
+so the numbers include the overlap of the background LLM calls
+with the app overhead, without any network or cost.
+
+Usage:
+    python benchmarks/bench_app.py [--sessions 20] [--latency-ms 300] [--sigma 0.5]
+"""
+
+import argparse
+from pathlib import Path
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from convo_craft.app.app import App
+from convo_craft.app.simulate import play_conversation
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.client_registry import ChatModelRegistry
+from convo_craft.llm.fake_llm import FAKE_MODEL, FakeLatency, FakeLLM
+from convo_craft.llm.llm_cache import get_llm_cache
+from convo_craft.llm.llm_metrics import get_llm_metrics
+
+
+def use_empty_llm_cache(store: LessonStore) -> None:
+    """Make the next LLM components use an empty cache, in the store folder."""
+    CONVO_CRAFT_PATHS.llm_cache_fp = store.store_fol / "llm_cache.sqlite"
+    get_llm_cache.cache_clear()
+
+
+def run_session(store: LessonStore, config: ChatOpenAIConfig) -> dict[str, float]:
+    """Run a full session, timing each phase."""
+    timings = {}
+    t0 = time.perf_counter()
+    app = App(lesson_store=store, chat_openai_config=config)
+    app.set_openai_api_key("fake")
+    t1 = time.perf_counter()
+    timings["key_entry_ms"] = (t1 - t0) * 1e3
+    app.set_topic_by_value(app.topic.topics[0])
+    t2 = time.perf_counter()
+    timings["topic_choice_ms"] = (t2 - t1) * 1e3
+    num_guesses = play_conversation(app)
+    t3 = time.perf_counter()
+    timings["conversation_ms"] = (t3 - t2) * 1e3
+    timings["guess_ms"] = (t3 - t2) * 1e3 / max(num_guesses, 1)
+    return timings
+
+
+def bench_flows(sessions: int, config: ChatOpenAIConfig, store_fol: Path) -> None:
+    """Time the sessions, each one on a fresh lesson store to force generation.
+
+    Each session also gets an empty LLM cache, as the sessions pick the same topic,
+    and would otherwise be served the lesson calls of the first one.
+    """
+    results: dict[str, list[float]] = {}
+    for i in range(sessions):
+        store = LessonStore(store_fol / f"flow_{i}")
+        use_empty_llm_cache(store)
+        for name, value in run_session(store, config).items():
+            results.setdefault(name, []).append(value)
+    for name, values in results.items():
+        values.sort()
+        p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+        print(
+            f"{name}: median {statistics.median(values):.2f}"
+            f" p95 {p95:.2f} max {values[-1]:.2f}"
+        )
+
+
+def bench_memory(sessions: int, config: ChatOpenAIConfig, store_fol: Path) -> None:
+    """Measure the memory held by each live session."""
+    store = LessonStore(store_fol / "memory")
+    use_empty_llm_cache(store)
+    # warm up the shared state: models, topic pools, lazy imports
+    run_session(store, config)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    apps = []
+    for _ in range(sessions):
+        app = App(lesson_store=store, chat_openai_config=config)
+        app.set_openai_api_key("fake")
+        app.set_topic_by_value(app.topic.topics[0])
+        apps.append(app)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_session_kb = (current - before) / len(apps) / 1024
+    print(f"memory: {per_session_kb:.1f} KiB/session, peak {peak / 1024**2:.1f} MiB")
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--per-item-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    latency = FakeLatency(
+        median_s=args.latency_ms / 1e3,
+        sigma=args.sigma,
+        per_item_s=args.per_item_ms / 1e3,
+    )
+    ChatModelRegistry().set_fake_llm(FakeLLM(latency=latency, seed=args.seed))
+    config = ChatOpenAIConfig(model=FAKE_MODEL)
+    with tempfile.TemporaryDirectory() as tmp_fol:
+        bench_flows(args.sessions, config, Path(tmp_fol))
+        bench_memory(args.sessions, config, Path(tmp_fol))
+    for row in get_llm_metrics().get_summary():
+        print(f"llm: {row}")
+
+
+if __name__ == "__main__":
+    main()
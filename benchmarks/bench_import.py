@@ -0,0 +1,90 @@
+"""Measure the cold import time of the modules, and fail if over budget.
+
+Each module is imported in a fresh interpreter with ``-X importtime``,
+several times, and the median cumulative import time is compared
+with the budget of the module.
+The script exits with an error if a module is over budget,
+or if importing it loads the LLM provider packages,
+which must only be loaded when the first model is built.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 5] [--budget-scale 1.0]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+MODULE_BUDGETS_MS = {
+    "convo_craft.config.convo_craft_config": 150,
+    "convo_craft.lesson.lesson_store": 600,
+    "convo_craft.app.app": 700,
+    "convo_craft.api.server": 800,
+}
+"""The maximum median cumulative import time of each module, in milliseconds."""
+LAZY_MODULES = ["langchain_openai", "langchain_ollama", "openai"]
+"""The packages that must not be loaded by importing the modules."""
+
+
+def measure_import(module: str) -> tuple[float, list[str]]:
+    """Import the module in a fresh interpreter.
+
+    Returns:
+        tuple[float, list[str]]: The cumulative import time in milliseconds,
+            and the lazy packages that were loaded.
+    """
+    code = (
+        f"import sys, {module}; "
+        f"print(*[m for m in {LAZY_MODULES!r} if m in sys.modules])"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # the lines are "import time: self | cumulative | name"
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e3, proc.stdout.split()
+    raise ValueError(f"No import time reported for {module}")
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget-scale",
+        type=float,
+        default=1.0,
+        help="Multiply the budgets, for slower machines",
+    )
+    args = parser.parse_args()
+    failed = False
+    for module, budget_ms in MODULE_BUDGETS_MS.items():
+        budget_ms *= args.budget_scale
+        times_ms = []
+        for _ in range(args.runs):
+            time_ms, loaded = measure_import(module)
+            times_ms.append(time_ms)
+        median_ms = statistics.median(times_ms)
+        status = "ok"
+        if median_ms > budget_ms:
+            status = "OVER BUDGET"
+            failed = True
+        if loaded:
+            status = f"LOADS {' '.join(loaded)}"
+            failed = True
+        print(
+            f"{module}: median {median_ms:.0f} ms,"
+            f" budget {budget_ms:.0f} ms, {status}"
+        )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
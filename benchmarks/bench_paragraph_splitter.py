@@ -0,0 +1,118 @@
+"""Compare the local paragraph splitter with the LLM one.
+
+Reports the split quality and the latency of both paths.
+The LLM path runs only if OPENAI_API_KEY is set, and bypasses the cache.
+
+Usage:
+    python benchmarks/bench_paragraph_splitter.py [--repeat 1000] [--llm-samples 5]
+"""
+
+import argparse
+import os
+import time
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.conversation_generator import CONVERSATION_SAMPLE
+from convo_craft.llm.paragraph_splitter import (
+    ParagraphSplitter,
+    portions_match_paragraph,
+)
+from convo_craft.text.split_paragraph import LocalParagraphSplitter
+
+LONG_PARAGRAPHS = [
+    "Eu acordei cedo hoje porque tinha uma reunião importante no escritório,"
+    " mas o ônibus atrasou e eu cheguei tarde, então o meu chefe ficou"
+    " um pouco irritado comigo.",
+    "Quando eu era criança, eu passava as férias na casa dos meus avós no interior,"
+    " onde a gente tomava banho de rio e comia frutas direto do pé.",
+    "Você já pensou em viajar para o Nordeste? As praias são lindas,"
+    " a comida é deliciosa e as pessoas são muito acolhedoras.",
+]
+CORPUS = CONVERSATION_SAMPLE.splitlines() + LONG_PARAGRAPHS
+
+
+def split_quality(corpus: list[str], splits: list[list[str]]) -> dict[str, float]:
+    """Compute the quality metrics of the splits."""
+    portions = [portion for split in splits for portion in split]
+    exact = sum("".join(s) == p for p, s in zip(corpus, splits))
+    matching = sum(portions_match_paragraph(p, s) for p, s in zip(corpus, splits))
+    single = sum(len(portion.split()) == 1 for portion in portions)
+    return {
+        "exact_concat": exact / len(corpus),
+        "matching_concat": matching / len(corpus),
+        "single_word_portions": single / len(portions),
+        "words_per_portion": sum(len(p.split()) for p in portions) / len(portions),
+    }
+
+
+def get_boundaries(split: list[str]) -> set[int]:
+    """Get the boundaries of a split, as word indexes."""
+    boundaries = set()
+    num_words = 0
+    for portion in split[:-1]:
+        num_words += len(portion.split())
+        boundaries.add(num_words)
+    return boundaries
+
+
+def boundary_f1(splits: list[list[str]], reference: list[list[str]]) -> float:
+    """Compute the F1 score of the split boundaries against the reference."""
+    tp = fp = fn = 0
+    for split, ref in zip(splits, reference):
+        b_split = get_boundaries(split)
+        b_ref = get_boundaries(ref)
+        tp += len(b_split & b_ref)
+        fp += len(b_split - b_ref)
+        fn += len(b_ref - b_split)
+    if tp == 0:
+        return 0.0
+    return 2 * tp / (2 * tp + fp + fn)
+
+
+def bench_local(repeat: int) -> list[list[str]]:
+    """Benchmark the local splitter."""
+    splitter = LocalParagraphSplitter.for_language("Brazilian Portuguese")
+    assert splitter is not None
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        splits = [splitter.invoke(paragraph) for paragraph in CORPUS]
+    elapsed = time.perf_counter() - t0
+    per_para_us = elapsed / (repeat * len(CORPUS)) * 1e6
+    print(f"local: {per_para_us:.1f} us/paragraph")
+    print(f"local: {split_quality(CORPUS, splits)}")
+    return splits
+
+
+def bench_llm(samples: int) -> list[list[str]]:
+    """Benchmark the LLM splitter, without the cache."""
+    splitter = ParagraphSplitter(chat_openai_config=ChatOpenAIConfig(), use_cache=False)
+    corpus = CORPUS[:samples]
+    splits = []
+    latencies = []
+    for paragraph in corpus:
+        t0 = time.perf_counter()
+        splits.append(splitter.invoke(paragraph).portions)
+        latencies.append(time.perf_counter() - t0)
+    latencies.sort()
+    print(f"llm: median {latencies[len(latencies) // 2] * 1e3:.0f} ms/paragraph")
+    print(f"llm: {split_quality(corpus, splits)}")
+    return splits
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("--llm-samples", type=int, default=len(CORPUS))
+    args = parser.parse_args()
+    local_splits = bench_local(args.repeat)
+    if "OPENAI_API_KEY" not in os.environ:
+        print("llm: skipped, OPENAI_API_KEY is not set")
+        return
+    llm_splits = bench_llm(args.llm_samples)
+    f1 = boundary_f1(local_splits[: len(llm_splits)], llm_splits)
+    print(f"local vs llm boundary F1: {f1:.2f}")
+
+
+if __name__ == "__main__":
+    main()
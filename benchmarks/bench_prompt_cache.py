@@ -0,0 +1,115 @@
+"""Measure the prompt rendering time and the cached-token ratio of the components.
+
+The conversation prompt is rendered with the compiled prompt,
+and with the previous template rendered in full on each call, kept here as reference.
+Then lessons are built on many topics against the fake LLM backend,
+which reports the prompt prefixes it has already seen as cached,
+and the cached-token ratio of each component is printed.
+
+Usage:
+    python benchmarks/bench_prompt_cache.py [--renders 20000] [--lessons 20]
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+from convo_craft.lesson.lesson_builder import LessonBuilder
+from convo_craft.llm.client_registry import ChatModelRegistry
+from convo_craft.llm.fake_llm import FAKE_MODEL, FakeLLM
+from convo_craft.llm.llm_metrics import get_llm_metrics
+
+LANGUAGE = "Brazilian Portuguese"
+LEVEL = "intermediate"
+
+REFERENCE_TEMPLATE = """Write a conversation in {language} between two persons, \
+that should be used to teach the user the language.
+The conversation should be about the following topic: "{topic}".
+Assume that the user has an {understanding_level} level of understanding of the language.
+The conversation should last about {num_messages} messages in total, \
+with each message being about {num_sentences} sentences long.
+"""
+"""The previous conversation template, with the topic ahead of the static text."""
+REFERENCE_DIFFICULTY_TEMPLATE = """This is an example of a conversation \
+in {language} between two persons, about the topic "{topic_sample}", \
+of the appropriate difficulty level for the user, which is {understanding_level}:
+{conversation_sample}
+"""
+
+
+def time_renders(num_renders: int) -> None:
+    """Time the rendering of the conversation prompt, previous and compiled."""
+    builder = LessonBuilder(
+        ChatOpenAIConfig(model=FAKE_MODEL, api_key="fake"), LANGUAGE, LEVEL
+    )
+    cg = builder.cg
+    reference = ChatPromptTemplate(
+        [
+            HumanMessagePromptTemplate.from_template(REFERENCE_TEMPLATE),
+            HumanMessagePromptTemplate.from_template(REFERENCE_DIFFICULTY_TEMPLATE),
+        ]
+    )
+    reference_input = {
+        "language": cg.language,
+        "understanding_level": cg.understanding_level,
+        "num_messages": cg.num_messages,
+        "num_sentences": cg.num_sentences,
+        "topic_sample": cg.topic_sample,
+        "conversation_sample": cg.conversation_sample,
+    }
+    t0 = time.perf_counter()
+    for i in range(num_renders):
+        reference.invoke({**reference_input, "topic": f"Topic {i}"})
+    reference_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for i in range(num_renders):
+        cg.get_prompt().invoke({"topic": f"Topic {i}"})
+    compiled_s = time.perf_counter() - t0
+    print(
+        f"render: template {reference_s / num_renders * 1e6:.1f} us/call,"
+        f" compiled {compiled_s / num_renders * 1e6:.1f} us/call"
+    )
+
+
+def build_lessons(num_lessons: int, prefix_cache_min_tokens: int) -> None:
+    """Build lessons without the local cache, and print the cached ratios."""
+    ChatModelRegistry().set_fake_llm(
+        FakeLLM(prefix_cache_min_tokens=prefix_cache_min_tokens)
+    )
+    builder = LessonBuilder(
+        ChatOpenAIConfig(model=FAKE_MODEL, api_key="fake"),
+        LANGUAGE,
+        LEVEL,
+        use_cache=False,
+    )
+    get_llm_metrics().clear()
+    for i in range(num_lessons):
+        builder.build(f"Topic number {i}")
+    print(f"cache from {prefix_cache_min_tokens} prefix tokens:")
+    for row in get_llm_metrics().get_summary():
+        print(
+            f"  {row['component']}: {row['prompt tokens']} prompt tokens,"
+            f" cached ratio {row['cached ratio']:.2f}"
+        )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=20_000)
+    parser.add_argument("--lessons", type=int, default=20)
+    args = parser.parse_args()
+    time_renders(args.renders)
+    with tempfile.TemporaryDirectory() as tmp_fol:
+        CONVO_CRAFT_PATHS.llm_cache_fp = Path(tmp_fol) / "llm_cache.sqlite"
+        build_lessons(args.lessons, prefix_cache_min_tokens=0)
+        build_lessons(args.lessons, prefix_cache_min_tokens=1024)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Time the guesses and measure the memory of the words of a step.
+
+Steps with more and more words are built from a sample paragraph,
+each step is played through with the correct guesses,
+and the memory of many live steps half played is measured.
+
+Usage:
+    python benchmarks/bench_puzzle.py [--steps 200]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from convo_craft.app.app import AppWords
+from convo_craft.app.simulate import find_correct_guess
+from convo_craft.llm.paragraph_splitter import ParagraphSplitterResult
+from convo_craft.text.split_sentence import SentenceSplitter
+
+SAMPLE_PORTION = "Eu acho que a gente pode ir ao mercado amanhã de manhã cedo"
+SAMPLE_WORDS = SentenceSplitter().invoke(SAMPLE_PORTION)
+
+
+def build_words(num_portions: int, seed: int) -> AppWords:
+    """Build the words of a step with this many portions.
+
+    The words of the portions are shared, like the words of a stored lesson.
+    """
+    portions = [SAMPLE_PORTION] * num_portions
+    random.seed(seed)
+    return AppWords(
+        app=None,
+        current_step=" ".join(portions),
+        para_split_result=ParagraphSplitterResult(portions=portions),
+        portion_words=[SAMPLE_WORDS] * num_portions,
+    )
+
+
+def record_guesses(num_portions: int, seed: int) -> list[tuple[int, int]]:
+    """Record the correct guesses of a step."""
+    words = build_words(num_portions, seed)
+    app = SimpleNamespace(conversation=SimpleNamespace(words=words))
+    guesses = []
+    while not words.done:
+        guess = find_correct_guess(app)
+        words.receive_guess(*guess)
+        guesses.append(guess)
+    return guesses
+
+
+def bench_guesses(num_portions: int) -> float:
+    """Time the correct guesses of a step, in microseconds per guess."""
+    guesses = record_guesses(num_portions, seed=0)
+    words = build_words(num_portions, seed=0)
+    t0 = time.perf_counter()
+    for guess in guesses:
+        words.receive_guess(*guess)
+    elapsed = time.perf_counter() - t0
+    assert words.done
+    return elapsed / len(guesses) * 1e6
+
+
+def bench_memory(num_portions: int, steps: int) -> float:
+    """Measure the memory of the live steps, half played, in KiB per step."""
+    guesses = record_guesses(num_portions, seed=0)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    live = []
+    for _ in range(steps):
+        words = build_words(num_portions, seed=0)
+        for guess in guesses[: len(guesses) // 2]:
+            words.receive_guess(*guess)
+        live.append(words)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (current - before) / steps / 1024
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+    num_words = len(SAMPLE_WORDS)
+    for num_portions in (1, 4, 16, 64):
+        guess_us = bench_guesses(num_portions)
+        memory_kb = bench_memory(num_portions, args.steps)
+        print(
+            f"{num_portions * num_words} words: {guess_us:.1f} us/guess,"
+            f" {memory_kb:.1f} KiB/step"
+        )
+
+
+if __name__ == "__main__":
+    main()
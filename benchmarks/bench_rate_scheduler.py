@@ -0,0 +1,104 @@
+"""Measure the wait of the interactive calls while background work fills the quota.
+
+Background workers keep making bulk and prefetch calls through a scheduler
+with a request limit, each call holding the worker for the call latency.
+Interactive calls are made at a steady pace, and their wait for the limits
+is compared with the same interactive calls on an idle scheduler,
+and with a scheduler without priorities, where every call is interactive.
+
+Usage:
+    python benchmarks/bench_rate_scheduler.py [--rpm 1200] [--workers 16]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from convo_craft.llm.rate_scheduler import CallPriority, RateScheduler
+
+
+def background_worker(
+    scheduler: RateScheduler,
+    priority: CallPriority,
+    latency_s: float,
+    stop: threading.Event,
+) -> None:
+    """Make calls until stopped."""
+    while not stop.is_set():
+        scheduler.acquire(1, priority=priority)
+        time.sleep(latency_s)
+
+
+def run(
+    rpm: int,
+    num_workers: int,
+    num_calls: int,
+    latency_s: float,
+    prioritized: bool,
+) -> tuple[list[float], int]:
+    """Run the interactive calls next to the background workers.
+
+    Returns:
+        tuple[list[float], int]: The wait of each interactive call,
+            and the number of background calls made.
+    """
+    scheduler = RateScheduler(requests_per_minute=rpm)
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=background_worker,
+            args=(
+                scheduler,
+                ("bulk", "prefetch")[i % 2] if prioritized else "interactive",
+                latency_s,
+                stop,
+            ),
+            daemon=True,
+        )
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    # let the background work drain the buckets first, until it has to queue
+    while num_workers and sum(s.queued for s in scheduler.get_stats().values()) == 0:
+        time.sleep(0.01)
+    waits = []
+    for _ in range(num_calls):
+        waits.append(scheduler.acquire(1, priority="interactive"))
+        time.sleep(latency_s)
+    stop.set()
+    stats = scheduler.get_stats()
+    background = stats["bulk"].granted + stats["prefetch"].granted
+    if not prioritized:
+        background = stats["interactive"].granted - num_calls
+    return waits, background
+
+
+def report(name: str, waits: list[float], background: int) -> None:
+    """Print the wait quantiles of the interactive calls."""
+    waits_ms = sorted(w * 1e3 for w in waits)
+    p95 = waits_ms[int(len(waits_ms) * 0.95)]
+    print(
+        f"{name}: interactive wait median {statistics.median(waits_ms):.1f} ms,"
+        f" p95 {p95:.1f} ms, max {waits_ms[-1]:.1f} ms,"
+        f" background calls {background}"
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rpm", type=int, default=1200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--latency-s", type=float, default=0.05)
+    args = parser.parse_args()
+    common = (args.rpm, args.workers, args.calls, args.latency_s)
+    report("idle", *run(args.rpm, 0, args.calls, args.latency_s, prioritized=True))
+    report("with priorities", *run(*common, prioritized=True))
+    report("without priorities", *run(*common, prioritized=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Time the sentence splitter on a large corpus of portions.
+
+The corpus is built by recombining the words of the sample conversation.
+The batch splitter is compared with splitting the portions one at a time,
+and with the previous word by word implementation, kept here as reference.
+
+Usage:
+    python benchmarks/bench_sentence_splitter.py [--sentences 120000]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from typing import Callable
+
+from convo_craft.llm.conversation_generator import CONVERSATION_SAMPLE
+from convo_craft.text.split_sentence import SentenceSplitter
+
+
+def split_reference(sentence: str, min_word_len: int = 3) -> list[str]:
+    """Split a sentence like the previous implementation.
+
+    A short word is combined with the next word only, the punctuation
+    alone is a word, and the words are copies.
+    """
+    words = sentence.split()
+    combined_words = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        if len(word) < min_word_len and i < len(words) - 1:
+            combined_words.append(f"{word} {words[i + 1]}")
+            i += 2
+        else:
+            combined_words.append(word)
+            i += 1
+    return combined_words
+
+
+def build_corpus(num_sentences: int, seed: int = 0) -> list[str]:
+    """Build portions of 4 to 16 words from the sample vocabulary."""
+    rng = random.Random(seed)
+    vocab = CONVERSATION_SAMPLE.split() + [",", "—", "?"]
+    return [
+        " ".join(rng.choices(vocab, k=rng.randint(4, 16)))
+        for _ in range(num_sentences)
+    ]
+
+
+def bench(name: str, fn: Callable[[], object], num_sentences: int) -> None:
+    """Time the call, then measure the memory of its result in another call.
+
+    Tracing the memory slows down the allocations, so it is not timed.
+    """
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(
+        f"{name}: {elapsed:.2f} s, {num_sentences / elapsed / 1e3:.0f}k sentences/s,"
+        f" result {current / 2**20:.1f} MiB"
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sentences", type=int, default=120_000)
+    args = parser.parse_args()
+    corpus = build_corpus(args.sentences)
+    splitter = SentenceSplitter()
+    print(f"sentences: {len(corpus)}, words: {sum(len(s.split()) for s in corpus)}")
+    bench("reference", lambda: [split_reference(s) for s in corpus], len(corpus))
+    bench("one at a time", lambda: [splitter.invoke(s) for s in corpus], len(corpus))
+    bench("batch offsets", lambda: splitter.invoke_batch(corpus), len(corpus))
+    bench(
+        "batch words",
+        lambda: list(splitter.invoke_batch(corpus).iter_words()),
+        len(corpus),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Count the model calls when a class starts the same topic at once.
+
+Every session enters the key and, after a barrier, picks the same topic,
+against the fake LLM backend and an empty LLM cache.
+Without coalescing each session would call the model for the conversation,
+its translation and its splits.
+
+Usage:
+    python benchmarks/bench_single_flight.py [--sessions 30] [--latency-ms 500]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import tempfile
+import threading
+import time
+
+from convo_craft.app.app import App
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.client_registry import ChatModelRegistry
+from convo_craft.llm.fake_llm import FAKE_MODEL, FakeLatency, FakeLLM
+from convo_craft.llm.llm_metrics import get_llm_metrics
+from convo_craft.llm.single_flight import get_single_flight
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    args = parser.parse_args()
+    latency = FakeLatency(median_s=args.latency_ms / 1e3, sigma=0.2)
+    ChatModelRegistry().set_fake_llm(FakeLLM(latency=latency))
+    config = ChatOpenAIConfig(model=FAKE_MODEL)
+    with tempfile.TemporaryDirectory() as tmp_fol:
+        CONVO_CRAFT_PATHS.llm_cache_fp = Path(tmp_fol) / "llm_cache.sqlite"
+        store = LessonStore(Path(tmp_fol) / "lessons")
+        apps = []
+        for _ in range(args.sessions):
+            app = App(lesson_store=store, chat_openai_config=config)
+            app.set_openai_api_key("fake")
+            apps.append(app)
+        topic = apps[0].topic.topics[0]
+        get_llm_metrics().clear()
+        barrier = threading.Barrier(args.sessions)
+
+        def start_topic(app: App) -> None:
+            app.topic.set_topics([topic])
+            barrier.wait()
+            app.set_topic_by_value(topic)
+            # wait for the prefetched steps, as the session would while playing
+            app.conversation.build_lesson()
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+            list(executor.map(start_topic, apps))
+        elapsed = time.perf_counter() - t0
+    print(f"{args.sessions} sessions started {topic!r} in {elapsed:.2f} s")
+    for row in get_llm_metrics().get_summary():
+        print(
+            f"{row['component']}: {row['calls']} requests,"
+            f" {row['coalesced']} coalesced, {row['cache hits']} cache hits"
+        )
+    single_flight = get_single_flight()
+    print(f"coalesced ratio: {single_flight.coalesced_ratio:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Measure the memory of the sessions, live and as compact snapshots.
+
+Many sessions play stored lessons on the fake LLM backend,
+each one half way through its first step.
+The memory of the live apps is measured with tracemalloc,
+then the same sessions as snapshots, then the apps restored from them.
+
+Usage:
+    python benchmarks/bench_snapshot.py [--sessions 200] [--lessons 8]
+"""
+
+import argparse
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, TypeVar
+
+from convo_craft.app.app import App
+from convo_craft.app.simulate import find_correct_guess
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+from convo_craft.lesson.lesson_builder import LessonBuilder
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.fake_llm import FAKE_MODEL
+
+LANGUAGE = "Brazilian Portuguese"
+LEVEL = "intermediate"
+CONFIG = ChatOpenAIConfig(model=FAKE_MODEL)
+
+T = TypeVar("T")
+
+
+def build_store(store_fol: Path, num_lessons: int) -> tuple[LessonStore, list[str]]:
+    """Build a store with a lesson on each topic."""
+    builder = LessonBuilder(
+        ChatOpenAIConfig(model=FAKE_MODEL, api_key="fake"), LANGUAGE, LEVEL
+    )
+    store = LessonStore(store_fol)
+    topics = [f"Topic number {i}" for i in range(num_lessons)]
+    for topic in topics:
+        store.add(builder.build(topic))
+    return store, topics
+
+
+def start_session(store: LessonStore, topic: str) -> App:
+    """Start a session on a stored lesson, half way through the first step."""
+    app = App(lesson_store=store, chat_openai_config=CONFIG)
+    app.set_openai_api_key("fake")
+    app.topic.set_topics([topic])
+    app.set_topic_by_value(topic)
+    words = app.conversation.words
+    for _ in range(words.puzzle.num_words // 2):
+        app.receive_guess(*find_correct_guess(app))
+    return app
+
+
+def measure(build: Callable[[int], T], num: int) -> tuple[list[T], float, float]:
+    """Build the objects, returning them with KiB and ms per object."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    t0 = time.perf_counter()
+    built = [build(i) for i in range(num)]
+    elapsed = time.perf_counter() - t0
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, (current - before) / num / 1024, elapsed / num * 1e3
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--lessons", type=int, default=8)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_fol:
+        CONVO_CRAFT_PATHS.llm_cache_fp = Path(tmp_fol) / "llm_cache.sqlite"
+        store, topics = build_store(Path(tmp_fol) / "lessons", args.lessons)
+        # warm up the shared caches, they are not part of any session
+        for topic in topics:
+            start_session(store, topic)
+        apps, live_kib, live_ms = measure(
+            lambda i: start_session(store, topics[i % len(topics)]), args.sessions
+        )
+        snapshots, snap_kib, snap_ms = measure(
+            lambda i: apps[i].snapshot(), args.sessions
+        )
+        del apps
+        restored, restored_kib, restored_ms = measure(
+            lambda i: App.restore(
+                snapshots[i],
+                lesson_store=store,
+                chat_openai_config=CONFIG,
+                api_key="fake",
+            ),
+            args.sessions,
+        )
+        assert restored[0].snapshot() == snapshots[0]
+    snap_bytes = sum(len(s) for s in snapshots) / len(snapshots)
+    print(f"sessions: {args.sessions}, lessons: {args.lessons}")
+    print(f"live app: {live_kib:.1f} KiB/session, start {live_ms:.2f} ms")
+    print(
+        f"snapshot: {snap_kib:.2f} KiB/session ({snap_bytes:.0f} bytes),"
+        f" dump {snap_ms:.2f} ms"
+    )
+    print(f"restored app: {restored_kib:.1f} KiB/session, restore {restored_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
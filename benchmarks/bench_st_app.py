@@ -0,0 +1,131 @@
+"""Time the reruns of the Streamlit app when guessing words.
+
+The app is driven headless with the Streamlit testing API, on the fake
+LLM backend, with a stored long lesson jumped to its last step,
+so every rerun has many past turns to render.
+The testing API always reruns the whole page, so the rerun of the guessing
+fragment alone is timed by running just the fragment on the same session.
+Pass ``--script`` to time another version of the app, to compare.
+
+Usage:
+    python benchmarks/bench_st_app.py [--turns 40] [--guesses 30]
+"""
+
+import argparse
+from pathlib import Path
+import statistics
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from convo_craft.app.app import App
+from convo_craft.app.simulate import find_correct_guess
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+from convo_craft.lesson.lesson_builder import LessonBuilder
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.fake_llm import FAKE_MODEL
+
+ST_APP_FP = Path(__file__).parents[1] / "webapp" / "streamlit" / "st_app.py"
+LANGUAGE = "Brazilian Portuguese"
+LEVEL = "intermediate"
+TOPIC = "A very long chat with a friend"
+
+
+def build_store(store_fol: Path, turns: int) -> LessonStore:
+    """Build a store with a single long lesson."""
+    config = ChatOpenAIConfig(model=FAKE_MODEL, api_key="fake")
+    builder = LessonBuilder(config, LANGUAGE, LEVEL, num_messages=turns)
+    store = LessonStore(store_fol)
+    store.add(builder.build(TOPIC))
+    return store
+
+
+def start_app(script_fp: Path, store: LessonStore) -> tuple[AppTest, App]:
+    """Start the app, enter the key, pick the topic and go to the last turn."""
+    at = AppTest.from_file(str(script_fp), default_timeout=60)
+    app = App(lesson_store=store, chat_openai_config=ChatOpenAIConfig(model=FAKE_MODEL))
+    at.session_state["app"] = app
+    at.run()
+    at.sidebar.text_input(key="api_key").input("fake").run()
+    app.topic.set_topics([TOPIC])
+    at.run()
+    at.selectbox(key="topic").select(TOPIC).run()
+    ac = app.conversation
+    ac.set_conversation_step(len(ac.conversation) - 1)
+    at.run()
+    return at, app
+
+
+def bench_guesses(at: AppTest, app: App, guesses: int) -> list[float]:
+    """Time the reruns triggered by the correct guesses."""
+    times = []
+    for _ in range(guesses):
+        if app.conversation.words.done:
+            break
+        si, wi = find_correct_guess(app)
+        button = at.button(key=f"button_options_{si}_{wi}")
+        t0 = time.perf_counter()
+        button.click().run()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def run_fragment(script_fp: str) -> None:
+    """Run only the guessing fragment of the app script."""
+    import runpy
+
+    runpy.run_path(script_fp, run_name="st_app")["show_guessing"]()
+
+
+def bench_fragment(script_fp: Path, app: App, reruns: int) -> list[float]:
+    """Time the reruns of the guessing fragment alone."""
+    at = AppTest.from_function(run_fragment, args=(str(script_fp),))
+    at.session_state["app"] = app
+    ac = app.conversation
+    at.session_state["rendered_step"] = (id(ac), ac.conversation_step)
+    at.run()
+    times = []
+    for _ in range(reruns):
+        t0 = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def print_times(name: str, times: list[float]) -> None:
+    """Print the median and max of the times."""
+    times_ms = sorted(t * 1e3 for t in times)
+    print(
+        f"{name}: median {statistics.median(times_ms):.1f} ms"
+        f" max {times_ms[-1]:.1f} ms"
+    )
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--guesses", type=int, default=30)
+    parser.add_argument("--script", type=Path, default=ST_APP_FP)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_fol:
+        CONVO_CRAFT_PATHS.llm_cache_fp = Path(tmp_fol) / "llm_cache.sqlite"
+        CONVO_CRAFT_PATHS.sessions_fp = Path(tmp_fol) / "sessions.sqlite"
+        store = build_store(Path(tmp_fol) / "lessons", args.turns)
+        at, app = start_app(args.script, store)
+        past_turns = app.conversation.conversation_step
+        page_times = bench_guesses(at, app, args.guesses)
+        has_fragment = "show_guessing" in args.script.read_text()
+        if has_fragment:
+            fragment_times = bench_fragment(args.script, app, len(page_times))
+    print(f"script: {args.script}")
+    print(f"past turns rendered: {past_turns}, guesses: {len(page_times)}")
+    print_times("page rerun per guess", page_times)
+    if has_fragment:
+        print_times("fragment rerun per guess", fragment_times)
+
+
+if __name__ == "__main__":
+    main()
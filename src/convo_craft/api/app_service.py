@@ -0,0 +1,216 @@
+"""The app lifecycle as a service, independent of the transport.
+
+Every request loads the session state from the session store,
+rebuilds the app, applies the request and saves the new state,
+so no session lives in the memory of a worker between requests.
+The API key is never stored: the requests that may call the LLM carry it.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+from pydantic import BaseModel
+
+from convo_craft.api.session_store import SessionStore, get_session_store
+from convo_craft.app.app import App
+from convo_craft.app.app_state import AppState
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.model_routing import ModelRouting
+from convo_craft.lesson.lesson_store import LessonStore, get_lesson_store
+from convo_craft.llm.conversation_generator import ConversationTurn
+
+
+class WordView(BaseModel):
+    """A word button of the grid."""
+
+    word: str
+    state: str
+
+
+class TopicsView(BaseModel):
+    """The topics offered to the user, and the chosen one."""
+
+    topics: list[str]
+    topic: str | None = None
+
+
+class StepView(BaseModel):
+    """What a client shows for the current step of the conversation."""
+
+    topic: str
+    conversation_step: int
+    num_steps: int
+    done: bool
+    past_turns: list[ConversationTurn]
+    current_turn: ConversationTurn
+    translation: str
+    sent_guessed: str
+    words: list[list[WordView]]
+    """The shuffled words of each portion, indexed like the guesses."""
+
+
+class GuessResult(BaseModel):
+    """The outcome of a guess."""
+
+    correct: bool
+    step: StepView
+
+
+def build_topics_view(app: App) -> TopicsView:
+    """Build the topics view of an app."""
+    if not hasattr(app, "topic"):
+        raise ValueError("The API key is not set")
+    topic = app.topic.topic if app.topic.topic_index is not None else None
+    return TopicsView(topics=app.topic.topics, topic=topic)
+
+
+def build_step_view(app: App) -> StepView:
+    """Build the view of the current step of an app."""
+    if not hasattr(app, "conversation"):
+        raise ValueError("No conversation started, choose a topic first")
+    ac = app.conversation
+    words = ac.words
+    return StepView(
+        topic=ac.topic,
+        conversation_step=ac.conversation_step,
+        num_steps=len(ac.conversation),
+        done=ac.done,
+        past_turns=ac.conversation[: ac.conversation_step],
+        current_turn=ac.conversation[ac.conversation_step],
+        translation=ac.current_step_translation.target_text,
+        sent_guessed=words.sent_guessed,
+        words=[
+            [WordView(word=w.word, state=w.state) for w in sent]
+            for sent in words.words_shuffled
+        ],
+    )
+
+
+class AppService:
+    """Serve the app lifecycle for sessions kept in a session store."""
+
+    def __init__(
+        self,
+        session_store: SessionStore | None = None,
+        lesson_store: LessonStore | None = None,
+        chat_openai_config: ChatOpenAIConfig | None = None,
+        model_routing: ModelRouting | None = None,
+    ) -> None:
+        """Initialize the service.
+
+        Args:
+            session_store (SessionStore | None): The store of the sessions,
+                if None the process-wide store is used.
+            lesson_store (LessonStore | None): The store to serve the lessons from,
+                if None the process-wide store is used.
+            chat_openai_config (ChatOpenAIConfig | None): The base LLM config
+                of the apps, the API key of each session is added to it.
+            model_routing (ModelRouting | None): The model of each llm component.
+        """
+        if session_store is None:
+            session_store = get_session_store()
+        self.session_store = session_store
+        if lesson_store is None:
+            lesson_store = get_lesson_store()
+        self.lesson_store = lesson_store
+        self.chat_openai_config = chat_openai_config
+        self.model_routing = model_routing
+
+    def load_app(self, state: AppState, api_key: str | None = None) -> App:
+        """Rebuild the app of a session, with the API key of the request."""
+        return App.load_state(
+            state,
+            lesson_store=self.lesson_store,
+            chat_openai_config=self.chat_openai_config,
+            model_routing=self.model_routing,
+            api_key=api_key,
+        )
+
+    @contextmanager
+    def open_session(self, session_id: str, api_key: str | None) -> Iterator[App]:
+        """Load the app of a session, and save its state when done.
+
+        Raises:
+            SessionNotFoundError: If the session does not exist.
+            SessionConflictError: If another request saved the session meanwhile.
+            ValueError: If the request has no API key.
+        """
+        if not api_key:
+            raise ValueError("The API key is not set")
+        state, version = self.session_store.get(session_id)
+        app = self.load_app(state, api_key)
+        yield app
+        self.session_store.put(session_id, app.dump_state(), version)
+
+    def read_session(self, session_id: str) -> App:
+        """Load the app of a session, without saving it back nor calling the LLM."""
+        state, _ = self.session_store.get(session_id)
+        return self.load_app(state)
+
+    def create_session(self, user_id: str | None = None) -> str:
+        """Create a session, returning its id."""
+        app = App(
+            lesson_store=self.lesson_store,
+            user_id=user_id,
+            chat_openai_config=self.chat_openai_config,
+            model_routing=self.model_routing,
+        )
+        return self.session_store.create(app.dump_state())
+
+    def delete_session(self, session_id: str) -> None:
+        """Delete a session."""
+        self.session_store.delete(session_id)
+
+    def set_api_key(self, session_id: str, api_key: str) -> TopicsView:
+        """Check the API key of the session, and offer the first topics.
+
+        The key is not stored, the next requests must carry it too.
+        """
+        with self.open_session(session_id, api_key) as app:
+            return build_topics_view(app)
+
+    def get_topics(self, session_id: str) -> TopicsView:
+        """Get the topics offered to the session."""
+        return build_topics_view(self.read_session(session_id))
+
+    def refresh_topics(self, session_id: str, api_key: str) -> TopicsView:
+        """Offer new topics to the session."""
+        with self.open_session(session_id, api_key) as app:
+            build_topics_view(app)
+            app.topic.generate_topics()
+            return build_topics_view(app)
+
+    def choose_topic(self, session_id: str, topic: str, api_key: str) -> StepView:
+        """Choose one of the offered topics and start its conversation."""
+        with self.open_session(session_id, api_key) as app:
+            if topic not in build_topics_view(app).topics:
+                raise ValueError(f"Topic not offered: {topic!r}")
+            app.set_topic_by_value(topic)
+            return build_step_view(app)
+
+    def get_step(self, session_id: str) -> StepView:
+        """Get the current step of the conversation."""
+        return build_step_view(self.read_session(session_id))
+
+    def guess(
+        self, session_id: str, shuf_si: int, shuf_wi: int, api_key: str
+    ) -> GuessResult:
+        """Guess a shuffled word of the current step."""
+        with self.open_session(session_id, api_key) as app:
+            view = build_step_view(app)
+            if view.done:
+                raise ValueError("The conversation is done")
+            if not 0 <= shuf_si < len(view.words):
+                raise ValueError(f"No portion {shuf_si}")
+            if not 0 <= shuf_wi < len(view.words[shuf_si]):
+                raise ValueError(f"No word {shuf_wi} in portion {shuf_si}")
+            correct = app.receive_guess(shuf_si, shuf_wi)
+            return GuessResult(correct=correct, step=build_step_view(app))
+
+    def next_step(self, session_id: str, api_key: str) -> StepView:
+        """Skip to the next step of the conversation."""
+        with self.open_session(session_id, api_key) as app:
+            build_step_view(app)
+            with app.track_llm_metrics():
+                app.conversation.next_conversation_step()
+            return build_step_view(app)
@@ -0,0 +1,161 @@
+"""Client of the headless HTTP API of the app."""
+
+from http import HTTPStatus
+import json
+from typing import Any
+import urllib.error
+import urllib.request
+
+from convo_craft.api.app_service import GuessResult, StepView, TopicsView
+from convo_craft.api.server import API_KEY_HEADER
+
+
+class ApiClientError(RuntimeError):
+    """The API answered with an error status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class ConvoCraftClient:
+    """Drive an app session through the HTTP API."""
+
+    def __init__(self, base_url: str, timeout: float = 120) -> None:
+        """Initialize the client.
+
+        Args:
+            base_url (str): The URL of the API server, like http://127.0.0.1:8000.
+            timeout (float): The timeout of each request, in seconds.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session_id: str | None = None
+        self.api_key: str | None = None
+        """The API key, sent with every request as the server never stores it."""
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        data: dict[str, Any] | None = None,
+    ) -> Any:
+        """Send a request, returning the decoded JSON response.
+
+        Raises:
+            ApiClientError: If the response has an error status.
+        """
+        body = None if data is None else json.dumps(data).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.api_key is not None:
+            headers[API_KEY_HEADER] = self.api_key
+        req = urllib.request.Request(
+            self.base_url + path,
+            data=body,
+            method=method,
+            headers=headers,
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise ApiClientError(e.code, message) from None
+
+    @property
+    def session_path(self) -> str:
+        if self.session_id is None:
+            raise ApiClientError(HTTPStatus.NOT_FOUND, "No session created")
+        return f"/sessions/{self.session_id}"
+
+    def create_session(self, user_id: str | None = None) -> str:
+        """Create a session, used by the next calls."""
+        data = {} if user_id is None else {"user_id": user_id}
+        self.session_id = self.request("POST", "/sessions", data)["session_id"]
+        return self.session_id
+
+    def delete_session(self) -> None:
+        """Delete the session."""
+        self.request("DELETE", self.session_path)
+        self.session_id = None
+
+    def set_api_key(self, api_key: str) -> TopicsView:
+        """Set the API key, getting the first topics.
+
+        The key is kept by the client, and sent with the next requests.
+        """
+        data = self.request("PUT", f"{self.session_path}/key", {"api_key": api_key})
+        self.api_key = api_key
+        return TopicsView.model_validate(data)
+
+    def get_topics(self) -> TopicsView:
+        """Get the topics offered."""
+        return TopicsView.model_validate(
+            self.request("GET", f"{self.session_path}/topics")
+        )
+
+    def refresh_topics(self) -> TopicsView:
+        """Get new topics."""
+        return TopicsView.model_validate(
+            self.request("POST", f"{self.session_path}/topics/refresh")
+        )
+
+    def choose_topic(self, topic: str) -> StepView:
+        """Choose a topic, starting its conversation."""
+        data = self.request("PUT", f"{self.session_path}/topic", {"topic": topic})
+        return StepView.model_validate(data)
+
+    def get_step(self) -> StepView:
+        """Get the current step."""
+        return StepView.model_validate(self.request("GET", f"{self.session_path}/step"))
+
+    def guess(self, shuf_si: int, shuf_wi: int) -> GuessResult:
+        """Guess a shuffled word of the current step."""
+        data = self.request(
+            "POST",
+            f"{self.session_path}/guess",
+            {"sentence": shuf_si, "word": shuf_wi},
+        )
+        return GuessResult.model_validate(data)
+
+    def next_step(self) -> StepView:
+        """Skip to the next step."""
+        data = self.request("POST", f"{self.session_path}/next")
+        return StepView.model_validate(data)
+
+    def play_conversation(self, max_guesses: int = 10_000) -> int:
+        """Guess through the whole conversation, like a user trying the words.
+
+        The client does not know the answers: in the current portion,
+        the words not guessed yet are tried in turn until one is correct.
+
+        Returns:
+            int: The number of guesses made.
+        """
+        step = self.get_step()
+        num_guesses = 0
+        tried: set[tuple[int, int, int]] = set()
+        while not step.done and num_guesses < max_guesses:
+            shuf_si = next(
+                si
+                for si, sent in enumerate(step.words)
+                if any(w.state != "correct" for w in sent)
+            )
+            shuf_wi = next(
+                wi
+                for wi, w in enumerate(step.words[shuf_si])
+                if w.state != "correct"
+                and (step.conversation_step, shuf_si, wi) not in tried
+            )
+            result = self.guess(shuf_si, shuf_wi)
+            num_guesses += 1
+            if result.correct:
+                tried.clear()
+            else:
+                tried.add((step.conversation_step, shuf_si, shuf_wi))
+            step = result.step
+        return num_guesses
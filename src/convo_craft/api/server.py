@@ -0,0 +1,313 @@
+"""Headless HTTP API of the app, with JSON requests and responses.
+
+Routes:
+    POST   /sessions                      create a session
+    DELETE /sessions/{id}                 delete a session
+    PUT    /sessions/{id}/key             {"api_key"}: set the key, get the topics
+    GET    /sessions/{id}/topics          get the topics
+    POST   /sessions/{id}/topics/refresh  offer new topics
+    PUT    /sessions/{id}/topic           {"topic"}: start the conversation
+    GET    /sessions/{id}/step            get the current step
+    POST   /sessions/{id}/guess           {"sentence", "word"}: guess a word
+    POST   /sessions/{id}/next            skip to the next step
+    GET    /health                        liveness
+    GET    /metrics                       LLM metrics of the worker, Prometheus text
+
+The sessions live in the session store, so the workers are stateless:
+several worker processes share the listening socket,
+and more nodes can be added behind a load balancer.
+The API key of the user is never stored, so the routes changing a session
+need it in the X-Api-Key header.
+"""
+
+import argparse
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import multiprocessing
+from pathlib import Path
+import re
+import signal
+from typing import Any, Callable
+
+from loguru import logger as lg
+from pydantic import BaseModel
+
+from convo_craft.api.app_service import AppService
+from convo_craft.api.session_store import (
+    SessionConflictError,
+    SessionNotFoundError,
+    SessionStore,
+)
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.model_routing import ModelRouting
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.call_policy import CircuitOpenError
+from convo_craft.llm.fake_llm import FAKE_MODEL
+from convo_craft.llm.llm_metrics import get_llm_metrics
+from convo_craft.llm.rate_scheduler import schedulers_to_prometheus
+
+SESSION_PATH = r"/sessions/(?P<session_id>[0-9a-f]+)"
+API_KEY_HEADER = "X-Api-Key"
+"""The header carrying the API key of the user."""
+
+
+class ApiServer(ThreadingHTTPServer):
+    """A threading HTTP server holding the app service of the worker."""
+
+    daemon_threads = True
+    service: AppService
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """Route the requests to the app service."""
+
+    server: ApiServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        lg.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self) -> None:
+        self.dispatch("GET")
+
+    def do_POST(self) -> None:
+        self.dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self.dispatch("PUT")
+
+    def do_DELETE(self) -> None:
+        self.dispatch("DELETE")
+
+    def read_json(self) -> dict[str, Any]:
+        """Read the JSON object of the request body, empty if there is no body."""
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("The request body must be a JSON object")
+        return body
+
+    @property
+    def api_key(self) -> str | None:
+        """The API key of the request, None if missing."""
+        return self.headers.get(API_KEY_HEADER)
+
+    def send_body(self, status: int, body: bytes, content_type: str) -> None:
+        """Send a complete response."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, data: BaseModel | dict[str, Any]) -> None:
+        """Send a JSON response."""
+        if isinstance(data, BaseModel):
+            body = data.model_dump_json().encode()
+        else:
+            body = json.dumps(data).encode()
+        self.send_body(status, body, "application/json")
+
+    def dispatch(self, method: str) -> None:
+        """Run the route matching the request, mapping the errors to statuses."""
+        path = self.path.split("?", 1)[0].rstrip("/")
+        for route_method, pattern, handler in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if match is None or route_method != method:
+                continue
+            try:
+                status, data = handler(self, **match.groupdict())
+            except SessionNotFoundError as e:
+                status, data = HTTPStatus.NOT_FOUND, {"error": f"No session {e}"}
+            except SessionConflictError as e:
+                status, data = HTTPStatus.CONFLICT, {"error": str(e)}
+            except (CircuitOpenError, TimeoutError) as e:
+                status, data = HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(e)}
+            except (ValueError, KeyError, TypeError) as e:
+                status, data = HTTPStatus.BAD_REQUEST, {"error": str(e)}
+            except Exception as e:
+                lg.exception(f"Failed {method} {path}")
+                status, data = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+            if isinstance(data, str):
+                self.send_body(status, data.encode(), "text/plain; version=0.0.4")
+            else:
+                self.send_json(status, data)
+            return
+        self.send_json(HTTPStatus.NOT_FOUND, {"error": f"No route {method} {path}"})
+
+    def create_session(self) -> tuple[int, dict]:
+        session_id = self.server.service.create_session(self.read_json().get("user_id"))
+        return HTTPStatus.CREATED, {"session_id": session_id}
+
+    def delete_session(self, session_id: str) -> tuple[int, dict]:
+        self.server.service.delete_session(session_id)
+        return HTTPStatus.OK, {}
+
+    def set_api_key(self, session_id: str) -> tuple[int, BaseModel]:
+        api_key = str(self.read_json()["api_key"])
+        return HTTPStatus.OK, self.server.service.set_api_key(session_id, api_key)
+
+    def get_topics(self, session_id: str) -> tuple[int, BaseModel]:
+        return HTTPStatus.OK, self.server.service.get_topics(session_id)
+
+    def refresh_topics(self, session_id: str) -> tuple[int, BaseModel]:
+        topics = self.server.service.refresh_topics(session_id, self.api_key)
+        return HTTPStatus.OK, topics
+
+    def choose_topic(self, session_id: str) -> tuple[int, BaseModel]:
+        topic = str(self.read_json()["topic"])
+        step = self.server.service.choose_topic(session_id, topic, self.api_key)
+        return HTTPStatus.OK, step
+
+    def get_step(self, session_id: str) -> tuple[int, BaseModel]:
+        return HTTPStatus.OK, self.server.service.get_step(session_id)
+
+    def guess(self, session_id: str) -> tuple[int, BaseModel]:
+        body = self.read_json()
+        shuf_si, shuf_wi = int(body["sentence"]), int(body["word"])
+        result = self.server.service.guess(session_id, shuf_si, shuf_wi, self.api_key)
+        return HTTPStatus.OK, result
+
+    def next_step(self, session_id: str) -> tuple[int, BaseModel]:
+        return HTTPStatus.OK, self.server.service.next_step(session_id, self.api_key)
+
+    def health(self) -> tuple[int, dict]:
+        return HTTPStatus.OK, {"status": "ok"}
+
+    def metrics(self) -> tuple[int, str]:
+        return (
+            HTTPStatus.OK,
+            get_llm_metrics().to_prometheus() + schedulers_to_prometheus(),
+        )
+
+
+ROUTES: list[tuple[str, str, Callable[..., tuple[int, Any]]]] = [
+    ("POST", r"/sessions", ApiRequestHandler.create_session),
+    ("DELETE", SESSION_PATH, ApiRequestHandler.delete_session),
+    ("PUT", SESSION_PATH + r"/key", ApiRequestHandler.set_api_key),
+    ("GET", SESSION_PATH + r"/topics", ApiRequestHandler.get_topics),
+    ("POST", SESSION_PATH + r"/topics/refresh", ApiRequestHandler.refresh_topics),
+    ("PUT", SESSION_PATH + r"/topic", ApiRequestHandler.choose_topic),
+    ("GET", SESSION_PATH + r"/step", ApiRequestHandler.get_step),
+    ("POST", SESSION_PATH + r"/guess", ApiRequestHandler.guess),
+    ("POST", SESSION_PATH + r"/next", ApiRequestHandler.next_step),
+    ("GET", r"/health", ApiRequestHandler.health),
+    ("GET", r"/metrics", ApiRequestHandler.metrics),
+]
+"""The method, path pattern and handler of each route."""
+
+
+def build_server(host: str, port: int) -> ApiServer:
+    """Bind the server socket, without a service yet."""
+    return ApiServer((host, port), ApiRequestHandler)
+
+
+def run_worker(server: ApiServer, build_service: Callable[[], AppService]) -> None:
+    """Serve the requests on the shared socket, with a service of this worker.
+
+    The service is built in the worker, so each process opens its own
+    connections to the stores.
+    """
+    server.service = build_service()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(
+    build_service: Callable[[], AppService],
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 1,
+) -> None:
+    """Serve the API with several worker processes sharing the socket.
+
+    Args:
+        build_service (Callable[[], AppService]): Build the service of a worker.
+        host (str): The host to listen on.
+        port (int): The port to listen on.
+        workers (int): The number of worker processes, 1 to serve in-process.
+    """
+    server = build_server(host, port)
+    lg.info(f"Serving the API on {host}:{server.server_port} with {workers} workers")
+    if workers <= 1:
+        run_worker(server, build_service)
+        return
+    # the workers inherit the listening socket and accept on it concurrently
+    ctx = multiprocessing.get_context("fork")
+    processes = [
+        ctx.Process(target=run_worker, args=(server, build_service))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    # stop the workers too when the server is terminated
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+            process.join()
+        server.server_close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the API server from the command line."""
+    from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+
+    parser = argparse.ArgumentParser(description="Serve the app as an HTTP API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--store-fol", type=Path, default=CONVO_CRAFT_PATHS.lessons_fol)
+    parser.add_argument(
+        "--sessions-fp", type=Path, default=CONVO_CRAFT_PATHS.sessions_fp
+    )
+    parser.add_argument(
+        "--llm-cache-fp", type=Path, default=CONVO_CRAFT_PATHS.llm_cache_fp
+    )
+    parser.add_argument("--model", default=None, help="Override the model name.")
+    parser.add_argument(
+        "--fake-llm", action="store_true", help="Use the fake backend, no network."
+    )
+    parser.add_argument(
+        "--local-model",
+        default=None,
+        help="Translate and split with this model on a local Ollama endpoint.",
+    )
+    parser.add_argument("--local-base-url", default=None, help="The local endpoint.")
+    args = parser.parse_args(argv)
+    CONVO_CRAFT_PATHS.llm_cache_fp = args.llm_cache_fp
+
+    chat_openai_config = ChatOpenAIConfig()
+    if args.model is not None:
+        chat_openai_config.model = args.model
+    if args.fake_llm:
+        chat_openai_config.model = FAKE_MODEL
+    model_routing = None
+    if args.local_model is not None:
+        model_routing = ModelRouting.local_cheap_tasks(
+            model=args.local_model, base_url=args.local_base_url
+        )
+
+    def build_service() -> AppService:
+        return AppService(
+            session_store=SessionStore(args.sessions_fp),
+            lesson_store=LessonStore(args.store_fol),
+            chat_openai_config=chat_openai_config,
+            model_routing=model_routing,
+        )
+
+    serve(build_service, host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Store of the app sessions, outside of the processes serving them.
+
+Each session is a JSON app state with a version number.
+A worker loads the state, applies the request and saves the state back
+only if nobody saved it in the meantime,
+so any worker can serve any session.
+"""
+
+from functools import cache
+from pathlib import Path
+import sqlite3
+import threading
+import time
+import uuid
+
+from loguru import logger as lg
+
+from convo_craft.app.app_state import AppState
+from convo_craft.utils.u_pathlib import check_create_fol
+
+DEFAULT_MAX_AGE_S = 7 * 24 * 60 * 60
+"""Drop the sessions not used for this long, in seconds."""
+
+
+class SessionNotFoundError(KeyError):
+    """The session does not exist, or has expired."""
+
+
+class SessionConflictError(RuntimeError):
+    """The session was saved by another request since it was loaded."""
+
+
+class SessionStore:
+    """A store of versioned app states, in SQLite.
+
+    The database can be shared by several worker processes on the same node.
+    """
+
+    def __init__(self, db_fp: Path, max_age_s: float = DEFAULT_MAX_AGE_S) -> None:
+        """Initialize the store.
+
+        Args:
+            db_fp (Path): The SQLite file to store the sessions in.
+            max_age_s (float): Drop the sessions not used for this long.
+        """
+        self.db_fp = db_fp
+        self.max_age_s = max_age_s
+        check_create_fol(self.db_fp.parent)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_fp, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            # let the readers run while another process writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY,"
+                " state TEXT NOT NULL,"
+                " version INTEGER NOT NULL,"
+                " updated_at REAL NOT NULL"
+                ")"
+            )
+
+    def create(self, state: AppState) -> str:
+        """Store the state of a new session, returning its id."""
+        session_id = uuid.uuid4().hex
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sessions VALUES (?, ?, 1, ?)",
+                (session_id, state.model_dump_json(), time.time()),
+            )
+        return session_id
+
+    def get(self, session_id: str) -> tuple[AppState, int]:
+        """Get the state of a session and its version.
+
+        Raises:
+            SessionNotFoundError: If the session does not exist or has expired.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, version, updated_at FROM sessions WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        if row is None or time.time() - row[2] > self.max_age_s:
+            raise SessionNotFoundError(session_id)
+        return AppState.model_validate_json(row[0]), row[1]
+
+    def put(self, session_id: str, state: AppState, version: int) -> int:
+        """Save the state of a session, if it is still at the loaded version.
+
+        Args:
+            session_id (str): The session to save.
+            state (AppState): The new state.
+            version (int): The version the state was loaded at.
+
+        Raises:
+            SessionConflictError: If the session was saved in the meantime.
+
+        Returns:
+            int: The new version.
+        """
+        with self._lock, self._conn:
+            updated = self._conn.execute(
+                "UPDATE sessions SET state = ?, version = ?, updated_at = ?"
+                " WHERE session_id = ? AND version = ?",
+                (
+                    state.model_dump_json(),
+                    version + 1,
+                    time.time(),
+                    session_id,
+                    version,
+                ),
+            ).rowcount
+        if not updated:
+            raise SessionConflictError(f"Session {session_id} changed since loaded")
+        return version + 1
+
+    def save(self, session_id: str, state: AppState) -> int:
+        """Save the state of a session, whatever its version, returning the new one.
+
+        For the sessions served by a single client, the last write wins.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sessions VALUES (?, ?, 1, ?)"
+                " ON CONFLICT (session_id) DO UPDATE SET state = excluded.state,"
+                " version = version + 1, updated_at = excluded.updated_at",
+                (session_id, state.model_dump_json(), time.time()),
+            )
+            return self._conn.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+
+    def delete(self, session_id: str) -> None:
+        """Delete a session."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+
+    def evict(self) -> int:
+        """Drop the expired sessions, returning how many were dropped."""
+        min_updated_at = time.time() - self.max_age_s
+        with self._lock, self._conn:
+            expired = self._conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (min_updated_at,)
+            ).rowcount
+        if expired:
+            lg.debug(f"Evicted {expired} expired sessions")
+        return expired
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+@cache
+def get_session_store() -> SessionStore:
+    """Get the process-wide session store, in the data folder."""
+    from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+
+    return SessionStore(CONVO_CRAFT_PATHS.sessions_fp)
@@ -1,24 +1,44 @@
 """An app for the Convo Craft project."""
 
-from dataclasses import dataclass
-import random
+from concurrent.futures import Future
+from contextlib import AbstractContextManager
+from functools import cached_property, partial
+import threading
+from typing import Iterator
+import uuid
 
 from loguru import logger as lg
 
+from convo_craft.app.app_state import AppConversationState, AppState, AppWordsState
+from convo_craft.app.prefetch import WAIT_EXECUTOR, submit_in_context
+from convo_craft.app.puzzle import PuzzleWord, WordPuzzle
+from convo_craft.app.speculation import SpeculationSlot
+from convo_craft.app.topic_pool import get_topic_pool
 from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.model_routing import LLMComponent, ModelRouting
+from convo_craft.lesson.lesson import Lesson, LessonStep, new_lesson_id
+from convo_craft.lesson.lesson_builder import LessonBuilder
+from convo_craft.lesson.lesson_store import LessonStore, get_lesson_store
 from convo_craft.llm.conversation_generator import (
     CONVERSATION_SAMPLE,
     TOPIC_SAMPLE,
     ConversationGenerator,
     ConversationTurn,
 )
-from convo_craft.llm.paragraph_splitter import ParagraphSplitter
-from convo_craft.llm.topic_picker import OLD_TOPICS, TopicsPicker
-from convo_craft.llm.translator import Translator
+from convo_craft.llm.llm_metrics import LLMMetrics, track_session
+from convo_craft.llm.paragraph_splitter import (
+    ParagraphSplitter,
+    ParagraphSplitterResult,
+)
+from convo_craft.llm.rate_scheduler import PRIORITIES, CallPriority
+from convo_craft.llm.translator import Translator, TranslatorResult
+from convo_craft.text.split_paragraph import LocalParagraphSplitter
 from convo_craft.text.split_sentence import SentenceSplitter
 from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
 
 LANGUAGE_OPTIONS = ["Brazilian Portuguese"]
+NUM_TOPICS = 8
+"""Number of topics offered at once."""
 
 
 class AppLanguage:
@@ -47,25 +67,50 @@ class AppTopic:
         self,
         app: "App",
         understanding_level="intermediate",
+        topics: list[str] | None = None,
+        shown_topics: list[str] | None = None,
     ) -> None:
+        """Initialize the topic picker.
+
+        Args:
+            app (App): The app.
+            understanding_level (str): The understanding level of the user.
+            topics (list[str] | None): The topics to offer,
+                if None new topics are picked from the pool.
+            shown_topics (list[str] | None): The topics already shown to the user.
+        """
         # save reference to the app
         self.app = app
+        self.understanding_level = understanding_level
         # setup tools
-        self.tp = TopicsPicker(
-            chat_openai_config=self.app.struct_llm_config,
+        language = self.app.language.language
+        self.topic_pool = get_topic_pool(
+            language=language,
             understanding_level=understanding_level,
+            get_seed_topics=partial(
+                self.app.lesson_store.get_topics, language, understanding_level
+            ),
         )
+        self.shown_topics: set[str] = set(shown_topics or [])
         # init the topic
         self.topic = ""
         self.topic_index = None
         # generate the topics
-        self.generate_topics()
+        if topics is None:
+            self.generate_topics()
+        else:
+            self.set_topics(topics)
 
     def generate_topics(self) -> None:
-        """Generate topics."""
-        lg.info("Generating topics")
-        res = self.tp.invoke(OLD_TOPICS)
-        self.set_topics(res.topics)
+        """Pick new topics from the pool, which is refilled in the background."""
+        lg.info("Picking topics")
+        topics = self.topic_pool.take(
+            num_topics=NUM_TOPICS,
+            shown_topics=self.shown_topics,
+            chat_openai_config=self.app.get_llm_config("topic_picker"),
+        )
+        self.shown_topics.update(topics)
+        self.set_topics(topics)
 
     def set_topics(self, topics: list[str]) -> None:
         """Set the topics."""
@@ -93,71 +138,437 @@ class AppConversation:
     def __init__(
         self,
         app: "App",
+        prefetch: bool = True,
+        bundle: bool = False,
+        stream: bool = False,
+        lesson: Lesson | None = None,
     ) -> None:
-        """Initialize the conversation picker."""
+        """Initialize the conversation picker.
+
+        Args:
+            app (App): The app.
+            prefetch (bool): Translate and split all the turns in the background
+                as soon as they are generated.
+                The complete lesson is then saved in the lesson store.
+            bundle (bool): Generate the conversation, the translations and the splits
+                in a single call.
+            stream (bool): Start the conversation as soon as the first turn
+                is generated, while the other turns are still being generated.
+            lesson (Lesson | None): A stored lesson to play,
+                no LLM call is made if set.
+        """
+        if bundle and stream:
+            raise ValueError("The bundle and stream modes cannot be used together")
         # save reference to the app
         self.app = app
         # setup configuration
         self.topic = self.app.topic.topic
         self.language = self.app.language
-        # setup tools
-        self.setup_tools()
+        self.understanding_level = self.app.topic.understanding_level
+        self.lesson_id = new_lesson_id()
+        self.prefetch = prefetch
+        self.bundle = bundle
+        self.stream = stream
+        self.lesson = lesson
+        self.lesson_in_store = lesson is not None
+        """Whether the lesson played is in the lesson store, as is."""
+        self.conversation_step = 0
+        """The step being played, the prefetches rank the steps after it."""
         # generate the conversation
         self.generate_conversation()
         # init the conversation state
         self.done = False
 
-    def setup_tools(self) -> None:
-        self.cg = ConversationGenerator(
-            chat_openai_config=self.app.struct_llm_config,
+    # the tools are built on first use, a stored lesson needs none of them
+
+    @cached_property
+    def cg(self) -> ConversationGenerator:
+        return ConversationGenerator(
+            chat_openai_config=self.app.get_llm_config("conversation_generator"),
             language=self.language.language,
             num_messages=5,
             num_sentences=3,
-            understanding_level="intermediate",
+            understanding_level=self.understanding_level,
             conversation_sample=CONVERSATION_SAMPLE,
             topic_sample=TOPIC_SAMPLE,
+            translation_language="English",
         )
-        self.translator = Translator(
-            chat_openai_config=self.app.struct_llm_config,
+
+    @cached_property
+    def translator(self) -> Translator:
+        return Translator(
+            chat_openai_config=self.app.get_llm_config("translator"),
             source_language=self.language.language,
             target_language="English",
+            hedge=True,
+        )
+
+    @cached_property
+    def para_splitter(self) -> ParagraphSplitter:
+        return ParagraphSplitter(
+            chat_openai_config=self.app.get_llm_config("paragraph_splitter"),
+            local_splitter=LocalParagraphSplitter.for_language(self.language.language),
+            hedge=True,
         )
 
+    @cached_property
+    def sent_splitter(self) -> SentenceSplitter:
+        return SentenceSplitter()
+
+    def reset_steps(self) -> None:
+        """Reset the turns and the results for each step."""
+        self.conversation: list[ConversationTurn] = []
+        self.step_translations: list[TranslatorResult | None] = []
+        self.step_splits: list[ParagraphSplitterResult | None] = []
+        self.step_words: list[list[list[str]] | None] = []
+        self.translation_futures: dict[int, Future[TranslatorResult]] = {}
+        self.split_futures: dict[int, Future[ParagraphSplitterResult]] = {}
+        # the turns are added by the stream in the background
+        self.turns_cond = threading.Condition()
+        self.conversation_complete = False
+        self.stream_error: Exception | None = None
+
     def generate_conversation(self) -> None:
         """Generate a conversation."""
         lg.info("Generating conversation")
-        conv = self.cg.invoke(self.topic)
-        lg.debug(f"{conv=}")
-        self.conversation: list[ConversationTurn] = conv.turns
+        self.reset_steps()
+        if self.lesson is not None:
+            self.load_lesson(self.lesson)
+        elif self.bundle:
+            self.generate_bundle()
+        elif self.stream:
+            self.generate_stream()
+        else:
+            conv = self.cg.invoke(self.topic)
+            lg.debug(f"{conv=}")
+            for turn in conv.turns:
+                self.add_turn(turn)
+            self.conversation_complete = True
+            if self.prefetch:
+                self.prefetch_steps(list(range(len(self.conversation))))
+        if self.lesson is None and self.prefetch:
+            # the save waits on the prefetches, so it must not hold their workers
+            submit_in_context(self.save_lesson, executor=WAIT_EXECUTOR)
         self.set_conversation_step(0)
 
+    def load_lesson(self, lesson: Lesson) -> None:
+        """Load the turns and their results from a stored lesson."""
+        lg.info(f"Loading lesson {lesson.lesson_id}")
+        self.lesson_id = lesson.lesson_id
+        for step in lesson.steps:
+            self.add_turn(
+                step.to_conversation_turn(),
+                translation=step.get_translation(),
+                split=step.get_split_result(),
+                words=step.words,
+            )
+        self.conversation_complete = True
+
+    def build_lesson(self) -> Lesson:
+        """Build the complete lesson, waiting for all the steps."""
+        steps = []
+        conversation_step = 0
+        while self.wait_for_step(conversation_step):
+            split = self.get_step_split(conversation_step)
+            steps.append(
+                LessonStep(
+                    role=self.conversation[conversation_step].role,
+                    content=self.conversation[conversation_step].content,
+                    translation=self.get_step_translation(
+                        conversation_step
+                    ).target_text,
+                    portions=split.portions,
+                    words=self.get_step_words(conversation_step),
+                )
+            )
+            conversation_step += 1
+        return Lesson(
+            lesson_id=self.lesson_id,
+            language=self.language.language,
+            understanding_level=self.understanding_level,
+            topic=self.topic,
+            steps=steps,
+        )
+
+    def save_lesson(self) -> None:
+        """Save the complete lesson in the store, once all the steps are ready."""
+        try:
+            lesson = self.build_lesson()
+        except Exception as e:
+            lg.warning(f"Could not save lesson {self.lesson_id}: {e}")
+            return
+        if self.stream_error is None:
+            self.store_lesson(lesson)
+
+    def store_lesson(self, lesson: Lesson) -> bool:
+        """Add the lesson to the store, returning whether the store has it as is.
+
+        The lesson may have been stored already, with different results.
+        """
+        if not self.app.lesson_store.add(lesson):
+            self.lesson_in_store = self.app.lesson_store.get(lesson.lesson_id) == lesson
+        else:
+            self.lesson_in_store = True
+        return self.lesson_in_store
+
+    def generate_bundle(self) -> None:
+        """Generate the conversation, the translations and the splits at once.
+
+        The turns with invalid portions are split again with the paragraph splitter.
+        """
+        bundle = self.cg.invoke_bundle(self.topic)
+        lg.debug(f"{bundle=}")
+        for turn in bundle.turns:
+            self.add_turn(
+                turn.to_conversation_turn(),
+                translation=TranslatorResult(target_text=turn.translation),
+                split=turn.get_split_result(),
+            )
+        self.conversation_complete = True
+        if self.prefetch:
+            self.prefetch_steps(list(range(len(self.conversation))))
+
+    def generate_stream(self) -> None:
+        """Generate the conversation as a stream.
+
+        Return as soon as the first turn is available,
+        the other turns are added in the background.
+        """
+        turns = self.cg.stream(self.topic)
+        first_turn = next(turns, None)
+        if first_turn is None:
+            raise ValueError(f"Empty conversation for topic {self.topic}")
+        self.add_turn(first_turn)
+        if self.prefetch:
+            self.prefetch_steps([0])
+        submit_in_context(self.consume_stream, turns)
+
+    def consume_stream(self, turns: Iterator[ConversationTurn]) -> None:
+        """Add the remaining turns of the stream, prefetching each one."""
+        try:
+            for turn in turns:
+                step = self.add_turn(turn)
+                if self.prefetch:
+                    self.prefetch_steps([step])
+        except Exception as e:
+            lg.error(f"Conversation stream failed: {e}")
+            self.stream_error = e
+        with self.turns_cond:
+            self.conversation_complete = True
+            self.turns_cond.notify_all()
+
+    def add_turn(
+        self,
+        turn: ConversationTurn,
+        translation: TranslatorResult | None = None,
+        split: ParagraphSplitterResult | None = None,
+        words: list[list[str]] | None = None,
+    ) -> int:
+        """Add a turn to the conversation, returning its step."""
+        with self.turns_cond:
+            self.conversation.append(turn)
+            self.step_translations.append(translation)
+            self.step_splits.append(split)
+            self.step_words.append(words)
+            self.turns_cond.notify_all()
+            return len(self.conversation) - 1
+
+    def wait_for_step(self, conversation_step: int) -> bool:
+        """Wait until the turn of the step is generated.
+
+        Returns:
+            bool: True if the step exists, False if the conversation ended before it.
+        """
+        with self.turns_cond:
+            self.turns_cond.wait_for(
+                lambda: conversation_step < len(self.conversation)
+                or self.conversation_complete
+            )
+            if conversation_step < len(self.conversation):
+                return True
+        if self.stream_error is not None:
+            lg.warning(f"Conversation truncated at step {conversation_step}")
+        return False
+
+    def translate_steps(self, steps: list[int]) -> list[TranslatorResult]:
+        """Translate the turns of the steps in a single batch."""
+        source_texts = [self.conversation[step].content for step in steps]
+        batch = self.translator.invoke_batch(source_texts)
+        return [TranslatorResult(target_text=p.target_text) for p in batch.translations]
+
+    def prefetch_steps(self, steps: list[int]) -> None:
+        """Start translating and splitting the steps in the background.
+
+        The steps the learner is waiting for are translated apart,
+        the next ones in a single batch at prefetch priority,
+        the splits are submitted in conversation order,
+        so the first steps are the first to be ready.
+        Results that are already available are not requested again.
+        """
+        lg.info(f"Prefetching conversation steps {steps}")
+        to_translate = [step for step in steps if self.step_translations[step] is None]
+        for priority in PRIORITIES:
+            batch = [
+                step for step in to_translate if self.get_step_priority(step) == priority
+            ]
+            if not batch:
+                continue
+            futures = {step: Future() for step in batch}
+            self.translation_futures.update(futures)
+            submit_in_context(self.resolve_translations, futures, priority=priority)
+        for step in steps:
+            if self.step_splits[step] is None:
+                content = self.conversation[step].content
+                self.split_futures[step] = submit_in_context(
+                    self.para_splitter.invoke,
+                    content,
+                    priority=self.get_step_priority(step),
+                )
+
+    def get_step_priority(self, conversation_step: int) -> CallPriority:
+        """Get the priority of the calls of a step.
+
+        The learner is waiting for the current step, the next ones are prefetched.
+        """
+        if conversation_step <= self.conversation_step:
+            return "interactive"
+        return "prefetch"
+
+    def resolve_translations(
+        self,
+        futures: dict[int, Future[TranslatorResult]],
+    ) -> None:
+        """Translate the steps and set the result of their futures."""
+        try:
+            translations = self.translate_steps(list(futures))
+        except Exception as e:
+            for future in futures.values():
+                future.set_exception(e)
+            return
+        for future, translation in zip(futures.values(), translations):
+            future.set_result(translation)
+
+    def get_step_translation(self, conversation_step: int) -> TranslatorResult:
+        """Get the translation of a step, waiting for it if needed.
+
+        Without prefetching, all the known steps still missing a translation
+        are translated in a single batch.
+        """
+        translation = self.step_translations[conversation_step]
+        if translation is not None:
+            return translation
+        if conversation_step in self.translation_futures:
+            translation = self.translation_futures[conversation_step].result()
+            self.step_translations[conversation_step] = translation
+            return translation
+        steps = [
+            step
+            for step in range(conversation_step, len(self.conversation))
+            if self.step_translations[step] is None
+        ]
+        for step, translation in zip(steps, self.translate_steps(steps)):
+            self.step_translations[step] = translation
+        return self.step_translations[conversation_step]
+
+    def get_step_split(self, conversation_step: int) -> ParagraphSplitterResult:
+        """Get the split of a step, waiting for it if needed."""
+        step_split = self.step_splits[conversation_step]
+        if step_split is None:
+            if conversation_step in self.split_futures:
+                step_split = self.split_futures[conversation_step].result()
+            else:
+                content = self.conversation[conversation_step].content
+                step_split = self.para_splitter.invoke(content)
+            self.step_splits[conversation_step] = step_split
+        return step_split
+
+    def get_step_words(self, conversation_step: int) -> list[list[str]]:
+        """Get the words of each portion of a step."""
+        step_words = self.step_words[conversation_step]
+        if step_words is None:
+            portions = self.get_step_split(conversation_step).portions
+            step_words = list(self.sent_splitter.invoke_batch(portions).iter_words())
+            self.step_words[conversation_step] = step_words
+        return step_words
+
     def set_conversation_step(self, conversation_step: int) -> None:
-        """Set the conversation step."""
+        """Set the conversation step.
+
+        When prefetching, only wait if the results for this step are not ready yet.
+        """
         lg.info(f"Setting conversation step: {conversation_step}")
         self.conversation_step = conversation_step
         current_step = self.conversation[self.conversation_step].content
-        self.current_step_translation = self.translator.invoke(current_step)
-        self.words = AppWords(app=self.app, current_step=current_step)
+        self.current_step_translation = self.get_step_translation(
+            self.conversation_step
+        )
+        self.words = AppWords(
+            app=self.app,
+            current_step=current_step,
+            para_split_result=self.get_step_split(self.conversation_step),
+            portion_words=self.get_step_words(self.conversation_step),
+        )
 
     def next_conversation_step(self) -> None:
-        """Go to the next conversation step."""
-        if self.conversation_step == len(self.conversation) - 1:
+        """Go to the next conversation step.
+
+        When streaming, wait for the next turn if it is still being generated.
+        """
+        if not self.wait_for_step(self.conversation_step + 1):
             lg.info("Conversation is done")
             self.done = True
             return
         self.set_conversation_step(self.conversation_step + 1)
 
-    def receive_guess(self, shuf_si: int, shuf_wi: int) -> None:
-        """Receive a guess."""
-        self.words.receive_guess(shuf_si, shuf_wi)
+    def receive_guess(self, shuf_si: int, shuf_wi: int) -> bool:
+        """Receive a guess, returning whether it was correct."""
+        correct = self.words.receive_guess(shuf_si, shuf_wi)
         if self.words.done:
             self.next_conversation_step()
+        return correct
+
+    def dump_state(self) -> AppConversationState:
+        """Get the state of the conversation, waiting for the complete lesson.
+
+        The lesson is referenced by id if it is in the lesson store,
+        and only included in the state otherwise.
+        """
+        inline_lesson = None
+        if not self.lesson_in_store:
+            lesson = self.lesson if self.lesson is not None else self.build_lesson()
+            if self.stream_error is not None or not self.store_lesson(lesson):
+                inline_lesson = lesson
+        return AppConversationState(
+            lesson_id=self.lesson_id,
+            lesson=inline_lesson,
+            conversation_step=self.conversation_step,
+            done=self.done,
+            words=self.words.dump_state(),
+        )
 
-
-@dataclass
-class AppWordGuess:
-    word: str
-    state: str
+    @classmethod
+    def load_state(
+        cls,
+        app: "App",
+        state: AppConversationState,
+    ) -> "AppConversation":
+        """Rebuild a conversation from its state, without any LLM call.
+
+        Raises:
+            ValueError: If the lesson is neither in the state nor in the store.
+        """
+        lesson = state.lesson
+        if lesson is None:
+            lesson = app.lesson_store.get(state.lesson_id)
+        if lesson is None:
+            raise ValueError(f"Lesson {state.lesson_id} not found in the store")
+        conversation = cls(app=app, lesson=lesson)
+        conversation.lesson_in_store = state.lesson is None
+        if state.conversation_step != conversation.conversation_step:
+            conversation.set_conversation_step(state.conversation_step)
+        conversation.words.load_state(state.words)
+        conversation.done = state.done
+        return conversation
 
 
 class AppWords:
@@ -167,76 +578,128 @@ class AppWords:
         self,
         app: "App",
         current_step: str,
+        para_split_result: ParagraphSplitterResult,
+        portion_words: list[list[str]] | None = None,
+        seed: int | None = None,
     ) -> None:
-        """Initialize the app words."""
+        """Initialize the app words.
+
+        Args:
+            app (App): The app.
+            current_step (str): The paragraph of the current step.
+            para_split_result (ParagraphSplitterResult): The split paragraph.
+            portion_words (list[list[str]] | None): The words of each portion.
+                If None, the portions are split here.
+            seed (int | None): The seed of the shuffle, if None a random one.
+        """
         # save reference to the app
         self.app = app
-        # setup tools
-        self.para_splitter = ParagraphSplitter(
-            chat_openai_config=self.app.struct_llm_config,
-        )
-        self.sent_splitter = SentenceSplitter()
-        # split the paragraph into sentences and words
+        # split the sentences into words
         self.paragraph = current_step
-        self.para_split_result = self.para_splitter.invoke(self.paragraph)
+        self.para_split_result = para_split_result
         self.sentences = self.para_split_result.portions
-        self.sents_words: list[list[AppWordGuess]] = []
-        for sent in self.sentences:
-            words = self.sent_splitter.invoke(sent)
-            w_guess = [AppWordGuess(word=word, state="normal") for word in words]
-            self.sents_words.append(w_guess)
-        # init the user guess
-        self.current_sent = 0
-        self.current_word = 0
+        if portion_words is None:
+            splits = SentenceSplitter().invoke_batch(self.sentences)
+            portion_words = list(splits.iter_words())
+        self.portion_words = portion_words
         # shuffle the words
-        self.shuffle_words()
-        # set the done flag
-        self.done = False
-        # accumulate the correct words as they are guessed
-        self.sent_guessed = ""
+        self.puzzle = WordPuzzle(portion_words, seed=seed)
+
+    @property
+    def done(self) -> bool:
+        return self.puzzle.done
+
+    @property
+    def current_sent(self) -> int:
+        return self.puzzle.current_sent
 
-    def shuffle_words(self) -> None:
-        """Shuffle the words."""
-        self.words_shuffled: list[list[AppWordGuess]] = []
-        for sent_words in self.sents_words:
-            words_shuffled = sent_words.copy()
-            random.shuffle(words_shuffled)
-            self.words_shuffled.append(words_shuffled)
+    @property
+    def current_word(self) -> int:
+        return self.puzzle.current_word
+
+    @property
+    def expected_word(self) -> str:
+        """The next word to guess."""
+        return self.puzzle.expected_word
+
+    @property
+    def sent_guessed(self) -> str:
+        """The correct words guessed so far."""
+        return self.puzzle.get_sent_guessed()
+
+    @property
+    def words_shuffled(self) -> list[list[PuzzleWord]]:
+        """The shuffled words of each portion, with their state."""
+        return [
+            self.puzzle.get_shuffled_words(si) for si in range(self.puzzle.num_sents)
+        ]
+
+    def get_shuffled_words(self, shuf_si: int) -> list[PuzzleWord]:
+        """Get the shuffled words of a portion, with their state."""
+        return self.puzzle.get_shuffled_words(shuf_si)
 
     def receive_guess(self, shuf_si: int, shuf_wi: int) -> bool:
         """Receive a guess."""
-        # grab the guessed word from the shuffled list
-        guess = self.words_shuffled[shuf_si][shuf_wi]
-        lg.debug(f"Received guess: {guess} at {shuf_si}, {shuf_wi}")
-        # grab the current word
-        current_word = self.sents_words[self.current_sent][self.current_word]
-        # check if the guess is wrong
-        if not guess.word == current_word.word:
-            guess.state = "wrong"
-            lg.debug(f"Wrong guess: {guess} != {current_word}")
-            return False
-        # mark the word as correct
-        current_word.state = "correct"
-        # move to the next word
-        self.current_word += 1
-        if self.current_word == len(self.sents_words[self.current_sent]):
-            self.current_sent += 1
-            self.current_word = 0
-        # check if done
-        if self.current_sent == len(self.sents_words):
+        correct = self.puzzle.guess(shuf_si, shuf_wi)
+        lg.debug(f"Received guess at {shuf_si}, {shuf_wi}: {correct=}")
+        if self.done:
             lg.success("All words guessed correctly")
-            self.done = True
-        # add the word to the guessed sentence
-        self.sent_guessed += f"{guess.word} "
-        lg.debug(f"Right guess: {guess} == {current_word}")
-        return True
+        return correct
+
+    def undo_guess(self) -> bool:
+        """Undo the last guess of the step, returning False if there is none."""
+        return self.puzzle.undo()
+
+    def dump_state(self) -> AppWordsState:
+        """Get the guessing state, with the shuffle seed."""
+        return AppWordsState(puzzle=self.puzzle.to_bytes())
+
+    def load_state(self, state: AppWordsState) -> None:
+        """Restore the guessing state of the same step."""
+        self.puzzle = WordPuzzle.from_bytes(self.portion_words, state.puzzle)
 
 
 class App:
     """An app for the Convo Craft project."""
 
-    def __init__(self) -> None:
-        """Initialize the app."""
+    def __init__(
+        self,
+        lesson_store: LessonStore | None = None,
+        user_id: str | None = None,
+        chat_openai_config: ChatOpenAIConfig | None = None,
+        model_routing: ModelRouting | None = None,
+        speculate: bool = False,
+    ) -> None:
+        """Initialize the app.
+
+        Args:
+            lesson_store (LessonStore | None): The store to serve the lessons from,
+                if None the process-wide store is used.
+            user_id (str | None): The id of the user, to track the seen lessons.
+                If None, a new id is generated.
+            chat_openai_config (ChatOpenAIConfig | None): The base LLM config,
+                the API key entered by the user is added to it.
+                If None, the default config is used.
+                Use a config with ``FAKE_MODEL`` to run without network.
+            model_routing (ModelRouting | None): The model of each llm component,
+                if None all the components use the base config.
+            speculate (bool): While a conversation is played, build the lesson
+                of the predicted next topic in the background.
+        """
+        if lesson_store is None:
+            lesson_store = get_lesson_store()
+        self.lesson_store = lesson_store
+        self.user_id = user_id if user_id else uuid.uuid4().hex
+        if chat_openai_config is None:
+            chat_openai_config = ChatOpenAIConfig()
+        self.base_llm_config = chat_openai_config
+        self.model_routing = model_routing if model_routing else ModelRouting()
+        self.llm_metrics = LLMMetrics()
+        """The metrics of the LLM calls made for this session."""
+        self.speculation = (
+            SpeculationSlot(lesson_store, self.user_id) if speculate else None
+        )
+        """The lesson of the predicted next topic, if speculating."""
         self.reset_openai_api_key()
         self.reset_language()
 
@@ -245,16 +708,40 @@ class App:
         self.openai_api_key = convert_to_secret_str_v2("not set")
         self.openai_api_key_is_set = False
 
+    def track_llm_metrics(self) -> AbstractContextManager[LLMMetrics]:
+        """Record the LLM calls made in this context in the session metrics.
+
+        The background tasks submitted in the context are recorded too.
+        """
+        return track_session(self.llm_metrics)
+
     def set_openai_api_key(self, openai_api_key: str) -> None:
-        """Set the OpenAI API key."""
+        """Set the OpenAI API key.
+
+        The first topics are offered if the session has none yet,
+        a restored session keeps its topics and its conversation.
+        """
         self.openai_api_key = convert_to_secret_str_v2(openai_api_key)
         self.openai_api_key_is_set = True
         self.set_llm_config()
-        self.reset_topic()
+        if hasattr(self, "topic"):
+            return
+        with self.track_llm_metrics():
+            self.reset_topic()
 
     def set_llm_config(self) -> None:
-        """Set the LLM config."""
-        self.struct_llm_config = ChatOpenAIConfig(api_key=self.openai_api_key)
+        """Set the LLM config.
+
+        The models are shared by all the apps with the same config,
+        through the chat model registry.
+        """
+        self.struct_llm_config = self.base_llm_config.model_copy(
+            update={"api_key": self.openai_api_key}
+        )
+
+    def get_llm_config(self, component: LLMComponent) -> ChatOpenAIConfig:
+        """Get the LLM config of a component, following the model routing."""
+        return self.model_routing.get_config(component, self.struct_llm_config)
 
     def reset_language(self) -> None:
         """Reset the language."""
@@ -265,12 +752,148 @@ class App:
         self.topic = AppTopic(self)
 
     def set_topic_by_value(self, topic: str) -> None:
-        """Set the topic."""
+        """Set the topic.
+
+        Serve the speculated lesson about the topic, or an unseen stored lesson
+        if there is one, otherwise generate a new conversation.
+        """
         self.topic.set_topic_by_value(topic)
-        self.conversation = AppConversation(app=self)
+        lesson = None
+        if self.speculation is not None:
+            lesson = self.speculation.take(topic)
+            if lesson is not None:
+                self.lesson_store.add(lesson)
+        if lesson is None:
+            lesson = self.lesson_store.sample_unseen(
+                user_id=self.user_id,
+                language=self.language.language,
+                understanding_level=self.topic.understanding_level,
+                topic=topic,
+            )
+        if lesson is None:
+            lg.info(f"No stored lesson about {topic}, generating one")
+        with self.track_llm_metrics():
+            self.conversation = AppConversation(app=self, lesson=lesson)
+        self.lesson_store.mark_seen(self.user_id, self.conversation.lesson_id)
+        if self.speculation is not None:
+            self.speculate_next_topic()
+
+    def predict_next_topic(self) -> str | None:
+        """Predict the topic the user picks next: the one after the current topic."""
+        topics = self.topic.topics
+        if self.topic.topic_index is None or len(topics) < 2:
+            return None
+        return topics[(self.topic.topic_index + 1) % len(topics)]
+
+    def speculate_next_topic(self) -> bool:
+        """Build the lesson of the predicted next topic in the background.
+
+        Returns:
+            bool: Whether a speculation is running for the topic.
+        """
+        if self.speculation is None:
+            return False
+        topic = self.predict_next_topic()
+        if topic is None:
+            return False
+        builder = LessonBuilder(
+            chat_openai_config=self.struct_llm_config,
+            language=self.language.language,
+            understanding_level=self.topic.understanding_level,
+            model_routing=self.model_routing,
+        )
+        return self.speculation.speculate(builder, topic)
 
-    def receive_guess(self, shuf_si: int, shuf_wi: int) -> None:
-        """Receive a guess."""
-        self.conversation.receive_guess(shuf_si, shuf_wi)
+    def receive_guess(self, shuf_si: int, shuf_wi: int) -> bool:
+        """Receive a guess, returning whether it was correct."""
+        with self.track_llm_metrics():
+            correct = self.conversation.receive_guess(shuf_si, shuf_wi)
         if self.conversation.done:
             lg.success("Conversation is done")
+        return correct
+
+    def dump_state(self) -> AppState:
+        """Get the state of the session.
+
+        If a conversation is being played, wait until its lesson is complete.
+        """
+        state = AppState(user_id=self.user_id)
+        state.language_index = self.language.language_index
+        if hasattr(self, "topic"):
+            state.understanding_level = self.topic.understanding_level
+            state.topics = self.topic.topics
+            state.shown_topics = sorted(self.topic.shown_topics)
+            state.topic_index = self.topic.topic_index
+        if hasattr(self, "conversation"):
+            state.conversation = self.conversation.dump_state()
+        return state
+
+    @classmethod
+    def load_state(
+        cls,
+        state: AppState,
+        lesson_store: LessonStore | None = None,
+        chat_openai_config: ChatOpenAIConfig | None = None,
+        model_routing: ModelRouting | None = None,
+        api_key: str | None = None,
+    ) -> "App":
+        """Rebuild an app from the state of a session, without any LLM call.
+
+        Args:
+            state (AppState): The state of the session.
+            lesson_store (LessonStore | None): The store to serve the lessons from.
+            chat_openai_config (ChatOpenAIConfig | None): The base LLM config.
+            model_routing (ModelRouting | None): The model of each llm component.
+            api_key (str | None): The API key of the user, not part of the state.
+                If None, the progress is restored and the key must be set again.
+                A session without topics yet is offered its first ones.
+        """
+        app = cls(
+            lesson_store=lesson_store,
+            user_id=state.user_id,
+            chat_openai_config=chat_openai_config,
+            model_routing=model_routing,
+        )
+        app.language.set_language_index(state.language_index)
+        if state.topics:
+            app.topic = AppTopic(
+                app,
+                understanding_level=state.understanding_level,
+                topics=state.topics,
+                shown_topics=state.shown_topics,
+            )
+            app.topic.set_topic_by_index(state.topic_index)
+        if state.conversation is not None:
+            app.conversation = AppConversation.load_state(app, state.conversation)
+        if api_key is not None:
+            app.set_openai_api_key(api_key)
+        return app
+
+    def snapshot(self) -> bytes:
+        """Get a compact snapshot of the session, to restore it later.
+
+        A stored lesson is referenced by id, and the guesses are packed,
+        so the snapshot holds only the progress of the session.
+        """
+        return self.dump_state().model_dump_json(exclude_defaults=True).encode()
+
+    @classmethod
+    def restore(
+        cls,
+        snapshot: bytes,
+        lesson_store: LessonStore | None = None,
+        chat_openai_config: ChatOpenAIConfig | None = None,
+        model_routing: ModelRouting | None = None,
+        api_key: str | None = None,
+    ) -> "App":
+        """Rebuild an app from a snapshot, reading the lesson from the store.
+
+        The LLM components are only built if the session needs them again.
+        """
+        return cls.load_state(
+            AppState.model_validate_json(snapshot),
+            lesson_store=lesson_store,
+            chat_openai_config=chat_openai_config,
+            model_routing=model_routing,
+            api_key=api_key,
+        )
@@ -0,0 +1,45 @@
+"""Serializable state of an app session.
+
+The state is enough to rebuild the app in any process,
+so the sessions can be stored outside of the process serving them.
+The API key of the user is not part of the state, it is never stored:
+it is given again to rebuild an app that needs the LLM.
+"""
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from convo_craft.lesson.lesson import Lesson
+
+
+class AppWordsState(BaseModel):
+    """The guessing state of the current step."""
+
+    model_config = ConfigDict(ser_json_bytes="base64", val_json_bytes="base64")
+
+    puzzle: bytes = Field(description="The shuffle seed and the word states, packed")
+
+
+class AppConversationState(BaseModel):
+    """The state of the conversation being played."""
+
+    lesson_id: str = Field(description="The id of the lesson being played")
+    lesson: Lesson | None = Field(
+        default=None,
+        description="The complete lesson, only if it is not in the lesson store",
+    )
+    conversation_step: int
+    done: bool
+    words: AppWordsState
+
+
+class AppState(BaseModel):
+    """The state of an app session."""
+
+    user_id: str
+    language_index: int = 0
+    understanding_level: str = "intermediate"
+    topics: list[str] = Field(default_factory=list)
+    shown_topics: list[str] = Field(default_factory=list)
+    topic_index: int | None = None
+    conversation: AppConversationState | None = None
+
@@ -0,0 +1,46 @@
+"""Shared executor for the background work of the app."""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
+from typing import Any, Callable, TypeVar
+
+from convo_craft.llm.rate_scheduler import CallPriority, call_priority
+
+T = TypeVar("T")
+
+PREFETCH_MAX_WORKERS = 16
+"""Maximum number of background LLM calls shared by all the sessions."""
+PREFETCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=PREFETCH_MAX_WORKERS,
+    thread_name_prefix="convo_craft_prefetch",
+)
+WAIT_MAX_WORKERS = 64
+"""Maximum number of background tasks waiting on the prefetches at the same time."""
+WAIT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=WAIT_MAX_WORKERS,
+    thread_name_prefix="convo_craft_wait",
+)
+"""Executor of the tasks waiting on the prefetch tasks, like the lesson saves.
+
+They never hold a prefetch worker, so the prefetches they wait on can always run.
+"""
+
+
+def submit_in_context(
+    fn: Callable[..., T],
+    *args: Any,
+    priority: CallPriority = "prefetch",
+    executor: ThreadPoolExecutor = PREFETCH_EXECUTOR,
+) -> Future[T]:
+    """Submit a task to a shared executor, in a copy of the current context.
+
+    The task sees the context variables of the caller, like the session metrics.
+    Its LLM calls are made with the priority class,
+    so the background work does not delay the interactive calls.
+    A task waiting on the futures of the prefetch executor
+    must be submitted to ``WAIT_EXECUTOR``, or it could hold the workers
+    the futures need to run.
+    """
+    ctx = contextvars.copy_context()
+    ctx.run(call_priority.set, priority)
+    return executor.submit(ctx.run, fn, *args)
@@ -0,0 +1,201 @@
+"""The word puzzle of a conversation step, stored in flat arrays.
+
+The words of all the portions are laid out in a single flat sequence,
+each word as an integer id in the vocabulary of the step.
+The shuffled buttons of each portion are a permutation of its positions,
+generated from a seed, and the state of each button is a small integer.
+A guess is checked in constant time, and the identical words
+of a portion are interchangeable: either button is accepted.
+"""
+
+from array import array
+import random
+import struct
+from typing import Iterable, NamedTuple
+
+NORMAL = 0
+WRONG = 1
+CORRECT = 2
+STATE_NAMES = ("normal", "wrong", "correct")
+"""The name of each state code, used to style the buttons."""
+
+SEED_FORMAT = "<I"
+"""The shuffle seed at the start of the packed state."""
+
+
+class PuzzleWord(NamedTuple):
+    """A button of the puzzle, for display."""
+
+    word: str
+    state: str
+
+
+class WordPuzzle:
+    """Put the shuffled words of each portion back in order."""
+
+    def __init__(self, portion_words: list[list[str]], seed: int | None = None) -> None:
+        """Initialize the puzzle, shuffling the words of each portion.
+
+        Args:
+            portion_words (list[list[str]]): The words of each portion, in order.
+            seed (int | None): The seed of the shuffle, if None a random one.
+        """
+        self.vocab: list[str] = []
+        vocab_ids: dict[str, int] = {}
+        self.word_ids = array("I")
+        """The word id at each position, in sentence order."""
+        self.sent_starts = array("I", [0])
+        """The first position of each portion, and the number of words at the end."""
+        for words in portion_words:
+            for word in words:
+                if word not in vocab_ids:
+                    vocab_ids[word] = len(self.vocab)
+                    self.vocab.append(word)
+                self.word_ids.append(vocab_ids[word])
+            self.sent_starts.append(len(self.word_ids))
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.perm = self.build_perm(self.seed)
+        """The sentence position of the word at each shuffled position."""
+        self.reset()
+
+    def build_perm(self, seed: int) -> array:
+        """Shuffle the positions within each portion."""
+        rng = random.Random(seed)
+        perm = array("I")
+        for start, end in zip(self.sent_starts, self.sent_starts[1:]):
+            positions = list(range(start, end))
+            rng.shuffle(positions)
+            perm.extend(positions)
+        return perm
+
+    def reset(self) -> None:
+        """Clear all the guesses."""
+        self.states = bytearray(len(self.word_ids))
+        """The state of the button at each shuffled position."""
+        self.cursor = 0
+        """The sentence position of the next word to guess."""
+        self.current_sent = 0
+        self.history = array("I")
+        """The shuffled position and the previous state of each guess, packed."""
+
+    @property
+    def num_words(self) -> int:
+        return len(self.word_ids)
+
+    @property
+    def num_sents(self) -> int:
+        return len(self.sent_starts) - 1
+
+    @property
+    def done(self) -> bool:
+        """Whether all the words are guessed."""
+        return self.cursor == self.num_words
+
+    @property
+    def current_word(self) -> int:
+        """The index of the next word to guess in the current portion."""
+        return self.cursor - self.sent_starts[self.current_sent]
+
+    @property
+    def expected_word(self) -> str:
+        """The next word to guess."""
+        return self.vocab[self.word_ids[self.cursor]]
+
+    def get_pos(self, shuf_si: int, shuf_wi: int) -> int:
+        """Get the flat shuffled position of a button."""
+        return self.sent_starts[shuf_si] + shuf_wi
+
+    def guess(self, shuf_si: int, shuf_wi: int) -> bool:
+        """Guess a button of the current portion.
+
+        Any button of the portion with the expected word and not guessed yet
+        is correct. Guessing a button already correct changes nothing.
+
+        Returns:
+            bool: Whether the guess was correct.
+        """
+        return self.guess_pos(self.get_pos(shuf_si, shuf_wi))
+
+    def guess_pos(self, pos: int) -> bool:
+        """Guess the button at a flat shuffled position."""
+        state = self.states[pos]
+        if state == CORRECT or self.done:
+            return False
+        self.history.append(pos << 2 | state)
+        correct = (
+            self.sent_starts[self.current_sent]
+            <= pos
+            < self.sent_starts[self.current_sent + 1]
+            and self.word_ids[self.perm[pos]] == self.word_ids[self.cursor]
+        )
+        if not correct:
+            self.states[pos] = WRONG
+            return False
+        self.states[pos] = CORRECT
+        self.cursor += 1
+        if self.cursor == self.sent_starts[self.current_sent + 1] and not self.done:
+            self.current_sent += 1
+        return True
+
+    def undo(self) -> bool:
+        """Undo the last guess, returning False if there is none."""
+        if not self.history:
+            return False
+        entry = self.history.pop()
+        pos, state = entry >> 2, entry & 3
+        if self.states[pos] == CORRECT:
+            if self.cursor == self.sent_starts[self.current_sent] and self.cursor:
+                self.current_sent -= 1
+            self.cursor -= 1
+        self.states[pos] = state
+        return True
+
+    def replay(self, positions: Iterable[int]) -> None:
+        """Apply the guesses at these flat shuffled positions, in order."""
+        for pos in positions:
+            self.guess_pos(pos)
+
+    def get_guess_positions(self) -> list[int]:
+        """Get the flat shuffled positions of all the guesses, in order."""
+        return [entry >> 2 for entry in self.history]
+
+    def get_sent_guessed(self) -> str:
+        """Get the words guessed so far, each followed by a space."""
+        return "".join(f"{self.vocab[i]} " for i in self.word_ids[: self.cursor])
+
+    def get_shuffled_words(self, shuf_si: int) -> list[PuzzleWord]:
+        """Get the buttons of a portion, in shuffled order."""
+        start, end = self.sent_starts[shuf_si], self.sent_starts[shuf_si + 1]
+        return [
+            PuzzleWord(
+                self.vocab[self.word_ids[self.perm[pos]]],
+                STATE_NAMES[self.states[pos]],
+            )
+            for pos in range(start, end)
+        ]
+
+    def to_bytes(self) -> bytes:
+        """Pack the seed and the states, two bits per button."""
+        packed = bytearray((self.num_words + 3) // 4)
+        for pos, state in enumerate(self.states):
+            packed[pos >> 2] |= state << ((pos & 3) * 2)
+        return struct.pack(SEED_FORMAT, self.seed) + bytes(packed)
+
+    @classmethod
+    def from_bytes(cls, portion_words: list[list[str]], data: bytes) -> "WordPuzzle":
+        """Rebuild a puzzle from the words and the packed state.
+
+        The undo history is not part of the packed state.
+        """
+        (seed,) = struct.unpack_from(SEED_FORMAT, data)
+        puzzle = cls(portion_words, seed=seed)
+        packed = data[struct.calcsize(SEED_FORMAT) :]
+        for pos in range(puzzle.num_words):
+            puzzle.states[pos] = packed[pos >> 2] >> ((pos & 3) * 2) & 3
+        puzzle.cursor = puzzle.states.count(CORRECT)
+        while (
+            puzzle.current_sent < puzzle.num_sents - 1
+            and puzzle.cursor >= puzzle.sent_starts[puzzle.current_sent + 1]
+        ):
+            puzzle.current_sent += 1
+        return puzzle
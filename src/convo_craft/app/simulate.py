@@ -0,0 +1,52 @@
+"""Drive the app like a user would, for the benchmarks and the tests.
+
+The user only clicks on the shuffled words shown for the current portion,
+like in the web app.
+"""
+
+from convo_craft.app.app import App
+
+
+def find_correct_guess(app: App) -> tuple[int, int]:
+    """Find the shuffled word the user should click next.
+
+    Returns:
+        tuple[int, int]: The portion and the shuffled word indexes.
+    """
+    words = app.conversation.words
+    si = words.current_sent
+    expected = words.expected_word
+    for wi, word in enumerate(words.get_shuffled_words(si)):
+        if word.word == expected and word.state != "correct":
+            return si, wi
+    raise ValueError(f"No shuffled word matches {expected!r}")
+
+
+def play_conversation(
+    app: App,
+    num_wrong_guesses: int = 0,
+    max_guesses: int = 10_000,
+) -> int:
+    """Guess all the words of the conversation, step by step.
+
+    Args:
+        app (App): The app, with a conversation started.
+        num_wrong_guesses (int): Wrong guesses to make before each portion.
+        max_guesses (int): Stop after this many guesses, to avoid looping forever.
+
+    Returns:
+        int: The number of guesses made.
+    """
+    num_guesses = 0
+    while not app.conversation.done and num_guesses < max_guesses:
+        words = app.conversation.words
+        si, wi = find_correct_guess(app)
+        if words.current_word == 0:
+            shuffled = words.get_shuffled_words(si)
+            wrong = [i for i, w in enumerate(shuffled) if w.word != shuffled[wi].word]
+            for wrong_wi in wrong[:num_wrong_guesses]:
+                app.receive_guess(si, wrong_wi)
+                num_guesses += 1
+        app.receive_guess(si, wi)
+        num_guesses += 1
+    return num_guesses
@@ -0,0 +1,138 @@
+"""Speculative generation of the next lesson of a session."""
+
+from concurrent.futures import Future
+import threading
+
+from loguru import logger as lg
+
+from convo_craft.app.prefetch import submit_in_context
+from convo_craft.lesson.lesson import Lesson
+from convo_craft.lesson.lesson_builder import LessonBuilder
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.llm_metrics import LLMMetrics, track_session
+
+MAX_WASTED_TOKENS = 20_000
+"""Stop speculating in a session once the unused speculations cost this many tokens."""
+
+
+class SpeculationSlot:
+    """A slot for the lesson of the topic the user is predicted to pick next.
+
+    The slot holds a single speculation, built in the background
+    with its own metrics, so its cost is known.
+    A hit hands the lesson over, a miss discards it:
+    a speculation not started yet is cancelled, a running one is left to finish
+    and its lesson is added to the store, to serve the other sessions.
+    Once the discarded speculations cost ``max_wasted_tokens``,
+    the slot stops speculating.
+    """
+
+    def __init__(
+        self,
+        lesson_store: LessonStore,
+        user_id: str,
+        max_wasted_tokens: int = MAX_WASTED_TOKENS,
+    ) -> None:
+        """Initialize an empty slot.
+
+        Args:
+            lesson_store (LessonStore): The store to check for existing lessons,
+                and to add the discarded lessons to.
+            user_id (str): The user of the session, whose unseen lessons
+                are served before any speculation.
+            max_wasted_tokens (int): The cost cap of the discarded speculations.
+        """
+        self.lesson_store = lesson_store
+        self.user_id = user_id
+        self.max_wasted_tokens = max_wasted_tokens
+        self._lock = threading.Lock()
+        self.topic: str | None = None
+        self.future: Future[Lesson] | None = None
+        self.metrics = LLMMetrics()
+        """The metrics of the current speculation."""
+        self.wasted_tokens = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def over_budget(self) -> bool:
+        """Whether the discarded speculations cost too much to keep speculating."""
+        return self.wasted_tokens >= self.max_wasted_tokens
+
+    def speculate(self, builder: LessonBuilder, topic: str) -> bool:
+        """Start building the lesson about the topic, returning whether it started.
+
+        Nothing is started if the store has a lesson about the topic
+        the user has not seen,
+        or if the slot is over budget. A previous speculation is discarded.
+        """
+        if self.topic == topic:
+            return True
+        self.discard()
+        if self.over_budget:
+            lg.info("Speculation budget exhausted, not speculating")
+            return False
+        if self.lesson_store.has_unseen(
+            user_id=self.user_id,
+            language=builder.language,
+            understanding_level=builder.understanding_level,
+            topic=topic,
+        ):
+            return False
+        lg.info(f"Speculating the lesson about {topic}")
+        metrics = LLMMetrics()
+        with self._lock:
+            self.topic = topic
+            self.metrics = metrics
+            self.future = submit_in_context(
+                self._build, builder, topic, metrics, priority="bulk"
+            )
+        return True
+
+    def _build(self, builder: LessonBuilder, topic: str, metrics: LLMMetrics) -> Lesson:
+        """Build the lesson, recording its calls in the speculation metrics."""
+        with track_session(metrics):
+            return builder.build(topic)
+
+    def take(self, topic: str) -> Lesson | None:
+        """Take the lesson about the topic, if it was speculated.
+
+        Wait for the speculation if it is still running.
+        Any other speculation is discarded.
+        """
+        with self._lock:
+            hit = self.topic == topic and self.future is not None
+            future = self.future if hit else None
+            if hit:
+                self.topic, self.future = None, None
+        if future is None:
+            self.discard()
+            return None
+        try:
+            lesson = future.result()
+        except Exception as e:
+            lg.warning(f"Speculation about {topic} failed: {e!r}")
+            return None
+        self.hits += 1
+        lg.info(f"Speculation hit for {topic}")
+        return lesson
+
+    def discard(self) -> None:
+        """Discard the current speculation, if any."""
+        with self._lock:
+            future, metrics = self.future, self.metrics
+            self.topic, self.future = None, None
+        if future is None:
+            return
+        self.misses += 1
+        if future.cancel():
+            return
+        future.add_done_callback(lambda f: self._waste(f, metrics))
+
+    def _waste(self, future: Future[Lesson], metrics: LLMMetrics) -> None:
+        """Count the cost of a discarded speculation, and keep its lesson."""
+        total = metrics.get_total()
+        with self._lock:
+            self.wasted_tokens += total.prompt_tokens + total.completion_tokens
+        if future.exception() is None:
+            self.lesson_store.add(future.result())
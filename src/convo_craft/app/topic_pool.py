@@ -0,0 +1,156 @@
+"""Pools of topics, served instantly and refilled in the background."""
+
+import random
+import threading
+from typing import Callable
+
+from loguru import logger as lg
+
+from convo_craft.app.prefetch import submit_in_context
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.topic_picker import OLD_TOPICS, TopicsPicker
+from convo_craft.text.topic_index import TopicIndex
+
+LOW_WATER_MARK = 8
+"""Refill the pool when a session has fewer unseen topics than this."""
+MAX_POOL_SIZE = 2000
+"""Stop refilling the pool when it has this many topics."""
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalize a topic, to find duplicates."""
+    return " ".join(topic.lower().strip(" .!?").split())
+
+
+class TopicPool:
+    """A pool of topics for a language and understanding level.
+
+    The pool is shared by all the sessions: each session takes the topics
+    it has not been shown yet, and a refill is started in the background
+    when too few are left.
+    """
+
+    def __init__(
+        self,
+        language: str,
+        understanding_level: str,
+        seed_topics: list[str] | None = None,
+        low_water_mark: int = LOW_WATER_MARK,
+    ) -> None:
+        """Initialize the pool.
+
+        Args:
+            language (str): The language of the topics.
+            understanding_level (str): The understanding level of the topics.
+            seed_topics (list[str] | None): The topics available right away.
+            low_water_mark (int): Refill the pool when a session has fewer
+                unseen topics than this.
+        """
+        self.language = language
+        self.understanding_level = understanding_level
+        self.low_water_mark = low_water_mark
+        self._lock = threading.Lock()
+        self.topics: list[str] = []
+        self._known: set[str] = set()
+        self.topic_index = TopicIndex()
+        self.refilling = False
+        self.add_topics(seed_topics or [])
+
+    def add_topics(self, topics: list[str]) -> int:
+        """Add the new topics, skipping the duplicates.
+
+        Returns:
+            int: The number of topics added.
+        """
+        num_added = 0
+        with self._lock:
+            for topic in topics:
+                norm_topic = normalize_topic(topic)
+                if not norm_topic or norm_topic in self._known:
+                    continue
+                self._known.add(norm_topic)
+                self.topics.append(topic)
+                num_added += 1
+        self.topic_index.add_many(topics)
+        return num_added
+
+    def take(
+        self,
+        num_topics: int,
+        shown_topics: set[str],
+        chat_openai_config: ChatOpenAIConfig | None = None,
+    ) -> list[str]:
+        """Take some topics not shown yet, without waiting for the network.
+
+        If too few topics are left, a refill is started in the background.
+        If all the topics were shown, the shown ones are offered again.
+
+        Args:
+            num_topics (int): The number of topics to take.
+            shown_topics (set[str]): The topics already shown to the session.
+            chat_openai_config (ChatOpenAIConfig | None): The config to refill
+                the pool with, if None the pool is not refilled.
+        """
+        with self._lock:
+            unseen = [t for t in self.topics if t not in shown_topics]
+            all_topics = list(self.topics)
+        if len(unseen) - num_topics < self.low_water_mark and chat_openai_config:
+            self.request_refill(chat_openai_config)
+        if not unseen:
+            unseen = all_topics
+        return random.sample(unseen, k=min(num_topics, len(unseen)))
+
+    def request_refill(self, chat_openai_config: ChatOpenAIConfig) -> None:
+        """Start a refill in the background, unless one is already running."""
+        with self._lock:
+            if self.refilling or len(self.topics) >= MAX_POOL_SIZE:
+                return
+            self.refilling = True
+        submit_in_context(self.refill, chat_openai_config)
+
+    def refill(self, chat_openai_config: ChatOpenAIConfig) -> None:
+        """Generate new topics and add them to the pool."""
+        try:
+            tp = TopicsPicker(
+                chat_openai_config=chat_openai_config,
+                understanding_level=self.understanding_level,
+                use_cache=False,
+                topic_index=self.topic_index,
+            )
+            # the pool topics are already in the shared index
+            res = tp.invoke([])
+            num_added = self.add_topics(res.topics)
+            lg.info(f"Added {num_added} topics to the {self.language} pool")
+        except Exception as e:
+            lg.warning(f"Could not refill the {self.language} topic pool: {e}")
+        finally:
+            with self._lock:
+                self.refilling = False
+
+
+_pools: dict[tuple[str, str], TopicPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_topic_pool(
+    language: str,
+    understanding_level: str,
+    get_seed_topics: Callable[[], list[str]] | None = None,
+) -> TopicPool:
+    """Get the process-wide topic pool for a language and level.
+
+    A new pool is seeded with the sample topics and the given ones,
+    usually the topics of the stored lessons.
+
+    Args:
+        language (str): The language of the topics.
+        understanding_level (str): The understanding level of the topics.
+        get_seed_topics (Callable[[], list[str]] | None): Get the topics
+            to seed a new pool with, only called when the pool is created.
+    """
+    with _pools_lock:
+        key = (language, understanding_level)
+        if key not in _pools:
+            seeds = (get_seed_topics() if get_seed_topics else []) + OLD_TOPICS
+            _pools[key] = TopicPool(language, understanding_level, seed_topics=seeds)
+        return _pools[key]
@@ -1,20 +1,37 @@
 """Chat OpenAI configuration.
 
 These are the default configuration settings for the OpenAI chat model.
+The same config can select a model served by a local Ollama-compatible endpoint.
 """
 
-from langchain_core.utils.utils import secret_from_env
+import os
+from typing import Literal
+
 from pydantic import BaseModel, Field, SecretStr
 
 
+def get_env_api_key() -> SecretStr | None:
+    """Get the OpenAI API key from the environment, if set."""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    return None if api_key is None else SecretStr(api_key)
+
+
 class ChatOpenAIConfig(BaseModel):
     model: str = Field(default="gpt-4o-mini")
     """Model name to use."""
     temperature: float = 0.2
     """What sampling temperature to use."""
     api_key: SecretStr | None = Field(
-        default_factory=secret_from_env("OPENAI_API_KEY", default=None)
+        default_factory=get_env_api_key
     )
+    provider: Literal["openai", "ollama"] = "openai"
+    """The provider serving the model."""
+    base_url: str | None = None
+    """The endpoint of the provider, if None the provider default is used."""
+    requests_per_minute: int | None = None
+    """The request limit of the key and model, if None the calls are not limited."""
+    tokens_per_minute: int | None = None
+    """The token limit of the key and model, if None the tokens are not limited."""
 
 
 # from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
@@ -1,4 +1,10 @@
-"""ConvoCraft project configuration."""
+"""ConvoCraft project configuration.
+
+The config is built on first access of ``CONVO_CRAFT_CONFIG``
+or ``CONVO_CRAFT_PATHS``, not when the module is imported.
+"""
+
+from typing import Any
 
 from loguru import logger as lg
 
@@ -22,5 +28,10 @@ class ConvoCraftConfig(metaclass=Singleton):
         return str(self)
 
 
-CONVO_CRAFT_CONFIG = ConvoCraftConfig()
-CONVO_CRAFT_PATHS = CONVO_CRAFT_CONFIG.paths
+def __getattr__(name: str) -> Any:
+    """Build the config singleton on first access of the module constants."""
+    if name == "CONVO_CRAFT_CONFIG":
+        return ConvoCraftConfig()
+    if name == "CONVO_CRAFT_PATHS":
+        return ConvoCraftConfig().paths
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,84 @@
+"""Routing of the llm components to their models.
+
+Each component can use its own model and provider:
+the cheap, latency sensitive calls can go to a small local model,
+while the conversation generation stays on the remote model.
+"""
+
+from typing import Literal
+
+from pydantic import BaseModel
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+
+LLMComponent = Literal[
+    "conversation_generator",
+    "translator",
+    "paragraph_splitter",
+    "topic_picker",
+]
+"""The llm components that can be routed."""
+
+LOCAL_MODEL = "llama3.2:3b"
+"""The default small model served by the local endpoint."""
+
+
+class ModelRouting(BaseModel):
+    """The model config of each llm component.
+
+    A component without a config uses the default one.
+    The OpenAI routes use the key of the default config, entered by the user:
+    the key of a route config is read from the environment by default,
+    and it would bill the server key for the calls of the user.
+    """
+
+    conversation_generator: ChatOpenAIConfig | None = None
+    translator: ChatOpenAIConfig | None = None
+    paragraph_splitter: ChatOpenAIConfig | None = None
+    topic_picker: ChatOpenAIConfig | None = None
+    key_from_user: bool = True
+    """Whether the OpenAI routes use the key of the default config,
+    if False they keep their own key."""
+
+    def get_config(
+        self,
+        component: LLMComponent,
+        default_config: ChatOpenAIConfig,
+    ) -> ChatOpenAIConfig:
+        """Get the config of a component.
+
+        Args:
+            component (LLMComponent): The component to get the config for.
+            default_config (ChatOpenAIConfig): The config used by the components
+                without a route, with the API key entered by the user.
+        """
+        config = getattr(self, component)
+        if config is None:
+            return default_config
+        if config.provider == "openai" and self.key_from_user:
+            config = config.model_copy(update={"api_key": default_config.api_key})
+        return config
+
+    @classmethod
+    def local_cheap_tasks(
+        cls,
+        model: str = LOCAL_MODEL,
+        base_url: str | None = None,
+    ) -> "ModelRouting":
+        """Route everything but the conversation generation to a local model.
+
+        Args:
+            model (str): The model served by the local endpoint.
+            base_url (str | None): The local endpoint, if None the Ollama default.
+        """
+        local_config = ChatOpenAIConfig(
+            model=model,
+            provider="ollama",
+            base_url=base_url,
+            api_key=None,
+        )
+        return cls(
+            translator=local_config,
+            paragraph_splitter=local_config,
+            topic_picker=local_config,
+        )
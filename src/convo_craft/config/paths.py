@@ -22,6 +22,9 @@ class ConvoCraftPaths:
         self.root_fol = self.src_fol.parents[1]
         self.static_fol = self.root_fol / "static"
         self.data_fol = self.root_fol / "data"
+        self.llm_cache_fp = self.data_fol / "llm_cache.sqlite"
+        self.lessons_fol = self.data_fol / "lessons"
+        self.sessions_fp = self.data_fol / "sessions.sqlite"
         self.chroma_persist_fol = self.root_fol / "chroma_persist"
 
     def __str__(self) -> str:
@@ -31,5 +34,8 @@ class ConvoCraftPaths:
         s += f"          root_fol: {self.root_fol}\n"
         s += f"        static_fol: {self.static_fol}\n"
         s += f"          data_fol: {self.data_fol}\n"
+        s += f"      llm_cache_fp: {self.llm_cache_fp}\n"
+        s += f"       lessons_fol: {self.lessons_fol}\n"
+        s += f"       sessions_fp: {self.sessions_fp}\n"
         s += f"chroma_persist_fol: {self.chroma_persist_fol}\n"
         return s
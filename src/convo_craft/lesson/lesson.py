@@ -0,0 +1,46 @@
+"""A lesson, with all the content needed to play it."""
+
+import uuid
+
+from pydantic import BaseModel, Field
+
+from convo_craft.llm.conversation_generator import ConversationRole, ConversationTurn
+from convo_craft.llm.paragraph_splitter import ParagraphSplitterResult
+from convo_craft.llm.translator import TranslatorResult
+
+
+class LessonStep(BaseModel):
+    """A step of the lesson: a conversation turn, translated and split."""
+
+    role: ConversationRole = Field(description="The role of the speaker")
+    content: str = Field(description="The content of the message")
+    translation: str = Field(description="The translated content of the message")
+    portions: list[str] = Field(description="The content split into portions")
+    words: list[list[str]] = Field(description="The words of each portion")
+
+    def to_conversation_turn(self) -> ConversationTurn:
+        """Get the plain conversation turn."""
+        return ConversationTurn(role=self.role, content=self.content)
+
+    def get_translation(self) -> TranslatorResult:
+        """Get the translation of the step."""
+        return TranslatorResult(target_text=self.translation)
+
+    def get_split_result(self) -> ParagraphSplitterResult:
+        """Get the split of the step."""
+        return ParagraphSplitterResult(portions=self.portions)
+
+
+class Lesson(BaseModel):
+    """A complete lesson about a topic."""
+
+    lesson_id: str = Field(description="The unique id of the lesson")
+    language: str = Field(description="The language of the lesson")
+    understanding_level: str = Field(description="The level of the user")
+    topic: str = Field(description="The topic of the conversation")
+    steps: list[LessonStep] = Field(description="The steps of the lesson")
+
+
+def new_lesson_id() -> str:
+    """Get a new unique lesson id, several lessons can be about the same topic."""
+    return uuid.uuid4().hex
@@ -0,0 +1,114 @@
+"""Build complete lessons with the LLM components."""
+
+from dataclasses import dataclass, field
+from itertools import islice
+
+from loguru import logger as lg
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.model_routing import ModelRouting
+from convo_craft.lesson.lesson import Lesson, LessonStep, new_lesson_id
+from convo_craft.llm.conversation_generator import (
+    CONVERSATION_SAMPLE,
+    TOPIC_SAMPLE,
+    ConversationGenerator,
+)
+from convo_craft.llm.paragraph_splitter import ParagraphSplitter
+from convo_craft.llm.translator import Translator
+from convo_craft.text.split_paragraph import LocalParagraphSplitter
+from convo_craft.text.split_sentence import SentenceSplitter
+
+
+@dataclass
+class LessonBuilder:
+    """Build lessons for a language and understanding level."""
+
+    chat_openai_config: ChatOpenAIConfig
+    language: str
+    understanding_level: str
+    num_messages: int = 5
+    num_sentences: int = 3
+    translation_language: str = "English"
+    bundle: bool = False
+    """Generate the conversation, the translations and the splits in one call."""
+    use_cache: bool = True
+    """Whether to cache the LLM results on disk."""
+    model_routing: ModelRouting = field(default_factory=ModelRouting)
+    """The model of each llm component, the unrouted ones use the base config."""
+
+    def __post_init__(self) -> None:
+        """Initialize the LLM components."""
+        self.cg = ConversationGenerator(
+            chat_openai_config=self.model_routing.get_config(
+                "conversation_generator", self.chat_openai_config
+            ),
+            language=self.language,
+            num_messages=self.num_messages,
+            num_sentences=self.num_sentences,
+            understanding_level=self.understanding_level,
+            topic_sample=TOPIC_SAMPLE,
+            conversation_sample=CONVERSATION_SAMPLE,
+            use_cache=self.use_cache,
+            translation_language=self.translation_language,
+        )
+        self.translator = Translator(
+            chat_openai_config=self.model_routing.get_config(
+                "translator", self.chat_openai_config
+            ),
+            source_language=self.language,
+            target_language=self.translation_language,
+            use_cache=self.use_cache,
+        )
+        self.para_splitter = ParagraphSplitter(
+            chat_openai_config=self.model_routing.get_config(
+                "paragraph_splitter", self.chat_openai_config
+            ),
+            use_cache=self.use_cache,
+            local_splitter=LocalParagraphSplitter.for_language(self.language),
+        )
+        self.sent_splitter = SentenceSplitter()
+
+    def build(self, topic: str) -> Lesson:
+        """Build a lesson about the topic."""
+        lg.debug(f"Building lesson about {topic}")
+        if self.bundle:
+            bundle = self.cg.invoke_bundle(topic)
+            contents = [turn.content for turn in bundle.turns]
+            roles = [turn.role for turn in bundle.turns]
+            translations = [turn.translation for turn in bundle.turns]
+            splits = [turn.get_split_result() for turn in bundle.turns]
+        else:
+            conv = self.cg.invoke(topic)
+            contents = [turn.content for turn in conv.turns]
+            roles = [turn.role for turn in conv.turns]
+            batch = self.translator.invoke_batch(contents)
+            translations = [pair.target_text for pair in batch.translations]
+            splits = [None for _ in contents]
+        splits = [
+            split if split is not None else self.para_splitter.invoke(content)
+            for content, split in zip(contents, splits)
+        ]
+        # split the portions of all the steps in a single batch
+        portions = [portion for split in splits for portion in split.portions]
+        portion_words = self.sent_splitter.invoke_batch(portions).iter_words()
+        steps = []
+        for role, content, translation, split in zip(
+            roles, contents, translations, splits
+        ):
+            words = list(islice(portion_words, len(split.portions)))
+            steps.append(
+                LessonStep(
+                    role=role,
+                    content=content,
+                    translation=translation,
+                    portions=split.portions,
+                    words=words,
+                )
+            )
+        return Lesson(
+            lesson_id=new_lesson_id(),
+            language=self.language,
+            understanding_level=self.understanding_level,
+            topic=topic,
+            steps=steps,
+        )
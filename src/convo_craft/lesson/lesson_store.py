@@ -0,0 +1,275 @@
+"""On-disk store of the finished lessons.
+
+The lessons are appended to a JSON lines file, and indexed in SQLite
+by language, level and topic, with the position of each lesson in the file.
+There can be several lessons about the same topic, each with its own id.
+Lessons are read from the file only when requested,
+so opening the store does not read the whole corpus.
+The recently read lessons are kept parsed, and shared by all the sessions.
+The store can be shared by several processes on the same node:
+the appends are serialized by a lock file.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
+from functools import cache
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Iterator
+
+from loguru import logger as lg
+
+from convo_craft.lesson.lesson import Lesson
+from convo_craft.utils.u_pathlib import check_create_fol
+
+LESSON_CACHE_SIZE = 256
+"""Number of parsed lessons kept in memory."""
+
+
+class LessonStore:
+    """An indexed store of lessons, one JSON line per lesson."""
+
+    def __init__(self, store_fol: Path, cache_size: int = LESSON_CACHE_SIZE) -> None:
+        """Initialize the store, indexing the lessons not indexed yet.
+
+        Args:
+            store_fol (Path): The folder to store the lessons in.
+            cache_size (int): Number of parsed lessons kept in memory.
+        """
+        self.store_fol = store_fol
+        check_create_fol(self.store_fol)
+        self.lessons_fp = self.store_fol / "lessons.jsonl"
+        self.index_fp = self.store_fol / "lessons_index.sqlite"
+        self.lock_fp = self.store_fol / "lessons.lock"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_fp, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            # let the readers run while another process writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS lessons ("
+                " lesson_id TEXT PRIMARY KEY,"
+                " language TEXT NOT NULL,"
+                " level TEXT NOT NULL,"
+                " topic TEXT NOT NULL,"
+                " offset INTEGER NOT NULL,"
+                " length INTEGER NOT NULL"
+                ")"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS lessons_by_cell"
+                " ON lessons (language, level, topic)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen ("
+                " user_id TEXT NOT NULL,"
+                " lesson_id TEXT NOT NULL,"
+                " PRIMARY KEY (user_id, lesson_id)"
+                ")"
+            )
+        self._reader = None
+        self.cache_size = cache_size
+        self._lesson_cache: OrderedDict[str, Lesson] = OrderedDict()
+        self.index_tail()
+
+    @contextmanager
+    def _append_lock(self) -> Iterator[None]:
+        """Hold the appends of the other processes, the thread lock must be held.
+
+        The lock file is opened each time, so the processes forked
+        with the store open do not share the lock.
+        """
+        with self.lock_fp.open("ab") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def index_tail(self) -> None:
+        """Index the lessons appended to the file after the last indexed one."""
+        if not self.lessons_fp.exists():
+            return
+        with self._lock, self._append_lock():
+            row = self._conn.execute("SELECT MAX(offset + length) FROM lessons").fetchone()
+            offset = row[0] or 0
+            num_indexed = 0
+            with self.lessons_fp.open("rb") as f, self._conn:
+                f.seek(offset)
+                for line in f:
+                    if line.strip():
+                        lesson = Lesson.model_validate_json(line)
+                        self._insert(lesson, offset, len(line))
+                        num_indexed += 1
+                    offset += len(line)
+        if num_indexed:
+            lg.info(f"Indexed {num_indexed} lessons in {self.store_fol}")
+
+    def _insert(self, lesson: Lesson, offset: int, length: int) -> None:
+        """Add the lesson to the index, the lock must be held."""
+        self._conn.execute(
+            "INSERT OR IGNORE INTO lessons VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                lesson.lesson_id,
+                lesson.language,
+                lesson.understanding_level,
+                lesson.topic,
+                offset,
+                length,
+            ),
+        )
+
+    def __contains__(self, lesson_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM lessons WHERE lesson_id = ?", (lesson_id,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM lessons").fetchone()[0]
+
+    def add(self, lesson: Lesson) -> bool:
+        """Add a lesson to the store, if not already stored.
+
+        Returns:
+            bool: True if the lesson was added,
+                False if a lesson with the same id was already stored.
+        """
+        line = (lesson.model_dump_json() + "\n").encode("utf-8")
+        # another process may append meanwhile, so check, append and index together
+        with self._lock, self._append_lock():
+            row = self._conn.execute(
+                "SELECT 1 FROM lessons WHERE lesson_id = ?", (lesson.lesson_id,)
+            ).fetchone()
+            if row is not None:
+                return False
+            with self.lessons_fp.open("ab") as f:
+                offset = f.tell()
+                f.write(line)
+            with self._conn:
+                self._insert(lesson, offset, len(line))
+        return True
+
+    def get(self, lesson_id: str) -> Lesson | None:
+        """Get a lesson, or None if not stored.
+
+        The lesson is shared with the other callers, it must not be modified.
+        """
+        with self._lock:
+            if lesson_id in self._lesson_cache:
+                self._lesson_cache.move_to_end(lesson_id)
+                return self._lesson_cache[lesson_id]
+            row = self._conn.execute(
+                "SELECT offset, length FROM lessons WHERE lesson_id = ?", (lesson_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._reader is None:
+                self._reader = self.lessons_fp.open("rb")
+            self._reader.seek(row[0])
+            line = self._reader.read(row[1])
+        lesson = Lesson.model_validate_json(line)
+        with self._lock:
+            self._lesson_cache[lesson_id] = lesson
+            if len(self._lesson_cache) > self.cache_size:
+                self._lesson_cache.popitem(last=False)
+        return lesson
+
+    def _unseen_query(
+        self,
+        user_id: str,
+        language: str,
+        understanding_level: str,
+        topic: str | None,
+    ) -> tuple[str, tuple]:
+        """Build the query of the lessons the user has not seen yet."""
+        query = (
+            "SELECT lesson_id FROM lessons WHERE language = ? AND level = ?"
+            " AND lesson_id NOT IN (SELECT lesson_id FROM seen WHERE user_id = ?)"
+        )
+        params: tuple = (language, understanding_level, user_id)
+        if topic is not None:
+            query += " AND topic = ?"
+            params += (topic,)
+        return query, params
+
+    def sample_unseen(
+        self,
+        user_id: str,
+        language: str,
+        understanding_level: str,
+        topic: str | None = None,
+    ) -> Lesson | None:
+        """Pick a random lesson the user has not seen yet.
+
+        Args:
+            user_id (str): The user to pick the lesson for.
+            language (str): The language of the lesson.
+            understanding_level (str): The level of the lesson.
+            topic (str | None): The topic of the lesson, if None any topic.
+
+        Returns:
+            Lesson | None: The lesson, or None if the user has seen them all.
+        """
+        query, params = self._unseen_query(
+            user_id, language, understanding_level, topic
+        )
+        with self._lock:
+            row = self._conn.execute(
+                query + " ORDER BY RANDOM() LIMIT 1", params
+            ).fetchone()
+        if row is None:
+            return None
+        return self.get(row[0])
+
+    def has_unseen(
+        self,
+        user_id: str,
+        language: str,
+        understanding_level: str,
+        topic: str | None = None,
+    ) -> bool:
+        """Check if the user has a lesson left to see, without reading it."""
+        query, params = self._unseen_query(
+            user_id, language, understanding_level, topic
+        )
+        with self._lock:
+            row = self._conn.execute(query + " LIMIT 1", params).fetchone()
+        return row is not None
+
+    def mark_seen(self, user_id: str, lesson_id: str) -> None:
+        """Record that the user has seen the lesson."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO seen VALUES (?, ?)", (user_id, lesson_id)
+            )
+
+    def get_topics(self, language: str, understanding_level: str) -> list[str]:
+        """Get the topics of the stored lessons for a language and level."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT topic FROM lessons WHERE language = ? AND level = ?",
+                (language, understanding_level),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_lessons(self) -> Iterator[Lesson]:
+        """Iterate over all the stored lessons."""
+        if not self.lessons_fp.exists():
+            return
+        with self.lessons_fp.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield Lesson.model_validate_json(line)
+
+
+@cache
+def get_lesson_store() -> LessonStore:
+    """Get the process-wide lesson store, in the data folder."""
+    from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+
+    return LessonStore(CONVO_CRAFT_PATHS.lessons_fol)
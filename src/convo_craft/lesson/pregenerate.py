@@ -0,0 +1,244 @@
+"""Generate lessons ahead of time, for a grid of topics, levels and languages.
+
+The lessons are built concurrently and written to a lesson store.
+The topics with a lesson in the store already are skipped, so an interrupted run
+can be resumed by running the same command again.
+
+Usage:
+    convo-craft-pregenerate --topics-fp topics.txt --levels beginner intermediate
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from itertools import product
+from pathlib import Path
+import threading
+import time
+
+from loguru import logger as lg
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.model_routing import ModelRouting
+from convo_craft.lesson.lesson_builder import LessonBuilder
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.fake_llm import FAKE_MODEL
+from convo_craft.llm.llm_metrics import get_llm_metrics
+from convo_craft.llm.rate_scheduler import use_priority
+from convo_craft.llm.topic_picker import OLD_TOPICS
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+class RateLimiter:
+    """Space the calls evenly, to stay under a rate."""
+
+    def __init__(self, rate_per_min: float) -> None:
+        """Initialize the rate limiter.
+
+        Args:
+            rate_per_min (float): Maximum number of calls per minute,
+                zero or less to disable the limit.
+        """
+        self.interval_s = 60 / rate_per_min if rate_per_min > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_time = time.monotonic()
+
+    def wait(self) -> None:
+        """Wait for the next available slot."""
+        if self.interval_s == 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_s = max(0.0, self._next_time - now)
+            self._next_time = max(now, self._next_time) + self.interval_s
+        if wait_s > 0:
+            time.sleep(wait_s)
+
+
+@dataclass
+class PregenerateReport:
+    """Summary of a pregeneration run."""
+
+    num_total: int
+    num_skipped: int
+    num_done: int
+    num_failed: int
+    elapsed_s: float
+
+    @property
+    def lessons_per_min(self) -> float:
+        """Throughput of the run."""
+        return self.num_done / self.elapsed_s * 60 if self.elapsed_s > 0 else 0.0
+
+
+def pregenerate(
+    store: LessonStore,
+    chat_openai_config: ChatOpenAIConfig,
+    topics: list[str],
+    levels: list[str],
+    languages: list[str],
+    concurrency: int = 4,
+    lessons_per_min: float = 0,
+    bundle: bool = False,
+    use_cache: bool = True,
+    model_routing: ModelRouting | None = None,
+) -> PregenerateReport:
+    """Build the lessons for all the combinations missing from the store.
+
+    Args:
+        store (LessonStore): The store to write the lessons to.
+        chat_openai_config (ChatOpenAIConfig): The config of the model.
+        topics (list[str]): The topics of the lessons.
+        levels (list[str]): The understanding levels of the lessons.
+        languages (list[str]): The languages of the lessons.
+        concurrency (int): Maximum number of lessons built at the same time.
+        lessons_per_min (float): Maximum number of lessons started per minute,
+            zero to disable the limit.
+        bundle (bool): Generate each lesson in a single call.
+        use_cache (bool): Whether to cache the LLM results on disk.
+        model_routing (ModelRouting | None): The model of each llm component,
+            if None all the components use the base config.
+
+    Returns:
+        PregenerateReport: The summary of the run.
+    """
+    builders = {
+        (language, level): LessonBuilder(
+            chat_openai_config=chat_openai_config,
+            language=language,
+            understanding_level=level,
+            bundle=bundle,
+            use_cache=use_cache,
+            model_routing=model_routing if model_routing else ModelRouting(),
+        )
+        for language, level in product(languages, levels)
+    }
+    grid = list(product(languages, levels, topics))
+    stored_topics = {
+        (language, level): set(store.get_topics(language, level))
+        for language, level in builders
+    }
+    todo = [
+        (language, level, topic)
+        for language, level, topic in grid
+        if topic not in stored_topics[(language, level)]
+    ]
+    num_skipped = len(grid) - len(todo)
+    lg.info(f"Pregenerating {len(todo)} lessons, {num_skipped} already stored")
+    limiter = RateLimiter(lessons_per_min)
+
+    def build(language: str, level: str, topic: str) -> None:
+        limiter.wait()
+        with use_priority("bulk"):
+            lesson = builders[(language, level)].build(topic)
+        store.add(lesson)
+
+    num_done = num_failed = 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(build, *cell): cell for cell in todo}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                num_done += 1
+            except Exception as e:
+                num_failed += 1
+                lg.error(f"Failed lesson {futures[future]}: {e}")
+            elapsed_s = time.perf_counter() - t0
+            rate = num_done / elapsed_s * 60 if elapsed_s > 0 else 0.0
+            lg.info(
+                f"Progress {num_done + num_failed}/{len(todo)}"
+                f" ({num_failed} failed), {rate:.1f} lessons/min"
+            )
+    return PregenerateReport(
+        num_total=len(grid),
+        num_skipped=num_skipped,
+        num_done=num_done,
+        num_failed=num_failed,
+        elapsed_s=time.perf_counter() - t0,
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the pregeneration from the command line."""
+    from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+
+    parser = argparse.ArgumentParser(description="Generate lessons ahead of time.")
+    parser.add_argument("--topics", nargs="*", default=None, help="The topics.")
+    parser.add_argument(
+        "--topics-fp", type=Path, default=None, help="A file with a topic per line."
+    )
+    parser.add_argument("--levels", nargs="+", default=["intermediate"])
+    parser.add_argument("--languages", nargs="+", default=["Brazilian Portuguese"])
+    parser.add_argument("--store-fol", type=Path, default=CONVO_CRAFT_PATHS.lessons_fol)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--lessons-per-min", type=float, default=0, help="0 disables the limit."
+    )
+    parser.add_argument(
+        "--requests-per-minute", type=int, default=None, help="The key request limit."
+    )
+    parser.add_argument(
+        "--tokens-per-minute", type=int, default=None, help="The key token limit."
+    )
+    parser.add_argument("--bundle", action="store_true", help="One call per lesson.")
+    parser.add_argument("--no-cache", action="store_true", help="Skip the LLM cache.")
+    parser.add_argument("--model", default=None, help="Override the model name.")
+    parser.add_argument(
+        "--fake-llm", action="store_true", help="Use the fake backend, no network."
+    )
+    parser.add_argument(
+        "--local-model",
+        default=None,
+        help="Translate and split with this model on a local Ollama endpoint.",
+    )
+    parser.add_argument("--local-base-url", default=None, help="The local endpoint.")
+    parser.add_argument(
+        "--metrics-fp",
+        type=Path,
+        default=None,
+        help="Write the LLM metrics here, as JSON if .json, else Prometheus text.",
+    )
+    args = parser.parse_args(argv)
+
+    topics = list(args.topics or [])
+    if args.topics_fp is not None:
+        topics_text = args.topics_fp.read_text(encoding="utf-8")
+        topics.extend(line.strip() for line in topics_text.splitlines() if line.strip())
+    if not topics:
+        topics = OLD_TOPICS
+
+    chat_openai_config = ChatOpenAIConfig()
+    if args.model is not None:
+        chat_openai_config.model = args.model
+    chat_openai_config.requests_per_minute = args.requests_per_minute
+    chat_openai_config.tokens_per_minute = args.tokens_per_minute
+    if args.fake_llm:
+        chat_openai_config.model = FAKE_MODEL
+        chat_openai_config.api_key = convert_to_secret_str_v2("fake")
+    model_routing = None
+    if args.local_model is not None:
+        model_routing = ModelRouting.local_cheap_tasks(
+            model=args.local_model, base_url=args.local_base_url
+        )
+
+    report = pregenerate(
+        store=LessonStore(args.store_fol),
+        chat_openai_config=chat_openai_config,
+        topics=topics,
+        levels=args.levels,
+        languages=args.languages,
+        concurrency=args.concurrency,
+        lessons_per_min=args.lessons_per_min,
+        bundle=args.bundle,
+        use_cache=not args.no_cache,
+        model_routing=model_routing,
+    )
+    lg.info(f"{report} {report.lessons_per_min:.1f} lessons/min")
+    if args.metrics_fp is not None:
+        get_llm_metrics().write(args.metrics_fp)
+        lg.info(f"Wrote the LLM metrics to {args.metrics_fp}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Execution policy of the interactive LLM calls.
+
+The policy keeps a rolling window of the call latencies.
+A call still running after the p95 latency gets a hedged duplicate,
+and the first response wins.
+A circuit breaker fails fast while the provider keeps failing,
+so the learner is not kept waiting on a degraded provider.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import contextvars
+from dataclasses import dataclass, field
+import threading
+import time
+from typing import Callable, TypeVar
+
+from loguru import logger as lg
+
+T = TypeVar("T")
+
+HEDGE_MAX_WORKERS = 32
+"""Maximum number of primary and hedged calls running at the same time."""
+HEDGE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=HEDGE_MAX_WORKERS,
+    thread_name_prefix="convo_craft_hedge",
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider is failing, the call was not attempted."""
+
+
+class LatencyTracker:
+    """A rolling window of the latencies of the successful calls."""
+
+    def __init__(self, window: int = 200) -> None:
+        """Initialize the tracker.
+
+        Args:
+            window (int): The number of recent latencies kept.
+        """
+        self._lock = threading.Lock()
+        self.latencies: deque[float] = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self.latencies)
+
+    def add(self, latency_s: float) -> None:
+        """Add the latency of a call."""
+        with self._lock:
+            self.latencies.append(latency_s)
+
+    def get_quantile(self, quantile: float) -> float | None:
+        """Get a quantile of the recent latencies, or None if there are none."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * quantile))]
+
+
+class CircuitBreaker:
+    """Stop calling a provider after too many consecutive failures.
+
+    After ``reset_timeout_s`` a single trial call is let through:
+    the circuit closes again if it succeeds, and stays open otherwise.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout_s: float = 30) -> None:
+        """Initialize a closed circuit.
+
+        Args:
+            failure_threshold (int): Open the circuit after this many
+                consecutive failures.
+            reset_timeout_s (float): Let a trial call through after this long.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the calls are currently rejected."""
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """Check if a call can be attempted now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed >= self.reset_timeout_s and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit if needed."""
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    lg.warning(f"Circuit opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+@dataclass
+class CallPolicy:
+    """Hedge the slow calls, bound their latency and fail fast when degraded."""
+
+    hedge_quantile: float = 0.95
+    """Send a hedged call when the primary runs longer than this quantile."""
+    min_samples: int = 20
+    """Use ``default_hedge_delay_s`` until this many latencies are known."""
+    default_hedge_delay_s: float = 2.0
+    min_hedge_delay_s: float = 0.05
+    timeout_s: float | None = 30.0
+    """Give up on the call after this long, None to wait forever."""
+    tracker: LatencyTracker = field(default_factory=LatencyTracker)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+
+    def get_hedge_delay(self) -> float:
+        """Get how long to wait for the primary call before hedging."""
+        if len(self.tracker) < self.min_samples:
+            return self.default_hedge_delay_s
+        delay = self.tracker.get_quantile(self.hedge_quantile)
+        return max(self.min_hedge_delay_s, delay or self.default_hedge_delay_s)
+
+    def submit(self, fn: Callable[[], T]) -> Future[T]:
+        """Run the call in the background, in a copy of the current context."""
+        ctx = contextvars.copy_context()
+        return HEDGE_EXECUTOR.submit(ctx.run, fn)
+
+    def run(self, fn: Callable[[], T]) -> tuple[T, bool]:
+        """Run the call under the policy.
+
+        Args:
+            fn (Callable[[], T]): The call, run once more if it is slow.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            TimeoutError: If no call finished within the timeout.
+
+        Returns:
+            tuple[T, bool]: The first result, and whether a hedged call was sent.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("The provider is failing, try again later")
+        start = time.perf_counter()
+        pending = {self.submit(fn)}
+        hedged = False
+        error: BaseException | None = None
+        while pending:
+            if hedged:
+                timeout = None
+                if self.timeout_s is not None:
+                    elapsed = time.perf_counter() - start
+                    timeout = max(0.0, self.timeout_s - elapsed)
+            else:
+                timeout = self.get_hedge_delay()
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # a started loser cannot be interrupted,
+                    # its result is dropped when it finishes
+                    for loser in pending:
+                        loser.cancel()
+                    self.tracker.add(time.perf_counter() - start)
+                    self.breaker.record_success()
+                    return future.result(), hedged
+                error = future.exception()
+            if not hedged:
+                # the primary is slow or failed: send the duplicate now
+                lg.debug("Slow or failed call, sending a hedged duplicate")
+                pending.add(self.submit(fn))
+                hedged = True
+            elif not done:
+                break
+        self.breaker.record_failure()
+        for loser in pending:
+            loser.cancel()
+        if pending or error is None:
+            raise TimeoutError(f"No response within {self.timeout_s} s")
+        raise error
+
+
+_policies: dict[tuple[str, str, str], CallPolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def get_call_policy(component: str, schema_name: str, model: str) -> CallPolicy:
+    """Get the process-wide policy of a kind of call.
+
+    The latencies of the calls with the same component, schema and model
+    are tracked together, across all the sessions.
+    """
+    with _policies_lock:
+        key = (component, schema_name, model)
+        if key not in _policies:
+            _policies[key] = CallPolicy()
+        return _policies[key]
@@ -0,0 +1,177 @@
+"""Process-wide registry of the chat models.
+
+All the llm components get their models from here, so the components
+built with the same configuration share one model and one structured runnable,
+and all the OpenAI models share a pool of keep-alive HTTP connections.
+The configs with the ``ollama`` provider get a model from a local
+Ollama-compatible endpoint, which returns the structured output as a JSON schema.
+The configs using ``FAKE_MODEL`` get their structured runnables from a fake backend.
+The provider packages are imported when the first model is built,
+so importing the llm components stays cheap.
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+from typing import TYPE_CHECKING
+
+import httpx
+from loguru import logger as lg
+from pydantic import BaseModel
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.meta.singleton import Singleton
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.runnables import Runnable
+
+    from convo_craft.llm.fake_llm import FakeLLM
+
+MAX_MODELS = 64
+"""Maximum number of models kept in the registry."""
+POOL_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60,
+)
+"""Limits of the shared HTTP connection pool."""
+POOL_TIMEOUT = httpx.Timeout(timeout=60, connect=5)
+"""Timeouts of the shared HTTP connection pool."""
+RATE_LIMIT_FIELDS = {"requests_per_minute", "tokens_per_minute"}
+"""The config fields read by the rate scheduler, not by the model."""
+
+
+def get_config_key(chat_openai_config: ChatOpenAIConfig) -> str:
+    """Get a key identifying the config, including the API key.
+
+    The API key is hashed, so it is not kept around in plain text.
+    The rate limits are not part of the key, they do not change the model.
+    """
+    config_str = chat_openai_config.model_dump_json(
+        exclude={"api_key", *RATE_LIMIT_FIELDS}
+    )
+    api_key = chat_openai_config.api_key
+    if api_key is not None:
+        config_str += api_key.get_secret_value()
+    return hashlib.sha256(config_str.encode()).hexdigest()
+
+
+class ChatModelRegistry(metaclass=Singleton):
+    """Registry of the chat models and structured runnables, keyed by config."""
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        from convo_craft.llm.fake_llm import FakeLLM
+
+        self._lock = threading.Lock()
+        self.http_client = httpx.Client(limits=POOL_LIMITS, timeout=POOL_TIMEOUT)
+        self._models: OrderedDict[str, "BaseChatModel"] = OrderedDict()
+        self._runnables: dict[tuple[str, type[BaseModel], bool], "Runnable"] = {}
+        self.fake_llm = FakeLLM()
+        """The backend used for the configs with the fake model."""
+
+    def get_model(self, chat_openai_config: ChatOpenAIConfig) -> "BaseChatModel":
+        """Get the shared model for the config, building it if needed."""
+        config_key = get_config_key(chat_openai_config)
+        with self._lock:
+            return self._get_model(config_key, chat_openai_config)
+
+    def _get_model(
+        self,
+        config_key: str,
+        chat_openai_config: ChatOpenAIConfig,
+    ) -> "BaseChatModel":
+        """Get the shared model for the config, the lock must be held."""
+        if config_key in self._models:
+            self._models.move_to_end(config_key)
+            return self._models[config_key]
+        lg.debug(
+            f"Building chat model {chat_openai_config.model}"
+            f" from {chat_openai_config.provider}"
+        )
+        model: "BaseChatModel"
+        if chat_openai_config.provider == "ollama":
+            from langchain_ollama import ChatOllama
+
+            model = ChatOllama(
+                model=chat_openai_config.model,
+                temperature=chat_openai_config.temperature,
+                base_url=chat_openai_config.base_url,
+            )
+        else:
+            from langchain_openai import ChatOpenAI
+
+            model = ChatOpenAI(
+                **chat_openai_config.model_dump(
+                    exclude={"provider", *RATE_LIMIT_FIELDS}
+                ),
+                http_client=self.http_client,
+            )
+        self._models[config_key] = model
+        # drop the least recently used model and its runnables
+        if len(self._models) > MAX_MODELS:
+            old_key, _ = self._models.popitem(last=False)
+            for runnable_key in list(self._runnables):
+                if runnable_key[0] == old_key:
+                    del self._runnables[runnable_key]
+        return model
+
+    def get_structured_runnable(
+        self,
+        chat_openai_config: ChatOpenAIConfig,
+        schema: type[BaseModel],
+        partial: bool = False,
+    ) -> "Runnable":
+        """Get the shared structured output runnable for the config and schema.
+
+        Args:
+            chat_openai_config (ChatOpenAIConfig): The model config.
+            schema (type[BaseModel]): The schema of the result.
+            partial (bool): If True, the runnable returns plain dicts, which
+                are streamed as partial results while the output is generated.
+                If False, the runnable returns a dict with the ``raw`` response,
+                the ``parsed`` result and the ``parsing_error``.
+        """
+        from convo_craft.llm.fake_llm import FAKE_MODEL
+
+        config_key = get_config_key(chat_openai_config)
+        with self._lock:
+            model = self._get_model(config_key, chat_openai_config)
+            runnable_key = (config_key, schema, partial)
+            if runnable_key not in self._runnables:
+                if chat_openai_config.model == FAKE_MODEL:
+                    runnable = self.fake_llm.get_structured_runnable(schema, partial)
+                elif chat_openai_config.provider == "ollama":
+                    runnable = model.with_structured_output(
+                        schema.model_json_schema() if partial else schema,
+                        method="json_schema",
+                        include_raw=not partial,
+                    )
+                elif partial:
+                    from langchain_core.utils.function_calling import (
+                        convert_to_openai_tool,
+                    )
+
+                    runnable = model.with_structured_output(
+                        convert_to_openai_tool(schema)
+                    )
+                else:
+                    runnable = model.with_structured_output(schema, include_raw=True)
+                self._runnables[runnable_key] = runnable
+            return self._runnables[runnable_key]
+
+    def set_fake_llm(self, fake_llm: "FakeLLM") -> None:
+        """Set the backend used for the configs with the fake model.
+
+        The components built before keep the old backend.
+        """
+        with self._lock:
+            self.fake_llm = fake_llm
+            self._runnables.clear()
+
+    def clear(self) -> None:
+        """Drop all the models, keeping the connection pool."""
+        with self._lock:
+            self._models.clear()
+            self._runnables.clear()
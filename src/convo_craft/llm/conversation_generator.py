@@ -2,13 +2,19 @@
 
 from dataclasses import dataclass
 from enum import Enum
+from functools import cache
+from typing import Iterator
 
-from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
-from langchain_openai import ChatOpenAI
 from loguru import logger as lg
 from pydantic import BaseModel, Field
 
 from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.paragraph_splitter import (
+    ParagraphSplitterResult,
+    portions_match_paragraph,
+)
+from convo_craft.llm.prompt_compiler import CompiledPrompt, compile_prompt
+from convo_craft.llm.structured_llm import StructuredLLM
 
 
 class ConversationRole(Enum):
@@ -35,11 +41,48 @@ class ConversationGeneratorResult(BaseModel):
     turns: list[ConversationTurn] = Field(description="The turns of the conversation")
 
 
-conversation_template = """Write a conversation in {language} between two persons, \
+class LessonTurn(BaseModel):
+    """A conversation turn, with its translation and its split into portions.
+
+    The content should be split into portions without changing the text,
+    such that the concatenation of the portions should be equal to the content.
+
+    Prefer splitting the content into meaningful portions, such as phrases or clauses.
+    Avoid splitting on commas, unless the sentence is longer than 15 words.
+    Avoid generating a single word as a portion.
+    """
+
+    role: ConversationRole = Field(description="The role of the speaker")
+    content: str = Field(description="The content of the message")
+    translation: str = Field(description="The translated content of the message")
+    portions: list[str] = Field(description="The content split into portions")
+
+    def to_conversation_turn(self) -> ConversationTurn:
+        """Get the plain conversation turn."""
+        return ConversationTurn(role=self.role, content=self.content)
+
+    def get_split_result(self) -> ParagraphSplitterResult | None:
+        """Get the split of the content, or None if the portions are invalid."""
+        if not portions_match_paragraph(self.content, self.portions):
+            return None
+        return ParagraphSplitterResult(portions=self.portions)
+
+
+class LessonBundleResult(BaseModel):
+    """A conversation with a consistent plot or theme, ready for a lesson.
+
+    The roles in the turns should alternate between two speakers, identified as
+    the user and the system.
+    Each turn is translated and split into portions.
+    """
+
+    turns: list[LessonTurn] = Field(description="The turns of the conversation")
+
+
+conversation_template = """Write conversations in {language} between two persons, \
 that should be used to teach the user the language.
-The conversation should be about the following topic: "{topic}".
 Assume that the user has an {understanding_level} level of understanding of the language.
-The conversation should last about {num_messages} messages in total, \
+Each conversation should last about {num_messages} messages in total, \
 with each message being about {num_sentences} sentences long.
 """
 difficulty_template = """This is an example of a conversation in {language} between two persons, \
@@ -47,12 +90,45 @@ about the topic "{topic_sample}", \
 of the appropriate difficulty level for the user, which is {understanding_level}:
 {conversation_sample}
 """
-conversation_prompt = ChatPromptTemplate(
-    [
-        HumanMessagePromptTemplate.from_template(conversation_template),
-        HumanMessagePromptTemplate.from_template(difficulty_template),
-    ],
-)
+bundle_template = """For each message, also provide its translation \
+to {translation_language}, and split the message into portions \
+for the user to rebuild it.
+"""
+topic_template = """Write a conversation about the following topic: "{topic}".
+"""
+
+
+@cache
+def get_conversation_prompt(
+    language: str,
+    understanding_level: str,
+    num_messages: int,
+    num_sentences: int,
+    topic_sample: str,
+    conversation_sample: str,
+    translation_language: str,
+    bundle: bool = False,
+) -> CompiledPrompt:
+    """Compile the prompt of a configuration on first use.
+
+    The instructions and the example are the static prefix, the topic the suffix.
+    The bundle prompt also asks for the translations and the splits.
+    """
+    templates = (conversation_template, difficulty_template)
+    if bundle:
+        templates += (bundle_template,)
+    return compile_prompt(
+        templates,
+        topic_template,
+        language=language,
+        understanding_level=understanding_level,
+        num_messages=num_messages,
+        num_sentences=num_sentences,
+        topic_sample=topic_sample,
+        conversation_sample=conversation_sample,
+        translation_language=translation_language,
+    )
+
 
 TOPIC_SAMPLE = "A conversation about ordering food in a restaurant."
 CONVERSATION_SAMPLE = """Oi! Você já decidiu o que vai pedir no restaurante?
@@ -80,28 +156,77 @@ class ConversationGenerator:
     understanding_level: str
     topic_sample: str
     conversation_sample: str
+    use_cache: bool = True
+    """Whether to cache the results on disk."""
+    translation_language: str = "English"
+    """The language to translate the turns to, when generating a lesson bundle."""
 
     def __post_init__(self) -> None:
-        self.model = ChatOpenAI(**self.chat_openai_config.model_dump())
-        self.structured_llm = self.model.with_structured_output(
-            ConversationGeneratorResult
+        self.structured_llm = StructuredLLM(
+            chat_openai_config=self.chat_openai_config,
+            schema=ConversationGeneratorResult,
+            use_cache=self.use_cache,
+            component="conversation_generator",
+        )
+        self.structured_llm_bundle = StructuredLLM(
+            chat_openai_config=self.chat_openai_config,
+            schema=LessonBundleResult,
+            use_cache=self.use_cache,
+            component="conversation_generator",
+        )
+
+    def get_prompt(self, bundle: bool = False) -> CompiledPrompt:
+        """Get the compiled prompt of the generator configuration."""
+        return get_conversation_prompt(
+            language=self.language,
+            understanding_level=self.understanding_level,
+            num_messages=self.num_messages,
+            num_sentences=self.num_sentences,
+            topic_sample=self.topic_sample,
+            conversation_sample=self.conversation_sample,
+            translation_language=self.translation_language,
+            bundle=bundle,
         )
 
     def invoke(self, topic: str) -> ConversationGeneratorResult:
         """Generate a conversation."""
-        conversation_value = conversation_prompt.invoke(
-            {
-                "language": self.language,
-                "topic": topic,
-                "understanding_level": self.understanding_level,
-                "num_messages": self.num_messages,
-                "num_sentences": self.num_sentences,
-                "topic_sample": self.topic_sample,
-                "conversation_sample": self.conversation_sample,
-            }
-        )
+        conversation_value = self.get_prompt().invoke({"topic": topic})
         lg.debug(f"{conversation_value=}")
         output = self.structured_llm.invoke(conversation_value)
         if not isinstance(output, ConversationGeneratorResult):
             raise ValueError(f"Invalid output: {output}")
         return output
+
+    def stream(self, topic: str) -> Iterator[ConversationTurn]:
+        """Generate a conversation, yielding each turn as soon as it is complete.
+
+        A turn is complete when the model starts writing the next one,
+        the last turn is complete when the output ends.
+        """
+        conversation_value = self.get_prompt().invoke({"topic": topic})
+        lg.debug(f"{conversation_value=}")
+        num_yielded = 0
+        turns: list[dict] = []
+        for partial in self.structured_llm.stream(conversation_value):
+            turns = partial.get("turns") or []
+            while num_yielded < len(turns) - 1:
+                yield ConversationTurn.model_validate(turns[num_yielded])
+                num_yielded += 1
+        for turn in turns[num_yielded:]:
+            yield ConversationTurn.model_validate(turn)
+
+    def invoke_bundle(self, topic: str) -> LessonBundleResult:
+        """Generate a conversation, with the translation and split of each turn.
+
+        The turns whose portions do not match the content are logged,
+        use ``LessonTurn.get_split_result`` to find them.
+        """
+        bundle_value = self.get_prompt(bundle=True).invoke({"topic": topic})
+        lg.debug(f"{bundle_value=}")
+        output = self.structured_llm_bundle.invoke(bundle_value)
+        if not isinstance(output, LessonBundleResult):
+            raise ValueError(f"Invalid output: {output}")
+        for it, turn in enumerate(output.turns):
+            if turn.get_split_result() is None:
+                lg.warning(f"Invalid portions for turn {it}: {turn.portions}")
+        return output
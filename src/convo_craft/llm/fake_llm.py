@@ -0,0 +1,284 @@
+"""Fake structured output backend, for tests and benchmarks without network.
+
+The chat model registry uses it for the configs whose model is ``FAKE_MODEL``.
+The results are valid instances of the schemas, built deterministically
+from the prompt, after a latency sampled from a configurable distribution.
+The provider prompt cache is simulated: the prefix of a prompt,
+all its messages but the last one, is reported as cached once seen.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+from pydantic import BaseModel
+
+from convo_craft.llm.token_budget import estimate_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.prompt_values import PromptValue
+    from langchain_core.runnables import Runnable
+
+FAKE_MODEL = "fake-llm"
+"""The model name that selects the fake backend."""
+
+FAKE_TOPICS = [
+    "Buying fruit at the market",
+    "Planning a weekend trip to the beach",
+    "Talking about your favourite movie",
+    "Renting an apartment",
+    "Asking a colleague for help at work",
+    "Celebrating a birthday with friends",
+    "Visiting a museum",
+    "Cooking a traditional dish",
+    "Taking the bus downtown",
+    "Talking about the news",
+    "Shopping for clothes",
+    "Making a reservation at a hotel",
+]
+
+
+def get_prompt_text(prompt_value: "PromptValue") -> str:
+    """Get the text of all the messages in the prompt."""
+    return "\n".join(str(m.content) for m in prompt_value.to_messages())
+
+
+def get_suffix(prompt_value: "PromptValue") -> str:
+    """Get the variable text of the prompt, in its last message."""
+    return str(prompt_value.to_messages()[-1].content).strip()
+
+
+def get_prefix(prompt_value: "PromptValue") -> str:
+    """Get the text of the static messages of the prompt, before the last one."""
+    return "\n".join(str(m.content) for m in prompt_value.to_messages()[:-1])
+
+
+@dataclass(frozen=True)
+class FakeLatency:
+    """A log-normal distribution of the latency of the fake calls."""
+
+    median_s: float = 0.0
+    """Median time before the result, or the first streamed item."""
+    sigma: float = 0.0
+    """Shape of the distribution, 0 for a fixed latency."""
+    max_s: float = 60.0
+    """Cap of the sampled latency."""
+    per_item_s: float = 0.0
+    """Time between two streamed items."""
+
+    def sample(self, rng: random.Random) -> float:
+        """Sample the latency of a call."""
+        if self.median_s <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return min(self.median_s, self.max_s)
+        return min(rng.lognormvariate(math.log(self.median_s), self.sigma), self.max_s)
+
+
+@dataclass
+class FakeLLM:
+    """A fake structured output backend."""
+
+    latency: FakeLatency = field(default_factory=FakeLatency)
+    """Latency of the calls."""
+    schema_latency: dict[str, FakeLatency] = field(default_factory=dict)
+    """Latency of the calls for some schema names, overriding ``latency``."""
+    seed: int = 0
+    """Seed for the generated content and the latencies."""
+    calls: Counter = field(default_factory=Counter)
+    """Number of calls for each schema name."""
+    prefix_cache_min_tokens: int = 0
+    """Report the prefixes at least this long as cached, once seen.
+
+    A local server reuses any prefix, OpenAI caches from 1024 tokens.
+    """
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latency_rng = random.Random(self.seed)
+        self._seen_prefixes: set[str] = set()
+
+    def get_cached_tokens(self, prompt_value: "PromptValue") -> int:
+        """Get the prompt tokens served from the simulated prompt cache."""
+        prefix = get_prefix(prompt_value)
+        prefix_tokens = estimate_tokens(prefix) if prefix else 0
+        if prefix_tokens == 0 or prefix_tokens < self.prefix_cache_min_tokens:
+            return 0
+        prefix_hash = hashlib.sha256(prefix.encode()).hexdigest()
+        with self._lock:
+            if prefix_hash in self._seen_prefixes:
+                return prefix_tokens
+            self._seen_prefixes.add(prefix_hash)
+        return 0
+
+    def get_rng(self, prompt_value: "PromptValue") -> random.Random:
+        """Get a random generator seeded by the prompt."""
+        prompt_hash = hashlib.sha256(get_prompt_text(prompt_value).encode()).digest()
+        return random.Random(int.from_bytes(prompt_hash[:8], "big") + self.seed)
+
+    def get_latency(self, schema: type[BaseModel]) -> FakeLatency:
+        """Get the latency distribution of the calls for the schema."""
+        return self.schema_latency.get(schema.__name__, self.latency)
+
+    def wait(self, schema: type[BaseModel]) -> None:
+        """Count the call and simulate its latency."""
+        latency = self.get_latency(schema)
+        with self._lock:
+            self.calls[schema.__name__] += 1
+            latency_s = latency.sample(self._latency_rng)
+        if latency_s > 0:
+            time.sleep(latency_s)
+
+    def get_structured_runnable(
+        self,
+        schema: type[BaseModel],
+        partial: bool = False,
+    ) -> "Runnable":
+        """Get a runnable returning fake results for the schema.
+
+        Args:
+            schema (type[BaseModel]): The schema of the result.
+            partial (bool): If True, stream the result as growing dicts.
+                If False, return the result along with a raw response
+                holding the estimated token usage, like ``include_raw=True``.
+        """
+        from langchain_core.runnables import RunnableGenerator, RunnableLambda
+
+        if partial:
+
+            def stream(prompt_values: Iterator["PromptValue"]) -> Iterator[dict]:
+                for prompt_value in prompt_values:
+                    yield from self.stream_result(schema, prompt_value)
+
+            return RunnableGenerator(stream)
+        return RunnableLambda(lambda pv: self.build_raw_result(schema, pv))
+
+    def build_raw_result(
+        self,
+        schema: type[BaseModel],
+        prompt_value: "PromptValue",
+    ) -> dict[str, Any]:
+        """Build a fake result, with the raw response and no parsing error."""
+        from langchain_core.messages import AIMessage
+
+        result = self.build_result(schema, prompt_value)
+        input_tokens = estimate_tokens(get_prompt_text(prompt_value))
+        output_tokens = estimate_tokens(result.model_dump_json())
+        raw = AIMessage(
+            content="",
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "input_token_details": {
+                    "cache_read": self.get_cached_tokens(prompt_value)
+                },
+            },
+        )
+        return {"raw": raw, "parsed": result, "parsing_error": None}
+
+    def build_result(self, schema: type[BaseModel], prompt_value: "PromptValue") -> Any:
+        """Build a fake result for the schema, after the call latency."""
+        self.wait(schema)
+        builder = self.get_builder(schema)
+        return schema.model_validate(builder(prompt_value))
+
+    def stream_result(
+        self,
+        schema: type[BaseModel],
+        prompt_value: "PromptValue",
+    ) -> Iterator[dict]:
+        """Stream a fake result for the schema, one list item at a time."""
+        result = self.build_result(schema, prompt_value).model_dump(mode="json")
+        per_item_s = self.get_latency(schema).per_item_s
+        yield {}
+        partial: dict = {}
+        for key, value in result.items():
+            if isinstance(value, list):
+                partial[key] = []
+                for item in value:
+                    if per_item_s > 0:
+                        time.sleep(per_item_s)
+                    partial[key] = partial[key] + [item]
+                    yield dict(partial)
+            partial[key] = value
+        yield result
+
+    def get_builder(self, schema: type[BaseModel]) -> Callable[["PromptValue"], dict]:
+        """Get the function building the fake result data for the schema."""
+        builders = {
+            "ConversationGeneratorResult": self.build_conversation,
+            "LessonBundleResult": self.build_bundle,
+            "TranslatorResult": self.build_translation,
+            "TranslatorBatchResult": self.build_translation_batch,
+            "ParagraphSplitterResult": self.build_split,
+            "TopicsPickerResult": self.build_topics,
+        }
+        if schema.__name__ not in builders:
+            raise ValueError(f"No fake result for {schema.__name__}")
+        return builders[schema.__name__]
+
+    def build_conversation(self, prompt_value: "PromptValue") -> dict:
+        """Build a conversation from the sample sentences."""
+        from convo_craft.llm.conversation_generator import CONVERSATION_SAMPLE
+
+        match = re.search(r"about (\d+) messages", get_prompt_text(prompt_value))
+        num_messages = int(match.group(1)) if match else 5
+        rng = self.get_rng(prompt_value)
+        lines = CONVERSATION_SAMPLE.splitlines()
+        turns = [
+            {"role": "user" if i % 2 == 0 else "system", "content": rng.choice(lines)}
+            for i in range(num_messages)
+        ]
+        return {"turns": turns}
+
+    def build_bundle(self, prompt_value: "PromptValue") -> dict:
+        """Build a conversation with translations and portions."""
+        turns = self.build_conversation(prompt_value)["turns"]
+        for turn in turns:
+            turn["translation"] = self.translate(turn["content"])
+            turn["portions"] = self.split(turn["content"])
+        return {"turns": turns}
+
+    def translate(self, text: str) -> str:
+        """Fake a translation."""
+        return f"[translated] {text}"
+
+    def split(self, paragraph: str) -> list[str]:
+        """Split a paragraph with the local rules, stripping the portions."""
+        from convo_craft.text.split_paragraph import LocalParagraphSplitter
+
+        portions = LocalParagraphSplitter().invoke(paragraph)
+        return [portion.strip() for portion in portions]
+
+    def build_translation(self, prompt_value: "PromptValue") -> dict:
+        """Translate the text at the end of the prompt."""
+        return {"target_text": self.translate(get_suffix(prompt_value))}
+
+    def build_translation_batch(self, prompt_value: "PromptValue") -> dict:
+        """Translate the numbered texts in the prompt."""
+        texts = re.findall(
+            r"Text \d+:\n(.*?)(?=\n\nText \d+:|\Z)",
+            get_suffix(prompt_value),
+            flags=re.DOTALL,
+        )
+        translations = [
+            {"source_text": text.strip(), "target_text": self.translate(text.strip())}
+            for text in texts
+        ]
+        return {"translations": translations}
+
+    def build_split(self, prompt_value: "PromptValue") -> dict:
+        """Split the paragraph at the end of the prompt."""
+        return {"portions": self.split(get_suffix(prompt_value))}
+
+    def build_topics(self, prompt_value: "PromptValue") -> dict:
+        """Pick some topics from the fake list."""
+        rng = self.get_rng(prompt_value)
+        return {"topics": rng.sample(FAKE_TOPICS, k=8)}
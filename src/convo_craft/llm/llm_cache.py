@@ -0,0 +1,155 @@
+"""Persistent cache for the structured LLM results."""
+
+from functools import cache
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from loguru import logger as lg
+from pydantic import BaseModel
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.utils.u_pathlib import check_create_fol
+
+if TYPE_CHECKING:
+    from langchain_core.prompt_values import PromptValue
+
+DEFAULT_MAX_ENTRIES = 50_000
+"""Maximum number of entries kept in the cache."""
+DEFAULT_MAX_AGE_S = 30 * 24 * 60 * 60
+"""Maximum age of an entry in seconds."""
+
+
+class LLMCache:
+    """A disk-backed cache of structured LLM results, stored in SQLite.
+
+    Entries are content-addressed: the key is a hash of the rendered prompt,
+    the model and its provider, the temperature and the result schema.
+    Expired entries are dropped when read and when the cache is evicted,
+    the least recently used entries are dropped when the cache is too large.
+    """
+
+    def __init__(
+        self,
+        db_fp: Path,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age_s: float = DEFAULT_MAX_AGE_S,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            db_fp (Path): The SQLite file to store the cache in.
+            max_entries (int): Maximum number of entries kept in the cache.
+            max_age_s (float): Maximum age of an entry in seconds.
+        """
+        self.db_fp = db_fp
+        self.max_entries = max_entries
+        self.max_age_s = max_age_s
+        check_create_fol(self.db_fp.parent)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_fp, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL"
+                ")"
+            )
+        self._sets_since_evict = 0
+
+    @staticmethod
+    def build_key(
+        prompt_value: "PromptValue",
+        chat_openai_config: ChatOpenAIConfig,
+        schema: type[BaseModel],
+    ) -> str:
+        """Build the cache key for a structured LLM call.
+
+        The API key is not part of the cache key.
+        """
+        key_data = {
+            "messages": [[m.type, m.content] for m in prompt_value.to_messages()],
+            "model": chat_openai_config.model,
+            "provider": chat_openai_config.provider,
+            "temperature": chat_openai_config.temperature,
+            "schema": schema.model_json_schema(),
+        }
+        key_str = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(key_str.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Get a cached value, or None if missing or expired."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.max_age_s:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """Set a cached value."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+        # amortize the eviction over several writes
+        self._sets_since_evict += 1
+        if self._sets_since_evict >= max(1, self.max_entries // 100):
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop the expired entries and the least recently used ones over the limit.
+
+        Returns:
+            int: The number of dropped entries.
+        """
+        self._sets_since_evict = 0
+        min_created_at = time.time() - self.max_age_s
+        with self._lock, self._conn:
+            expired = self._conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (min_created_at,)
+            ).rowcount
+            overflow = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed_at DESC"
+                " LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            ).rowcount
+        if expired or overflow:
+            lg.debug(f"Evicted {expired} expired and {overflow} overflow entries")
+        return expired + overflow
+
+    def clear(self) -> None:
+        """Drop all the entries."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+@cache
+def get_llm_cache() -> LLMCache:
+    """Get the process-wide LLM cache, stored in the data folder."""
+    from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+
+    return LLMCache(CONVO_CRAFT_PATHS.llm_cache_fp)
@@ -0,0 +1,268 @@
+"""Metrics of the structured LLM calls.
+
+Every call is recorded in the process-wide metrics, and in the session
+metrics set in the current context, if any.
+The metrics are labelled by component and model, and can be exported
+in the Prometheus text format or as JSON.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from functools import cache
+import json
+from pathlib import Path
+import threading
+from typing import Any, Iterator
+
+LATENCY_BUCKETS_S = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+"""Upper bounds of the latency histogram buckets, in seconds."""
+
+
+@dataclass
+class LLMCall:
+    """A single structured LLM call."""
+
+    component: str
+    model: str
+    wall_s: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    """Prompt tokens served from the provider prompt cache."""
+    retries: int = 0
+    hedged: bool = False
+    """Whether a duplicate call was sent because the first one was slow."""
+    cache_hit: bool = False
+    """Whether the result was served from the local cache."""
+    coalesced: bool = False
+    """Whether the result was shared from an identical call in flight."""
+    queued_s: float = 0.0
+    """Time spent waiting for the rate limits."""
+    error: bool = False
+
+
+@dataclass
+class LLMCallStats:
+    """Aggregated stats of the calls for a component and model."""
+
+    calls: int = 0
+    cache_hits: int = 0
+    coalesced: int = 0
+    errors: int = 0
+    retries: int = 0
+    hedges: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    wall_s: float = 0.0
+    """Total time spent in the model calls, the cache hits and coalesced excluded."""
+    queued_s: float = 0.0
+    """Total time spent waiting for the rate limits."""
+    max_wall_s: float = 0.0
+    latency_buckets: list[int] = field(
+        default_factory=lambda: [0] * len(LATENCY_BUCKETS_S)
+    )
+    """Number of model calls faster than each bound of ``LATENCY_BUCKETS_S``."""
+
+    @property
+    def model_calls(self) -> int:
+        """Number of calls that reached the model."""
+        return self.calls - self.cache_hits - self.coalesced
+
+    @property
+    def cached_ratio(self) -> float:
+        """Fraction of the prompt tokens served from the provider prompt cache."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    @property
+    def mean_wall_s(self) -> float:
+        """Mean time of the model calls."""
+        return self.wall_s / self.model_calls if self.model_calls else 0.0
+
+    def add(self, call: LLMCall) -> None:
+        """Add a call to the stats."""
+        self.calls += 1
+        self.errors += call.error
+        self.retries += call.retries
+        self.hedges += call.hedged
+        self.prompt_tokens += call.prompt_tokens
+        self.completion_tokens += call.completion_tokens
+        self.cached_tokens += call.cached_tokens
+        self.queued_s += call.queued_s
+        if call.cache_hit:
+            self.cache_hits += 1
+            return
+        if call.coalesced:
+            self.coalesced += 1
+            return
+        self.wall_s += call.wall_s
+        self.max_wall_s = max(self.max_wall_s, call.wall_s)
+        for i, bound in enumerate(LATENCY_BUCKETS_S):
+            if call.wall_s <= bound:
+                self.latency_buckets[i] += 1
+
+
+class LLMMetrics:
+    """Thread-safe metrics of the structured LLM calls."""
+
+    def __init__(self) -> None:
+        """Initialize empty metrics."""
+        self._lock = threading.Lock()
+        self.stats: dict[tuple[str, str], LLMCallStats] = {}
+
+    def record(self, call: LLMCall) -> None:
+        """Record a call."""
+        with self._lock:
+            key = (call.component, call.model)
+            if key not in self.stats:
+                self.stats[key] = LLMCallStats()
+            self.stats[key].add(call)
+
+    def clear(self) -> None:
+        """Drop all the recorded calls."""
+        with self._lock:
+            self.stats.clear()
+
+    def get_total(self) -> LLMCallStats:
+        """Get the stats of all the calls together."""
+        total = LLMCallStats()
+        with self._lock:
+            for stats in self.stats.values():
+                for name in (
+                    "calls",
+                    "cache_hits",
+                    "coalesced",
+                    "errors",
+                    "retries",
+                    "hedges",
+                    "prompt_tokens",
+                    "completion_tokens",
+                    "cached_tokens",
+                    "wall_s",
+                    "queued_s",
+                ):
+                    setattr(total, name, getattr(total, name) + getattr(stats, name))
+                total.max_wall_s = max(total.max_wall_s, stats.max_wall_s)
+                for i, count in enumerate(stats.latency_buckets):
+                    total.latency_buckets[i] += count
+        return total
+
+    def get_summary(self) -> list[dict[str, Any]]:
+        """Get one row per component and model, for display."""
+        with self._lock:
+            items = sorted(self.stats.items())
+        return [
+            {
+                "component": component,
+                "model": model,
+                "calls": stats.calls,
+                "cache hits": stats.cache_hits,
+                "coalesced": stats.coalesced,
+                "errors": stats.errors,
+                "hedges": stats.hedges,
+                "mean s": round(stats.mean_wall_s, 3),
+                "max s": round(stats.max_wall_s, 3),
+                "queued s": round(stats.queued_s, 3),
+                "prompt tokens": stats.prompt_tokens,
+                "completion tokens": stats.completion_tokens,
+                "cached tokens": stats.cached_tokens,
+                "cached ratio": round(stats.cached_ratio, 3),
+            }
+            for (component, model), stats in items
+        ]
+
+    def to_json(self) -> str:
+        """Export a JSON snapshot of the metrics."""
+        with self._lock:
+            items = sorted(self.stats.items())
+        snapshot = [
+            {"component": component, "model": model, **asdict(stats)}
+            for (component, model), stats in items
+        ]
+        return json.dumps(
+            {"latency_buckets_s": LATENCY_BUCKETS_S, "stats": snapshot}, indent=2
+        )
+
+    def to_prometheus(self) -> str:
+        """Export the metrics in the Prometheus text format."""
+        with self._lock:
+            items = sorted(self.stats.items())
+        counters = {
+            "calls": "Number of LLM calls.",
+            "cache_hits": "Number of LLM calls served from the local cache.",
+            "coalesced": "Number of LLM calls served by an identical call in flight.",
+            "errors": "Number of failed LLM calls.",
+            "retries": "Number of LLM call retries.",
+            "hedges": "Number of hedged duplicate LLM calls.",
+        }
+        lines = []
+        for name, help_text in counters.items():
+            metric = f"convo_craft_llm_{name}_total"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for (component, model), stats in items:
+                labels = f'component="{component}",model="{model}"'
+                lines.append(f"{metric}{{{labels}}} {getattr(stats, name)}")
+        metric = "convo_craft_llm_tokens_total"
+        lines += [
+            f"# HELP {metric} Number of LLM tokens, by kind.",
+            f"# TYPE {metric} counter",
+        ]
+        for (component, model), stats in items:
+            labels = f'component="{component}",model="{model}"'
+            for kind in ("prompt", "completion", "cached"):
+                value = getattr(stats, f"{kind}_tokens")
+                lines.append(f'{metric}{{{labels},kind="{kind}"}} {value}')
+        metric = "convo_craft_llm_call_duration_seconds"
+        lines += [
+            f"# HELP {metric} Duration of the LLM calls that reached the model.",
+            f"# TYPE {metric} histogram",
+        ]
+        for (component, model), stats in items:
+            labels = f'component="{component}",model="{model}"'
+            for bound, count in zip(LATENCY_BUCKETS_S, stats.latency_buckets):
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {stats.model_calls}')
+            lines.append(f"{metric}_sum{{{labels}}} {stats.wall_s}")
+            lines.append(f"{metric}_count{{{labels}}} {stats.model_calls}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_fp: Path) -> None:
+        """Write the metrics to a file.
+
+        The file is JSON if the suffix is .json, Prometheus text otherwise.
+        """
+        if metrics_fp.suffix == ".json":
+            metrics_fp.write_text(self.to_json())
+        else:
+            metrics_fp.write_text(self.to_prometheus())
+
+
+@cache
+def get_llm_metrics() -> LLMMetrics:
+    """Get the process-wide metrics."""
+    return LLMMetrics()
+
+
+session_metrics: ContextVar[LLMMetrics | None] = ContextVar(
+    "session_metrics", default=None
+)
+"""The metrics of the current session, if any."""
+
+
+@contextmanager
+def track_session(metrics: LLMMetrics) -> Iterator[LLMMetrics]:
+    """Also record the calls made in this context in the session metrics."""
+    token = session_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        session_metrics.reset(token)
+
+
+def record_llm_call(call: LLMCall) -> None:
+    """Record a call in the process-wide and session metrics."""
+    get_llm_metrics().record(call)
+    metrics = session_metrics.get()
+    if metrics is not None:
+        metrics.record(call)
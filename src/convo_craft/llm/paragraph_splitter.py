@@ -1,12 +1,16 @@
 """Paragraph splitter module."""
 
 from dataclasses import dataclass
+from functools import cache
 
-from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
-from langchain_openai import ChatOpenAI
+from loguru import logger as lg
 from pydantic import BaseModel, Field
 
 from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.call_policy import CircuitOpenError
+from convo_craft.llm.prompt_compiler import CompiledPrompt, compile_prompt
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.text.split_paragraph import LocalParagraphSplitter
 
 
 class ParagraphSplitterResult(BaseModel):
@@ -22,14 +26,31 @@ class ParagraphSplitterResult(BaseModel):
 
     portions: list[str] = Field(description="The split paragraph.")
 
+    def matches(self, paragraph: str) -> bool:
+        """Check that the portions concatenate back to the paragraph."""
+        return portions_match_paragraph(paragraph, self.portions)
 
-split_paragraph_template = """Split the following paragraph into portions:
 
-{paragraph}
+def portions_match_paragraph(paragraph: str, portions: list[str]) -> bool:
+    """Check that the portions concatenate back to the paragraph.
+
+    The whitespace is ignored, as the models usually strip the portions.
+    Empty portions are not allowed.
+    """
+    if not portions or any(not portion.strip() for portion in portions):
+        return False
+    joined = "".join(portions)
+    return "".join(paragraph.split()) == "".join(joined.split())
+
+
+split_paragraph_template = """Split the paragraph of the user into portions.
 """
-split_paragraph_prompt = ChatPromptTemplate(
-    [HumanMessagePromptTemplate.from_template(split_paragraph_template)]
-)
+
+
+@cache
+def get_split_paragraph_prompt() -> CompiledPrompt:
+    """Compile the prompt on first use, the paragraph is the suffix."""
+    return compile_prompt((split_paragraph_template,), "{paragraph}")
 
 
 @dataclass
@@ -37,15 +58,50 @@ class ParagraphSplitter:
     """A paragraph splitter."""
 
     chat_openai_config: ChatOpenAIConfig
+    use_cache: bool = True
+    """Whether to cache the results on disk."""
+    local_splitter: LocalParagraphSplitter | None = None
+    """Split the paragraphs with local rules, using the LLM only as a fallback."""
+    max_ambiguity: float = 0.0
+    """Use the LLM if the ambiguity of the local split is above this."""
+    hedge: bool = False
+    """Hedge the slow interactive calls, on the critical path of the learner."""
 
     def __post_init__(self):
         """Initialize the paragraph splitter."""
-        self.model = ChatOpenAI(**self.chat_openai_config.model_dump())
-        self.structured_llm = self.model.with_structured_output(ParagraphSplitterResult)
+        self.structured_llm = StructuredLLM(
+            chat_openai_config=self.chat_openai_config,
+            schema=ParagraphSplitterResult,
+            use_cache=self.use_cache,
+            component="paragraph_splitter",
+            hedge=self.hedge,
+        )
 
     def invoke(self, paragraph: str) -> ParagraphSplitterResult:
-        """Split the paragraph."""
-        split_paragraph_value = split_paragraph_prompt.invoke({"paragraph": paragraph})
+        """Split the paragraph.
+
+        If a local splitter is set, the LLM is called only when the local split
+        is too ambiguous, and the local split is kept if the LLM call
+        times out or the provider is failing.
+        """
+        if self.local_splitter is None:
+            return self.invoke_llm(paragraph)
+        portions = self.local_splitter.invoke(paragraph)
+        ambiguity = self.local_splitter.get_ambiguity(portions)
+        if ambiguity <= self.max_ambiguity:
+            return ParagraphSplitterResult(portions=portions)
+        lg.debug(f"Ambiguous local split ({ambiguity:.2f}), using the LLM")
+        try:
+            return self.invoke_llm(paragraph)
+        except (CircuitOpenError, TimeoutError) as e:
+            lg.warning(f"Keeping the local split: {e}")
+            return ParagraphSplitterResult(portions=portions)
+
+    def invoke_llm(self, paragraph: str) -> ParagraphSplitterResult:
+        """Split the paragraph with the LLM."""
+        split_paragraph_value = get_split_paragraph_prompt().invoke(
+            {"paragraph": paragraph}
+        )
         output = self.structured_llm.invoke(split_paragraph_value)
         if not isinstance(output, ParagraphSplitterResult):
             raise ValueError(f"Unexpected output type: {type(output)}")
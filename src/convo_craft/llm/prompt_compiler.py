@@ -0,0 +1,60 @@
+"""Prompts laid out for the provider prompt caching.
+
+A compiled prompt is a static prefix, rendered once per configuration,
+followed by a variable suffix, rendered on each call.
+The providers cache the longest prefix already seen,
+so the instructions and the examples go first, and the per-call input last:
+the repeated calls of a configuration then share their cached prefix.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_core.prompt_values import ChatPromptValue
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A prompt with a pre-rendered static prefix and a variable suffix."""
+
+    prefix: tuple["BaseMessage", ...]
+    """The static messages, shared by all the calls."""
+    suffix_template: str
+    """The template of the last message, formatted with the call input."""
+
+    def invoke(self, suffix_input: dict[str, Any]) -> "ChatPromptValue":
+        """Render the prompt for a call, formatting only the suffix."""
+        from langchain_core.messages import HumanMessage
+        from langchain_core.prompt_values import ChatPromptValue
+
+        suffix = HumanMessage(content=self.suffix_template.format(**suffix_input))
+        return ChatPromptValue(messages=[*self.prefix, suffix])
+
+
+def compile_prompt(
+    prefix_templates: tuple[str, ...],
+    suffix_template: str,
+    **static_input: Any,
+) -> CompiledPrompt:
+    """Render the static prefix of a prompt, for a configuration.
+
+    Args:
+        prefix_templates (tuple[str, ...]): The templates of the static part,
+            joined in a single system message.
+        suffix_template (str): The template of the variable part,
+            sent as the last, human message.
+        **static_input: The values of the prefix templates, the configuration.
+
+    Returns:
+        CompiledPrompt: The prompt, ready to render the suffix of each call.
+    """
+    from langchain_core.messages import SystemMessage
+
+    prefix_text = "\n".join(t.format(**static_input) for t in prefix_templates)
+    return CompiledPrompt(
+        prefix=(SystemMessage(content=prefix_text),),
+        suffix_template=suffix_template,
+    )
+
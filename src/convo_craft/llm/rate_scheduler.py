@@ -0,0 +1,289 @@
+"""Shared rate limits of the LLM calls, with priority classes.
+
+All the structured LLM calls of a key and model go through the same scheduler,
+which holds a token bucket for the requests and one for the estimated tokens.
+The waiting calls are served by priority class, then in arrival order:
+the interactive calls first, then the prefetches, then the bulk generation.
+The background classes cannot empty the buckets, a reserve is kept
+for the interactive calls, so they do not wait behind the background work.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+import hashlib
+import heapq
+from itertools import count
+import threading
+import time
+from typing import Iterator, Literal
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+
+CallPriority = Literal["interactive", "prefetch", "bulk"]
+PRIORITIES: tuple[CallPriority, ...] = ("interactive", "prefetch", "bulk")
+"""The priority classes, the first served first."""
+BACKGROUND_RESERVE = 0.2
+"""Fraction of the buckets the background classes leave to the interactive calls."""
+MAX_BACKGROUND_QUEUE = 64
+"""Reject the background calls when this many of their class are waiting."""
+EXPECTED_COMPLETION_TOKENS = 400
+"""Completion tokens counted before the call, corrected with the actual usage."""
+
+call_priority: ContextVar[CallPriority] = ContextVar(
+    "call_priority", default="interactive"
+)
+"""The priority class of the LLM calls made in the current context."""
+
+
+@contextmanager
+def use_priority(priority: CallPriority) -> Iterator[None]:
+    """Make the LLM calls in this context with the priority class."""
+    token = call_priority.set(priority)
+    try:
+        yield
+    finally:
+        call_priority.reset(token)
+
+
+class SchedulerQueueFullError(RuntimeError):
+    """Too many background calls are waiting, the call was not queued."""
+
+
+class TokenBucket:
+    """A bucket refilled at a constant rate, up to its capacity.
+
+    Not thread-safe, the scheduler holds the lock.
+    """
+
+    def __init__(self, per_minute: int) -> None:
+        """Initialize a full bucket.
+
+        Args:
+            per_minute (int): The refill rate, the capacity is one minute of it.
+        """
+        self.capacity = float(per_minute)
+        self.rate_per_s = per_minute / 60
+        self.level = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        """Add what was refilled since the last update."""
+        elapsed = now - self.updated_at
+        self.level = min(self.capacity, self.level + elapsed * self.rate_per_s)
+        self.updated_at = now
+
+    def get_wait(self, amount: float, reserve: float) -> float:
+        """Get how long until the amount can be taken, keeping the reserve."""
+        # an amount larger than the bucket waits for the bucket to be full
+        amount = min(amount, self.capacity - reserve)
+        missing = amount + reserve - self.level
+        return max(0.0, missing / self.rate_per_s)
+
+
+@dataclass
+class PriorityStats:
+    """Stats of the calls of a priority class."""
+
+    queued: int = 0
+    """Number of calls waiting now."""
+    max_queued: int = 0
+    granted: int = 0
+    rejected: int = 0
+    wait_s: float = 0.0
+    """Total time the granted calls waited."""
+
+
+class RateScheduler:
+    """Token buckets for the requests and the tokens of a key and model."""
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        background_reserve: float = BACKGROUND_RESERVE,
+        max_background_queue: int = MAX_BACKGROUND_QUEUE,
+    ) -> None:
+        """Initialize the scheduler, with full buckets.
+
+        Args:
+            requests_per_minute (int | None): The request limit, None for no limit.
+            tokens_per_minute (int | None): The token limit, None for no limit.
+            background_reserve (float): Fraction of the buckets
+                the background classes leave to the interactive calls.
+            max_background_queue (int): Reject the background calls
+                when this many of their class are waiting.
+        """
+        self.requests = (
+            None if requests_per_minute is None else TokenBucket(requests_per_minute)
+        )
+        self.tokens = (
+            None if tokens_per_minute is None else TokenBucket(tokens_per_minute)
+        )
+        self.background_reserve = background_reserve
+        self.max_background_queue = max_background_queue
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[int, int]] = []
+        """Heap of the waiting calls, as priority rank and arrival order."""
+        self._arrivals = count()
+        self.stats = {priority: PriorityStats() for priority in PRIORITIES}
+
+    def get_wait(self, tokens: int, priority: CallPriority, now: float) -> float:
+        """Get how long until both buckets have room for the call."""
+        wait_s = 0.0
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is None:
+                continue
+            bucket.refill(now)
+            reserve = 0.0
+            if priority != "interactive":
+                reserve = bucket.capacity * self.background_reserve
+            wait_s = max(wait_s, bucket.get_wait(amount, reserve))
+        return wait_s
+
+    def acquire(self, tokens: int, priority: CallPriority | None = None) -> float:
+        """Wait until the call can be made, and take its share of the buckets.
+
+        Args:
+            tokens (int): The estimated tokens of the call.
+            priority (CallPriority | None): The priority class,
+                if None the class of the current context.
+
+        Raises:
+            SchedulerQueueFullError: If too many background calls are waiting.
+
+        Returns:
+            float: The time waited, in seconds.
+        """
+        if priority is None:
+            priority = call_priority.get()
+        stats = self.stats[priority]
+        start = time.monotonic()
+        with self._cond:
+            if priority != "interactive" and stats.queued >= self.max_background_queue:
+                stats.rejected += 1
+                raise SchedulerQueueFullError(
+                    f"{stats.queued} {priority} calls already waiting"
+                )
+            ticket = (PRIORITIES.index(priority), next(self._arrivals))
+            heapq.heappush(self._waiting, ticket)
+            stats.queued += 1
+            stats.max_queued = max(stats.max_queued, stats.queued)
+            try:
+                while True:
+                    now = time.monotonic()
+                    # only the first waiting call can take from the buckets
+                    timeout = None
+                    if self._waiting[0] == ticket:
+                        timeout = self.get_wait(tokens, priority, now)
+                        if timeout == 0.0:
+                            break
+                    self._cond.wait(timeout)
+                heapq.heappop(self._waiting)
+                if self.requests is not None:
+                    self.requests.level -= 1
+                if self.tokens is not None:
+                    self.tokens.level -= tokens
+            finally:
+                stats.queued -= 1
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            waited_s = time.monotonic() - start
+            stats.granted += 1
+            stats.wait_s += waited_s
+        return waited_s
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket with the actual usage of a call."""
+        if self.tokens is None:
+            return
+        with self._cond:
+            self.tokens.level += estimated_tokens - actual_tokens
+            self._cond.notify_all()
+
+    def get_stats(self) -> dict[CallPriority, PriorityStats]:
+        """Get a copy of the stats of each priority class."""
+        with self._cond:
+            return {priority: replace(stats) for priority, stats in self.stats.items()}
+
+    def get_summary(self) -> list[dict[str, str | int | float]]:
+        """Get one row per priority class, for display."""
+        return [
+            {
+                "priority": priority,
+                "queued": stats.queued,
+                "max queued": stats.max_queued,
+                "granted": stats.granted,
+                "rejected": stats.rejected,
+                "wait s": round(stats.wait_s, 3),
+            }
+            for priority, stats in self.get_stats().items()
+        ]
+
+
+_schedulers: dict[tuple[str, str], RateScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler_key(chat_openai_config: ChatOpenAIConfig) -> tuple[str, str]:
+    """Get the key the provider limits apply to: the hashed API key and the model."""
+    api_key = chat_openai_config.api_key
+    key_str = chat_openai_config.provider + (chat_openai_config.base_url or "")
+    if api_key is not None:
+        key_str += api_key.get_secret_value()
+    return hashlib.sha256(key_str.encode()).hexdigest()[:12], chat_openai_config.model
+
+
+def get_rate_scheduler(chat_openai_config: ChatOpenAIConfig) -> RateScheduler | None:
+    """Get the process-wide scheduler of a key and model, or None if unlimited.
+
+    The first config seen for a key and model sets the limits.
+    """
+    requests_per_minute = chat_openai_config.requests_per_minute
+    tokens_per_minute = chat_openai_config.tokens_per_minute
+    if requests_per_minute is None and tokens_per_minute is None:
+        return None
+    with _schedulers_lock:
+        key = get_scheduler_key(chat_openai_config)
+        if key not in _schedulers:
+            _schedulers[key] = RateScheduler(requests_per_minute, tokens_per_minute)
+        return _schedulers[key]
+
+
+def schedulers_to_prometheus() -> str:
+    """Export the queue depth and waits of all the schedulers, in Prometheus format."""
+    with _schedulers_lock:
+        items = sorted(_schedulers.items())
+    metrics = {
+        "queued": (
+            "convo_craft_llm_scheduler_queued",
+            "gauge",
+            "Number of LLM calls waiting for the rate limits.",
+        ),
+        "granted": (
+            "convo_craft_llm_scheduler_granted_total",
+            "counter",
+            "Number of LLM calls let through the rate limits.",
+        ),
+        "rejected": (
+            "convo_craft_llm_scheduler_rejected_total",
+            "counter",
+            "Number of background LLM calls rejected by the backpressure.",
+        ),
+        "wait_s": (
+            "convo_craft_llm_scheduler_wait_seconds_total",
+            "counter",
+            "Total time the LLM calls waited for the rate limits.",
+        ),
+    }
+    all_stats = [(key, scheduler.get_stats()) for key, scheduler in items]
+    lines = []
+    for name, (metric, kind, help_text) in metrics.items():
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for (key_id, model), stats in all_stats:
+            for priority, priority_stats in stats.items():
+                labels = f'key="{key_id}",model="{model}",priority="{priority}"'
+                lines.append(f"{metric}{{{labels}}} {getattr(priority_stats, name)}")
+    return "\n".join(lines) + "\n" if items else ""
@@ -0,0 +1,88 @@
+"""Coalescing of the identical LLM requests in flight at the same time.
+
+When many sessions send the same request at once, like a class starting
+on the same topic, only the first caller sends it upstream:
+the others wait for it and share its result.
+"""
+
+from concurrent.futures import Future
+from functools import cache
+import threading
+from typing import Callable, TypeVar
+
+from loguru import logger as lg
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Run a single call per key at a time, sharing its outcome with the waiters.
+
+    The key identifies the request, a call only coalesces with the calls
+    still in flight: once it finishes, the next call with the key runs again.
+    A failure is shared too, the waiters get the same exception.
+    """
+
+    def __init__(self) -> None:
+        """Initialize with no call in flight."""
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        self.calls = 0
+        """Number of calls that ran."""
+        self.coalesced = 0
+        """Number of calls that waited on an identical call in flight."""
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls running now."""
+        with self._lock:
+            return len(self._in_flight)
+
+    @property
+    def coalesced_ratio(self) -> float:
+        """Fraction of the requests served by a call in flight."""
+        requests = self.calls + self.coalesced
+        return self.coalesced / requests if requests else 0.0
+
+    def run(self, key: str, fn: Callable[[], T]) -> tuple[T, bool]:
+        """Run the call, or wait for the identical call in flight.
+
+        Args:
+            key (str): The key of the request.
+            fn (Callable[[], T]): The call, run only if no call with the key
+                is in flight.
+
+        Returns:
+            tuple[T, bool]: The result, and whether it was shared
+                from another call.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = Future()
+                self._in_flight[key] = future
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            lg.debug(f"Waiting for the identical call in flight {key[:8]}")
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return result, False
+
+
+@cache
+def get_single_flight() -> SingleFlight:
+    """Get the process-wide single-flight group of the LLM calls."""
+    return SingleFlight()
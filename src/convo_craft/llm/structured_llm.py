@@ -0,0 +1,269 @@
+"""Structured output LLM shared by the llm components."""
+
+from dataclasses import dataclass
+import json
+import time
+from typing import TYPE_CHECKING, Any, Iterator
+
+from loguru import logger as lg
+from pydantic import BaseModel, ValidationError
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.call_policy import get_call_policy
+from convo_craft.llm.client_registry import ChatModelRegistry
+from convo_craft.llm.llm_cache import LLMCache, get_llm_cache
+from convo_craft.llm.llm_metrics import LLMCall, record_llm_call
+from convo_craft.llm.rate_scheduler import (
+    EXPECTED_COMPLETION_TOKENS,
+    call_priority,
+    get_rate_scheduler,
+    get_scheduler_key,
+)
+from convo_craft.llm.single_flight import SingleFlight, get_single_flight
+from convo_craft.llm.token_budget import estimate_tokens
+
+if TYPE_CHECKING:
+    from langchain_core.prompt_values import PromptValue
+
+
+def get_usage(raw: Any) -> tuple[int, int, int]:
+    """Get the prompt, completion and cached token counts of a raw response."""
+    from langchain_core.messages import AIMessage
+
+    if not isinstance(raw, AIMessage) or raw.usage_metadata is None:
+        return 0, 0, 0
+    usage = raw.usage_metadata
+    cached = usage.get("input_token_details", {}).get("cache_read", 0)
+    return usage["input_tokens"], usage["output_tokens"], cached or 0
+
+
+@dataclass
+class StructuredLLM:
+    """An LLM that returns a structured result.
+
+    The results are cached on disk, keyed on the rendered prompt,
+    the model, the temperature and the result schema.
+    The identical calls in flight at the same time with the same API key,
+    across all the sessions, share a single model call.
+    The model calls wait for the rate limits of the key and model,
+    in the priority class of the context.
+    Every call is recorded in the LLM metrics, labelled by component and model.
+    """
+
+    chat_openai_config: ChatOpenAIConfig
+    schema: type[BaseModel]
+    use_cache: bool = True
+    cache: LLMCache | None = None
+    """The cache to use, if None the process-wide cache is used."""
+    component: str = ""
+    """The component label of the metrics, if empty the schema name is used."""
+    max_parse_retries: int = 1
+    """How many times to retry a call whose output could not be parsed."""
+    hedge: bool = False
+    """Hedge and time out the slow interactive calls, fail fast on provider failures."""
+    coalesce: bool = True
+    """Share a single model call between the identical calls in flight."""
+    single_flight: SingleFlight | None = None
+    """The single-flight group to use, if None the process-wide one is used."""
+
+    def __post_init__(self) -> None:
+        """Initialize the structured LLM, sharing the model with the registry."""
+        if not self.component:
+            self.component = self.schema.__name__
+        registry = ChatModelRegistry()
+        self.model = registry.get_model(self.chat_openai_config)
+        self.runnable = registry.get_structured_runnable(
+            self.chat_openai_config, self.schema
+        )
+        self.partial_runnable = registry.get_structured_runnable(
+            self.chat_openai_config, self.schema, partial=True
+        )
+        self.call_policy = None
+        if self.hedge:
+            self.call_policy = get_call_policy(
+                self.component, self.schema.__name__, self.chat_openai_config.model
+            )
+        self.rate_scheduler = get_rate_scheduler(self.chat_openai_config)
+
+    def get_cache(self) -> LLMCache | None:
+        """Get the cache to use, or None if caching is disabled."""
+        if not self.use_cache:
+            return None
+        if self.cache is None:
+            self.cache = get_llm_cache()
+        return self.cache
+
+    def get_cached(self, cache: LLMCache, key: str) -> BaseModel | None:
+        """Get the cached result, or None if missing or invalid."""
+        cached = cache.get(key)
+        if cached is None:
+            return None
+        try:
+            output = self.schema.model_validate_json(cached)
+        except ValidationError:
+            lg.warning(f"Invalid cache entry for {self.schema.__name__}")
+            return None
+        lg.debug(f"Cache hit for {self.schema.__name__}")
+        return output
+
+    def get_single_flight(self) -> SingleFlight | None:
+        """Get the single-flight group to use, or None if not coalescing."""
+        if not self.coalesce:
+            return None
+        if self.single_flight is None:
+            self.single_flight = get_single_flight()
+        return self.single_flight
+
+    def invoke(self, prompt_value: "PromptValue") -> BaseModel:
+        """Invoke the LLM, returning the cached result if available."""
+        call = LLMCall(component=self.component, model=self.chat_openai_config.model)
+        start = time.perf_counter()
+        try:
+            return self._invoke(prompt_value, call)
+        except Exception:
+            call.error = True
+            raise
+        finally:
+            call.wall_s = time.perf_counter() - start
+            record_llm_call(call)
+
+    def _invoke(self, prompt_value: "PromptValue", call: LLMCall) -> BaseModel:
+        """Invoke the LLM, filling the call metrics."""
+        cache = self.get_cache()
+        single_flight = self.get_single_flight()
+        if cache is None and single_flight is None:
+            return self.invoke_runnable(prompt_value, call)
+        key = LLMCache.build_key(prompt_value, self.chat_openai_config, self.schema)
+        if cache is not None:
+            cached = self.get_cached(cache, key)
+            if cached is not None:
+                call.cache_hit = True
+                return cached
+
+        def call_model() -> BaseModel:
+            output = self.invoke_runnable(prompt_value, call)
+            if cache is not None and isinstance(output, self.schema):
+                cache.set(key, output.model_dump_json())
+            return output
+
+        if single_flight is None:
+            return call_model()
+        # a call is only shared with the callers of the same API key
+        api_key_hash, _ = get_scheduler_key(self.chat_openai_config)
+        output, shared = single_flight.run(f"{key}:{api_key_hash}", call_model)
+        if not shared:
+            return output
+        call.coalesced = True
+        # each caller gets its own copy of the shared result
+        return output.model_copy(deep=True)
+
+    def invoke_runnable(self, prompt_value: "PromptValue", call: LLMCall) -> BaseModel:
+        """Invoke the runnable, retrying when the output cannot be parsed.
+
+        The runnable returns the raw response along with the parsed output,
+        the token counts of the raw response are added to the call metrics.
+        A runnable returning the parsed output directly is also accepted.
+        """
+        while True:
+            output = self.call_runnable(prompt_value, call)
+            if not isinstance(output, dict) or "parsed" not in output:
+                return output
+            prompt_tokens, completion_tokens, cached_tokens = get_usage(output["raw"])
+            call.prompt_tokens += prompt_tokens
+            call.completion_tokens += completion_tokens
+            call.cached_tokens += cached_tokens
+            if output["parsing_error"] is None and output["parsed"] is not None:
+                return output["parsed"]
+            if call.retries >= self.max_parse_retries:
+                error = output["parsing_error"]
+                raise error or ValueError(f"No output for {self.schema.__name__}")
+            call.retries += 1
+            lg.warning(f"Retrying unparsable output for {self.schema.__name__}")
+
+    def call_runnable(self, prompt_value: "PromptValue", call: LLMCall) -> Any:
+        """Call the runnable once, under the call policy if hedging.
+
+        Only the interactive calls are hedged, a duplicate background call
+        would spend the quota the interactive calls wait for.
+        """
+        if self.call_policy is None or call_priority.get() != "interactive":
+            return self.invoke_scheduled(prompt_value, call)
+        output, hedged = self.call_policy.run(
+            lambda: self.invoke_scheduled(prompt_value, call)
+        )
+        call.hedged = call.hedged or hedged
+        return output
+
+    def invoke_scheduled(self, prompt_value: "PromptValue", call: LLMCall) -> Any:
+        """Invoke the runnable once the rate limits let the call through.
+
+        The tokens are estimated before the call,
+        and corrected with the usage of the raw response.
+        """
+        if self.rate_scheduler is None:
+            return self.runnable.invoke(prompt_value)
+        estimated = estimate_tokens(prompt_value.to_string())
+        estimated += EXPECTED_COMPLETION_TOKENS
+        call.queued_s += self.rate_scheduler.acquire(estimated)
+        output = self.runnable.invoke(prompt_value)
+        actual = estimated
+        if isinstance(output, dict) and "raw" in output:
+            prompt_tokens, completion_tokens, _ = get_usage(output["raw"])
+            if prompt_tokens or completion_tokens:
+                actual = prompt_tokens + completion_tokens
+        self.rate_scheduler.settle(estimated, actual)
+        return output
+
+    def stream(self, prompt_value: "PromptValue") -> Iterator[dict]:
+        """Stream the result, as dicts parsed from the partial output.
+
+        Each dict holds all the output generated so far, the last one is complete.
+        A cached result is yielded as a single complete dict.
+        The streamed calls are recorded without token counts.
+        """
+        call = LLMCall(component=self.component, model=self.chat_openai_config.model)
+        start = time.perf_counter()
+        try:
+            yield from self._stream(prompt_value, call)
+        except Exception:
+            call.error = True
+            raise
+        finally:
+            call.wall_s = time.perf_counter() - start
+            record_llm_call(call)
+
+    def _stream(self, prompt_value: "PromptValue", call: LLMCall) -> Iterator[dict]:
+        """Stream the result, filling the call metrics."""
+        cache = self.get_cache()
+        key = ""
+        if cache is not None:
+            key = cache.build_key(prompt_value, self.chat_openai_config, self.schema)
+            cached = self.get_cached(cache, key)
+            if cached is not None:
+                call.cache_hit = True
+                yield cached.model_dump(mode="json")
+                return
+        last_partial = None
+        if self.rate_scheduler is None:
+            for partial in self.partial_runnable.stream(prompt_value):
+                last_partial = partial
+                yield partial
+        else:
+            prompt_tokens = estimate_tokens(prompt_value.to_string())
+            estimated = prompt_tokens + EXPECTED_COMPLETION_TOKENS
+            call.queued_s = self.rate_scheduler.acquire(estimated)
+            try:
+                for partial in self.partial_runnable.stream(prompt_value):
+                    last_partial = partial
+                    yield partial
+            finally:
+                # the parsed chunks have no usage, the last one has the whole output
+                actual = estimated
+                if last_partial is not None:
+                    actual = prompt_tokens + estimate_tokens(json.dumps(last_partial))
+                self.rate_scheduler.settle(estimated, actual)
+        if last_partial is None:
+            raise ValueError(f"Empty stream for {self.schema.__name__}")
+        output = self.schema.model_validate(last_partial)
+        if cache is not None:
+            cache.set(key, output.model_dump_json())
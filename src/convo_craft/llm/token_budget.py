@@ -0,0 +1,40 @@
+"""Rough token estimates, to keep the prompts under a budget."""
+
+CHARS_PER_TOKEN = 4
+"""Average number of characters per token, for the estimates."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text.
+
+    A cheap approximation, good enough to size batches and budgets.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_by_token_budget(texts: list[str], max_tokens: int) -> list[list[str]]:
+    """Split the texts into consecutive chunks under the token budget.
+
+    A text longer than the budget gets a chunk of its own.
+
+    Args:
+        texts (list[str]): The texts to split.
+        max_tokens (int): The maximum number of estimated tokens per chunk.
+
+    Returns:
+        list[list[str]]: The chunks of texts, in the original order.
+    """
+    chunks: list[list[str]] = []
+    chunk: list[str] = []
+    chunk_tokens = 0
+    for text in texts:
+        text_tokens = estimate_tokens(text)
+        if chunk and chunk_tokens + text_tokens > max_tokens:
+            chunks.append(chunk)
+            chunk = []
+            chunk_tokens = 0
+        chunk.append(text)
+        chunk_tokens += text_tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
@@ -1,13 +1,16 @@
 """Topic picker module."""
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import cache
 
-from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate
-from langchain_openai import ChatOpenAI
 from pydantic import BaseModel, Field
 
 from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.prompt_compiler import CompiledPrompt, compile_prompt
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.llm.token_budget import estimate_tokens
+from convo_craft.text.topic_index import TopicIndex
 
 
 class TopicsPickerResult(BaseModel):
@@ -22,13 +25,22 @@ class TopicsPickerResult(BaseModel):
 topic_picker_template = """Generate a list of topics for a conversation \
 that should be used to teach the user the language.
 Assume that the user has an {understanding_level} level of understanding of the language.
-
-Here are some options already in the system, generate new topics for the user:
+"""
+old_topics_template = """Here are some options already in the system, \
+generate new topics for the user:
 {old_topics}
 """
-topic_picker_prompt = ChatPromptTemplate(
-    [SystemMessagePromptTemplate.from_template(topic_picker_template)]
-)
+
+
+@cache
+def get_topic_picker_prompt(understanding_level: str) -> CompiledPrompt:
+    """Compile the prompt of a level on first use, the old topics are the suffix."""
+    return compile_prompt(
+        (topic_picker_template,),
+        old_topics_template,
+        understanding_level=understanding_level,
+    )
+
 
 OLD_TOPICS = [
     "How to order food at a restaurant",
@@ -48,22 +60,53 @@ class TopicsPicker:
 
     chat_openai_config: ChatOpenAIConfig
     understanding_level: str
+    use_cache: bool = True
+    """Whether to cache the results on disk."""
+    topic_index: TopicIndex = field(default_factory=TopicIndex)
+    """The index of the known topics, shared with the caller to keep it warm."""
+    old_topics_max_tokens: int = 400
+    """The token budget of the old topics sent in the prompt."""
+    max_similarity: float = 0.5
+    """Reject the new topics at least this similar to a known one."""
 
     def __post_init__(self):
         """Initialize the topic picker."""
-        self.model = ChatOpenAI(**self.chat_openai_config.model_dump())
-        self.structured_llm = self.model.with_structured_output(TopicsPickerResult)
+        self.structured_llm = StructuredLLM(
+            chat_openai_config=self.chat_openai_config,
+            schema=TopicsPickerResult,
+            use_cache=self.use_cache,
+            component="topic_picker",
+        )
+
+    def select_old_topics(self) -> list[str]:
+        """Select a diverse subset of the known topics under the token budget."""
+        selected: list[str] = []
+        tokens = 0
+        for topic in self.topic_index.iter_diverse():
+            tokens += estimate_tokens(topic)
+            if tokens > self.old_topics_max_tokens:
+                break
+            selected.append(topic)
+        return selected
 
     def invoke(self, old_topics: list[str]) -> TopicsPickerResult:
-        """Pick a topic."""
-        old_topics_str = "\n".join(old_topics)
-        topic_picker_value = topic_picker_prompt.invoke(
-            {
-                "understanding_level": self.understanding_level,
-                "old_topics": old_topics_str,
-            }
+        """Pick new topics, different from the old ones.
+
+        Only a diverse subset of the old topics is sent in the prompt,
+        and the new topics too similar to a known one are dropped.
+        """
+        self.topic_index.add_many(old_topics)
+        old_topics_str = "\n".join(self.select_old_topics())
+        topic_picker_value = get_topic_picker_prompt(self.understanding_level).invoke(
+            {"old_topics": old_topics_str}
         )
         output = self.structured_llm.invoke(topic_picker_value)
         if not isinstance(output, TopicsPickerResult):
             raise ValueError(f"Unexpected output type: {type(output)}")
-        return output
+        new_topics = []
+        for topic in output.topics:
+            if self.topic_index.is_near_duplicate(topic, self.max_similarity):
+                continue
+            self.topic_index.add(topic)
+            new_topics.append(topic)
+        return TopicsPickerResult(topics=new_topics)
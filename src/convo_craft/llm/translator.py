@@ -1,12 +1,15 @@
 """Translator module."""
 
 from dataclasses import dataclass
+from functools import cache
 
-from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
-from langchain_openai import ChatOpenAI
+from loguru import logger as lg
 from pydantic import BaseModel, Field
 
 from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.prompt_compiler import CompiledPrompt, compile_prompt
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.llm.token_budget import chunk_by_token_budget
 
 
 class TranslatorResult(BaseModel):
@@ -15,13 +18,62 @@ class TranslatorResult(BaseModel):
     target_text: str = Field(description="The translated text")
 
 
-translation_template = """Translate the following text from {source_language} to {target_language}:
+class TranslationPair(BaseModel):
+    """A text and its translation."""
 
-{source_text}
+    source_text: str = Field(description="The original text")
+    target_text: str = Field(description="The translated text")
+
+
+class TranslatorBatchResult(BaseModel):
+    """The result of translating a list of texts.
+
+    Each text should be translated on its own,
+    keeping the original texts and their order.
+    """
+
+    translations: list[TranslationPair] = Field(
+        description="The translated texts, in the same order as the original ones"
+    )
+
+    def get_translation_map(self) -> dict[str, str]:
+        """Get the mapping from each original text to its translation."""
+        return {pair.source_text: pair.target_text for pair in self.translations}
+
+
+translation_template = """Translate the text of the user \
+from {source_language} to {target_language}.
+"""
+
+translation_batch_template = """Translate each of the numbered texts of the user \
+from {source_language} to {target_language}.
+Translate each text on its own, and keep the texts in the same order.
 """
-translation_prompt = ChatPromptTemplate(
-    [HumanMessagePromptTemplate.from_template(translation_template)]
-)
+
+
+@cache
+def get_translation_prompt(
+    source_language: str,
+    target_language: str,
+    batch: bool = False,
+) -> CompiledPrompt:
+    """Compile the prompt of a language pair on first use.
+
+    The instructions are the static prefix, the texts the suffix.
+    """
+    if batch:
+        return compile_prompt(
+            (translation_batch_template,),
+            "{source_texts}",
+            source_language=source_language,
+            target_language=target_language,
+        )
+    return compile_prompt(
+        (translation_template,),
+        "{source_text}",
+        source_language=source_language,
+        target_language=target_language,
+    )
 
 
 @dataclass
@@ -31,22 +83,78 @@ class Translator:
     chat_openai_config: ChatOpenAIConfig
     source_language: str
     target_language: str
+    use_cache: bool = True
+    """Whether to cache the results on disk."""
+    max_batch_tokens: int = 1500
+    """Maximum number of estimated source tokens translated in a single call."""
+    hedge: bool = False
+    """Hedge the slow interactive calls, on the critical path of the learner."""
 
     def __post_init__(self):
         """Initialize the translator."""
-        self.model = ChatOpenAI(**self.chat_openai_config.model_dump())
-        self.structured_llm = self.model.with_structured_output(TranslatorResult)
+        self.structured_llm = StructuredLLM(
+            chat_openai_config=self.chat_openai_config,
+            schema=TranslatorResult,
+            use_cache=self.use_cache,
+            component="translator",
+            hedge=self.hedge,
+        )
+        self.structured_llm_batch = StructuredLLM(
+            chat_openai_config=self.chat_openai_config,
+            schema=TranslatorBatchResult,
+            use_cache=self.use_cache,
+            component="translator",
+            hedge=self.hedge,
+        )
 
     def invoke(self, source_text: str) -> TranslatorResult:
         """Translate the text."""
-        translation_value = translation_prompt.invoke(
-            {
-                "source_language": self.source_language,
-                "target_language": self.target_language,
-                "source_text": source_text,
-            }
-        )
+        translation_value = get_translation_prompt(
+            self.source_language, self.target_language
+        ).invoke({"source_text": source_text})
         output = self.structured_llm.invoke(translation_value)
         if not isinstance(output, TranslatorResult):
             raise ValueError(f"Unexpected output type: {type(output)}")
         return output
+
+    def invoke_batch(self, source_texts: list[str]) -> TranslatorBatchResult:
+        """Translate a list of texts, in as few calls as the token budget allows.
+
+        The result has one translation for each source text, in the same order.
+        """
+        translations: list[TranslationPair] = []
+        for chunk in chunk_by_token_budget(source_texts, self.max_batch_tokens):
+            translations.extend(self.invoke_chunk(chunk))
+        return TranslatorBatchResult(translations=translations)
+
+    def invoke_chunk(self, source_texts: list[str]) -> list[TranslationPair]:
+        """Translate a chunk of texts in a single call.
+
+        The translations are matched to the source texts by content, or by position
+        if the model changed the source texts but kept their number.
+        The texts that cannot be matched are translated one by one.
+        """
+        source_texts_str = "\n\n".join(
+            f"Text {i}:\n{text}" for i, text in enumerate(source_texts, start=1)
+        )
+        translation_value = get_translation_prompt(
+            self.source_language, self.target_language, batch=True
+        ).invoke({"source_texts": source_texts_str})
+        output = self.structured_llm_batch.invoke(translation_value)
+        if not isinstance(output, TranslatorBatchResult):
+            raise ValueError(f"Unexpected output type: {type(output)}")
+        by_source = {
+            pair.source_text.strip(): pair.target_text for pair in output.translations
+        }
+        same_length = len(output.translations) == len(source_texts)
+        pairs: list[TranslationPair] = []
+        for i, source_text in enumerate(source_texts):
+            if source_text.strip() in by_source:
+                target_text = by_source[source_text.strip()]
+            elif same_length:
+                target_text = output.translations[i].target_text
+            else:
+                lg.warning(f"Missing batch translation, translating text {i} alone")
+                target_text = self.invoke(source_text).target_text
+            pairs.append(TranslationPair(source_text=source_text, target_text=target_text))
+        return pairs
@@ -0,0 +1,206 @@
+"""Split a paragraph down to portions, with language specific rules.
+
+This follows the rules given to the LLM paragraph splitter:
+split on sentence punctuation and clause boundaries,
+avoid splitting on commas unless the sentence is longer than 15 words,
+avoid generating a single word as a portion.
+The portions are slices of the paragraph, so their concatenation
+reproduces the paragraph exactly.
+"""
+
+from dataclasses import dataclass, field
+import re
+
+WORD_RE = re.compile(r"\S+")
+"""A word is a run of non whitespace characters."""
+CLOSING_CHARS = "\"'”’»)]"
+"""Characters that can follow the punctuation at the end of a word."""
+STRIP_CHARS = ".,;:!?…\"'“”‘’«»()[]-—–"
+"""Characters stripped from a word before looking it up in the tables."""
+
+
+@dataclass(frozen=True)
+class SplitRules:
+    """Language specific rules to split a paragraph."""
+
+    conjunctions: frozenset[str]
+    """Words that start a new clause, a long sentence can be split before them."""
+    clitics: frozenset[str]
+    """Words bound to the following word, a sentence is never split after them."""
+    sentence_punctuation: str = ".!?…"
+    """Punctuation that ends a sentence."""
+    clause_punctuation: str = ",;:"
+    """Punctuation that ends a clause."""
+    min_clause_split_words: int = 15
+    """Split sentences on clauses only if they are longer than this."""
+    min_portion_words: int = 2
+    """Portions shorter than this are merged with a neighbour."""
+    max_portion_words: int = 25
+    """Portions longer than this are considered ambiguous."""
+
+
+PORTUGUESE_RULES = SplitRules(
+    conjunctions=frozenset(
+        {
+            "e",
+            "mas",
+            "porém",
+            "contudo",
+            "entretanto",
+            "ou",
+            "porque",
+            "pois",
+            "que",
+            "quando",
+            "enquanto",
+            "embora",
+            "então",
+            "portanto",
+            "se",
+            "como",
+            "onde",
+        }
+    ),
+    clitics=frozenset(
+        {
+            "me",
+            "te",
+            "se",
+            "lhe",
+            "lhes",
+            "nos",
+            "vos",
+            "o",
+            "a",
+            "os",
+            "as",
+            "um",
+            "uma",
+            "de",
+            "do",
+            "da",
+            "dos",
+            "das",
+            "em",
+            "no",
+            "na",
+            "nos",
+            "nas",
+            "não",
+        }
+    ),
+)
+
+SPLIT_RULES: dict[str, SplitRules] = {
+    "Portuguese": PORTUGUESE_RULES,
+    "Brazilian Portuguese": PORTUGUESE_RULES,
+}
+"""The split rules available for each language, add new languages here."""
+
+
+def normalize_word(word: str) -> str:
+    """Normalize a word to look it up in the tables."""
+    return word.strip(STRIP_CHARS).lower()
+
+
+@dataclass
+class LocalParagraphSplitter:
+    """A rule based paragraph splitter."""
+
+    rules: SplitRules = field(default_factory=lambda: PORTUGUESE_RULES)
+
+    @classmethod
+    def for_language(cls, language: str) -> "LocalParagraphSplitter | None":
+        """Get the splitter for the language, or None if there are no rules for it."""
+        rules = SPLIT_RULES.get(language)
+        if rules is None:
+            return None
+        return cls(rules=rules)
+
+    def ends_with(self, word: str, punctuation: str) -> bool:
+        """Check if the word ends with one of the punctuation characters."""
+        return word.rstrip(CLOSING_CHARS)[-1:] in punctuation
+
+    def invoke(self, paragraph: str) -> list[str]:
+        """Split the paragraph into portions.
+
+        The whitespace between portions is kept at the end of the previous portion.
+        """
+        words = [(m.start(), m.group()) for m in WORD_RE.finditer(paragraph)]
+        if not words:
+            return [paragraph] if paragraph else []
+        sent_punct = self.rules.sentence_punctuation
+        clause_punct = self.rules.clause_punctuation
+        # find the sentences, as ranges of word indexes
+        sentences: list[tuple[int, int]] = []
+        start = 0
+        for i, (_, word) in enumerate(words):
+            if self.ends_with(word, sent_punct) or i == len(words) - 1:
+                sentences.append((start, i + 1))
+                start = i + 1
+        # split the long sentences on clauses, the portions are ranges of words
+        portions: list[tuple[int, int, int]] = []
+        for sent_id, (start, end) in enumerate(sentences):
+            portion_start = start
+            if end - start > self.rules.min_clause_split_words:
+                for i in range(start + 1, end):
+                    prev_word = words[i - 1][1]
+                    if normalize_word(prev_word) in self.rules.clitics:
+                        continue
+                    is_clause = self.ends_with(prev_word, clause_punct)
+                    is_conj = normalize_word(words[i][1]) in self.rules.conjunctions
+                    if is_clause or is_conj:
+                        portions.append((portion_start, i, sent_id))
+                        portion_start = i
+            portions.append((portion_start, end, sent_id))
+        portions = self.merge_short_portions(portions)
+        # convert the word ranges to slices of the paragraph
+        offsets = [offset for offset, _ in words] + [len(paragraph)]
+        offsets[0] = 0
+        return [paragraph[offsets[start] : offsets[end]] for start, end, _ in portions]
+
+    def merge_short_portions(
+        self,
+        portions: list[tuple[int, int, int]],
+    ) -> list[tuple[int, int, int]]:
+        """Merge the portions that are too short with a neighbour.
+
+        Prefer the next portion in the same sentence, then the previous one,
+        then the next sentence, then the previous sentence.
+        """
+        merged = list(portions)
+        i = 0
+        while i < len(merged) and len(merged) > 1:
+            start, end, sent_id = merged[i]
+            if end - start >= self.rules.min_portion_words:
+                i += 1
+                continue
+            has_next = i + 1 < len(merged)
+            has_prev = i > 0
+            if has_next and merged[i + 1][2] == sent_id:
+                merge_next = True
+            elif has_prev and merged[i - 1][2] == sent_id:
+                merge_next = False
+            else:
+                merge_next = has_next
+            if merge_next:
+                _, next_end, next_sent_id = merged.pop(i + 1)
+                merged[i] = (start, next_end, next_sent_id)
+            else:
+                prev_start, _, prev_sent_id = merged.pop(i - 1)
+                i -= 1
+                merged[i] = (prev_start, end, prev_sent_id)
+        return merged
+
+    def get_ambiguity(self, portions: list[str]) -> float:
+        """Estimate how ambiguous the split is, from 0 to 1.
+
+        The ambiguity is the fraction of words in portions too long to be
+        split confidently with the rules.
+        """
+        portion_lens = [len(portion.split()) for portion in portions]
+        num_words = sum(portion_lens)
+        if num_words == 0:
+            return 0.0
+        long_words = sum(n for n in portion_lens if n > self.rules.max_portion_words)
+        return long_words / num_words
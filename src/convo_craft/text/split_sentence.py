@@ -1,6 +1,225 @@
-"""Split a sentence down to words."""
+"""Split a sentence down to words.
 
-from dataclasses import dataclass
+A word is a group of tokens, separated by whitespace: short tokens are merged
+with the following ones until the group has enough word characters,
+and the punctuation standing alone goes with the previous token.
+
+The sentences of a batch are split together, without a Python step per token:
+
+- the joined sentences are split on spaces, and each distinct token is coded
+  once, as its class and its length
+- a long token always completes its word, so the classes are cut into runs
+  at the long tokens, and the merge of each distinct run is decided once
+- the offsets of the words are the cumulative sums of the token lengths,
+  selected by the masks of the merged runs, in numpy
+
+The words are kept as offsets into the sentences, in flat arrays.
+"""
+
+from array import array
+from dataclasses import dataclass, field
+from itertools import accumulate, compress, islice
+from operator import add
+import re
+from typing import Callable, Iterator
+
+import numpy as np
+
+TOKEN_SEP = " "
+"""Separator of the tokens of a sentence."""
+SENTENCE_SEP = "\n"
+"""Separator of the sentences of a batch, a pseudo token between two spaces."""
+LINE_BREAK = "\r"
+"""Pseudo token for a line break inside a sentence, it ends the word too."""
+OTHER_SPACE_RE = re.compile(r"[^\S \n]")
+"""Whitespace other than the token and sentence separators."""
+CORE_RE = re.compile(r"\w(?:\S*\w)?")
+"""The core of a token, from its first to its last word character."""
+
+LONG = "L"
+"""Class of a token with enough core characters, it completes its word."""
+PUNCT = "P"
+"""Class of a token without core, it goes with the previous token."""
+EMPTY = "E"
+"""Class of the empty token between two spaces."""
+IRREGULAR = "?"
+"""Class of a token with whitespace other than spaces."""
+SHORT_BASE = 0x100
+"""Class of a short token, offset by the number of its core characters."""
+
+SKIP = "\x00"
+"""Mask of a token that is not selected."""
+SELECT = "\x01"
+"""Mask of a token that starts, or ends, a word."""
+SENTENCE_MARK = "\x02"
+"""Mask of a sentence separator in the starts, to count the words by sentence."""
+
+MAX_CACHED = 100_000
+"""Number of token codes, or of run masks, kept by a splitter."""
+
+
+def code_token(token: str, min_word_len: int) -> str:
+    """Code a token as its class and its length with the following separator.
+
+    The pseudo tokens have no length: they replace the separator
+    of the previous token.
+
+    Args:
+        token (str): The token, split on spaces.
+        min_word_len (int): The number of core characters a word needs.
+
+    Returns:
+        str: The class character and the length character.
+    """
+    if token in (SENTENCE_SEP, LINE_BREAK):
+        return f"{token}{chr(0)}"
+    if not token:
+        return f"{EMPTY}{chr(1)}"
+    if OTHER_SPACE_RE.search(token) or SENTENCE_SEP in token:
+        return f"{IRREGULAR}{chr(0)}"
+    core = CORE_RE.search(token)
+    core_len = 0 if core is None else core.end() - core.start()
+    if core_len >= min_word_len:
+        token_class = LONG
+    elif core_len:
+        token_class = chr(SHORT_BASE + core_len)
+    else:
+        token_class = PUNCT
+    return f"{token_class}{chr(len(token) + 1)}"
+
+
+def merge_run(
+    run: str, min_word_len: int, first: bool = False, last: bool = False
+) -> str:
+    """Merge the tokens of a run into words.
+
+    A token is added to the current word if the word is too short yet,
+    or if the token is only punctuation. The tokens left at the end
+    of a sentence are a word together, even if too short.
+    The run starts after a long token, that completed its word,
+    and it is followed by a long token.
+
+    Args:
+        run (str): The classes of the tokens between two long tokens.
+        min_word_len (int): The number of core characters a word needs.
+        first (bool): The run starts the batch, it has no long token before.
+        last (bool): The run ends the batch, it has no long token after.
+
+    Returns:
+        str: For each token of the run and the long token after, the pair
+            of masks: whether the token starts a word, and whether
+            the token before it ends a word.
+    """
+    starts: list[str] = []
+    ends: list[str] = [SKIP if first else SELECT]
+    in_word = not first
+    word_len = min_word_len
+    last_token = 0
+    for token_class in run if last else run + LONG:
+        if token_class in (SENTENCE_SEP, LINE_BREAK):
+            in_word = False
+            starts.append(SENTENCE_MARK if token_class == SENTENCE_SEP else SKIP)
+            ends.append(SKIP)
+            continue
+        if token_class == EMPTY:
+            starts.append(SKIP)
+            ends.append(SKIP)
+            continue
+        if token_class == LONG:
+            core_len = min_word_len
+        elif token_class == PUNCT:
+            core_len = 0
+        else:
+            core_len = ord(token_class) - SHORT_BASE
+        if in_word and (word_len < min_word_len or not core_len):
+            starts.append(SKIP)
+            ends[last_token] = SKIP
+            word_len += core_len
+        else:
+            starts.append(SELECT)
+            in_word = True
+            word_len = core_len
+        last_token = len(ends)
+        ends.append(SELECT)
+    if last:
+        # the pair of the end of the batch
+        starts.append(SKIP)
+    else:
+        # the long token after ends its word in the next run
+        ends.pop()
+    return "".join(map(add, starts, ends))
+
+
+def join_cached(
+    table: dict[str, str], keys: list[str], get: Callable[[str], str]
+) -> str:
+    """Join the values of the keys, getting and caching the missing ones.
+
+    The values are computed apart from the table, that other threads
+    may clear when it is full.
+    """
+    try:
+        return "".join(map(table.__getitem__, keys))
+    except KeyError:
+        pass
+    if len(table) > MAX_CACHED:
+        table.clear()
+    values = {key: table.get(key) or get(key) for key in set(keys)}
+    table.update(values)
+    return "".join(map(values.__getitem__, keys))
+
+
+def to_array(values: np.ndarray) -> array:
+    """Copy the offsets to a compact array of unsigned ints."""
+    return array("I", values.astype(np.uintc, copy=False).tobytes())
+
+
+@dataclass
+class SentenceSplits:
+    """The words of a batch of sentences, as offsets in the sentences."""
+
+    sentences: list[str]
+    offsets: array
+    """The offset of each sentence in the batch, and the batch length at the end."""
+    starts: array
+    """The offset of each word in the batch."""
+    ends: array
+    """The offset of the end of each word in the batch."""
+    sent_starts: array
+    """The first word of each sentence, and the number of words at the end."""
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def get_spans(self, sent_index: int) -> list[tuple[int, int]]:
+        """Get the start and end offsets of the words in a sentence."""
+        offset = self.offsets[sent_index]
+        first, last = self.sent_starts[sent_index], self.sent_starts[sent_index + 1]
+        return [
+            (start - offset, end - offset)
+            for start, end in zip(self.starts[first:last], self.ends[first:last])
+        ]
+
+    def get_words(self, sent_index: int) -> list[str]:
+        """Get the words of a sentence, as slices of the sentence."""
+        sentence = self.sentences[sent_index]
+        offset = self.offsets[sent_index]
+        first, last = self.sent_starts[sent_index], self.sent_starts[sent_index + 1]
+        return [
+            sentence[start - offset : end - offset]
+            for start, end in zip(self.starts[first:last], self.ends[first:last])
+        ]
+
+    def iter_words(self) -> Iterator[list[str]]:
+        """Iterate over the words of each sentence."""
+        spans = zip(self.starts, self.ends)
+        for sentence, offset, first, last in zip(
+            self.sentences, self.offsets, self.sent_starts, self.sent_starts[1:]
+        ):
+            yield [
+                sentence[start - offset : end - offset]
+                for start, end in islice(spans, last - first)
+            ]
 
 
 @dataclass
@@ -8,27 +227,110 @@ class SentenceSplitter:
     """A sentence splitter."""
 
     min_word_len: int = 3
+    """Merge the words shorter than this with the following ones."""
+    token_codes: dict[str, str] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    """The code of each token already seen."""
+    run_masks: dict[str, str] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    """The masks of each run already merged."""
+
+    def __post_init__(self) -> None:
+        if self.min_word_len < 1:
+            raise ValueError(f"{self.min_word_len=} must be at least 1")
 
     def invoke(self, sentence: str) -> list[str]:
         """Split the sentence.
 
-        If a word is too short, combine it with the next word.
-        TODO might want to use a more sophisticated algorithm,
-             merging more than two words if necessary.
-             No need to overcomplicate it for now.
+        If a word is too short, combine it with the following words,
+        until the combined word characters are at least ``min_word_len``.
+        """
+        codes, masks = self.merge_tokens([sentence])
+        bounds = list(accumulate(map(ord, codes[1::2]), initial=0))
+        starts = compress(bounds, masks[0::2].encode("latin-1"))
+        # the end of a token is before its separator
+        ends = compress(islice(bounds, 1, None), masks[3::2].encode("latin-1"))
+        return [sentence[start : end - 1] for start, end in zip(starts, ends)]
+
+    def invoke_batch(self, sentences: list[str]) -> SentenceSplits:
+        """Split all the sentences at once."""
+        codes, masks = self.merge_tokens(sentences)
+        codes_buffer = codes.encode("utf-32-le", "surrogatepass")
+        lens = np.frombuffer(codes_buffer, dtype=np.uint32)[1::2]
+        bounds = np.zeros(len(lens) + 1, dtype=np.uintc)
+        np.cumsum(lens, out=bounds[1:])
+        pairs = np.frombuffer(masks.encode("latin-1"), dtype=np.uint8)
+        marks = pairs[0::2]
+        is_start = marks == ord(SELECT)
+        starts = bounds[is_start]
+        # the end of a token is before its separator
+        ends = bounds[1:][pairs[3::2] == ord(SELECT)] - 1
+        sent_starts = np.zeros(len(sentences) + 1, dtype=np.uintc)
+        sent_starts[1:-1] = np.cumsum(is_start)[marks == ord(SENTENCE_MARK)]
+        sent_starts[-1] = len(starts)
+        offsets = np.zeros(len(sentences) + 1, dtype=np.uintc)
+        sent_lens = np.fromiter(map(len, sentences), np.uintc, len(sentences))
+        np.cumsum(sent_lens + len(SENTENCE_SEP), out=offsets[1:])
+        return SentenceSplits(
+            sentences=sentences,
+            offsets=to_array(offsets),
+            starts=to_array(starts),
+            ends=to_array(ends),
+            sent_starts=to_array(sent_starts),
+        )
+
+    def merge_tokens(self, sentences: list[str]) -> tuple[str, str]:
+        """Code the tokens of the sentences, and merge them into words.
+
+        Args:
+            sentences (list[str]): The sentences.
+
+        Returns:
+            tuple[str, str]: The codes of the tokens, see ``code_token``,
+                and their masks, see ``merge_run``.
+        """
+        batch_sep = f"{TOKEN_SEP}{SENTENCE_SEP}{TOKEN_SEP}"
+        codes = self.code_tokens(batch_sep.join(sentences).split(TOKEN_SEP))
+        classes = codes[0::2]
+        if (
+            IRREGULAR in classes
+            or LINE_BREAK in classes
+            or classes.count(SENTENCE_SEP) != len(sentences) - 1
+        ):
+            # other whitespace is a separator of the same length,
+            # and a line break in a sentence is a pseudo token too
+            text = batch_sep.join(
+                OTHER_SPACE_RE.sub(TOKEN_SEP, sentence).replace(
+                    SENTENCE_SEP, f"{TOKEN_SEP}{LINE_BREAK}{TOKEN_SEP}"
+                )
+                for sentence in sentences
+            )
+            codes = self.code_tokens(text.split(TOKEN_SEP))
+            classes = codes[0::2]
+        return codes, self.merge_runs(classes.split(LONG))
+
+    def code_tokens(self, tokens: list[str]) -> str:
+        """Get the codes of the tokens, see ``code_token``."""
+        return join_cached(
+            self.token_codes,
+            tokens,
+            lambda token: code_token(token, self.min_word_len),
+        )
+
+    def merge_runs(self, runs: list[str]) -> str:
+        """Get the masks of the tokens, see ``merge_run``.
+
+        The first and the last run are merged apart, the other ones are cached.
         """
-        words = sentence.split()
-        # if a word is too short, combine it with the next word
-        combined_words = []
-        i = 0
-        while i < len(words):
-            word = words[i]
-            if len(word) < self.min_word_len and i < len(words) - 1:
-                next_word = words[i + 1]
-                combined_word = f"{word} {next_word}"
-                combined_words.append(combined_word)
-                i += 2
-            else:
-                combined_words.append(word)
-                i += 1
-        return combined_words
+        if len(runs) == 1:
+            return merge_run(runs[0], self.min_word_len, first=True, last=True)
+        middle = join_cached(
+            self.run_masks, runs[1:-1], lambda run: merge_run(run, self.min_word_len)
+        )
+        return (
+            merge_run(runs[0], self.min_word_len, first=True)
+            + middle
+            + merge_run(runs[-1], self.min_word_len, last=True)
+        )
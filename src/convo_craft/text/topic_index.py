@@ -0,0 +1,178 @@
+"""Index of topics, for near-duplicate and diversity queries.
+
+Each topic is represented by the MinHash signature of its character n-grams,
+so the Jaccard similarity between two topics can be estimated quickly.
+Locality sensitive hashing on bands of the signature finds the candidate
+near-duplicates without comparing against every topic.
+"""
+
+from itertools import islice
+import random
+import threading
+from typing import Iterator
+import zlib
+
+MERSENNE_PRIME = (1 << 61) - 1
+"""Modulus of the hash permutations."""
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a text before computing its n-grams."""
+    return " ".join(text.lower().strip(" .!?").split())
+
+
+def get_ngrams(text: str, ngram_len: int = 3) -> set[str]:
+    """Get the character n-grams of the normalized text."""
+    norm_text = f" {normalize_text(text)} "
+    if len(norm_text) <= ngram_len:
+        return {norm_text}
+    num_ngrams = len(norm_text) - ngram_len + 1
+    return {norm_text[i : i + ngram_len] for i in range(num_ngrams)}
+
+
+class TopicIndex:
+    """A MinHash index of topics."""
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        num_bands: int = 16,
+        ngram_len: int = 3,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the index.
+
+        Args:
+            num_perm (int): The number of hash permutations in a signature.
+            num_bands (int): The number of LSH bands, must divide ``num_perm``.
+            ngram_len (int): The length of the character n-grams.
+            seed (int): The seed of the hash permutations.
+        """
+        if num_perm % num_bands != 0:
+            raise ValueError(f"{num_bands=} must divide {num_perm=}")
+        self.num_perm = num_perm
+        self.num_bands = num_bands
+        self.rows_per_band = num_perm // num_bands
+        self.ngram_len = ngram_len
+        rng = random.Random(seed)
+        self.perms = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._lock = threading.Lock()
+        self.topics: list[str] = []
+        self.signatures: list[tuple[int, ...]] = []
+        self._known: set[str] = set()
+        self._buckets: list[dict[tuple[int, ...], list[int]]] = [
+            {} for _ in range(num_bands)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.topics)
+
+    def get_signature(self, text: str) -> tuple[int, ...]:
+        """Get the MinHash signature of the text."""
+        ngrams = get_ngrams(text, self.ngram_len)
+        hashes = [zlib.crc32(ngram.encode()) for ngram in ngrams]
+        return tuple(
+            min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.perms
+        )
+
+    def get_bands(self, signature: tuple[int, ...]) -> list[tuple[int, ...]]:
+        """Split the signature into the LSH bands."""
+        r = self.rows_per_band
+        return [signature[i * r : (i + 1) * r] for i in range(self.num_bands)]
+
+    @staticmethod
+    def get_similarity(sig_a: tuple[int, ...], sig_b: tuple[int, ...]) -> float:
+        """Estimate the Jaccard similarity from two signatures."""
+        return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+    def add(self, topic: str) -> bool:
+        """Add a topic to the index.
+
+        Returns:
+            bool: False if the same normalized topic was already indexed.
+        """
+        norm_topic = normalize_text(topic)
+        if norm_topic in self._known:
+            return False
+        signature = self.get_signature(topic)
+        with self._lock:
+            if norm_topic in self._known:
+                return False
+            self._known.add(norm_topic)
+            topic_id = len(self.topics)
+            self.topics.append(topic)
+            self.signatures.append(signature)
+            for bucket, band in zip(self._buckets, self.get_bands(signature)):
+                bucket.setdefault(band, []).append(topic_id)
+        return True
+
+    def add_many(self, topics: list[str]) -> int:
+        """Add the topics to the index, returning how many were new."""
+        return sum(self.add(topic) for topic in topics)
+
+    def get_nearest(self, topic: str, k: int = 5) -> list[tuple[str, float]]:
+        """Get the indexed topics most similar to the topic.
+
+        Only the topics sharing at least one LSH band are considered.
+
+        Returns:
+            list[tuple[str, float]]: The topics and their estimated similarity,
+                most similar first.
+        """
+        signature = self.get_signature(topic)
+        with self._lock:
+            candidates: set[int] = set()
+            for bucket, band in zip(self._buckets, self.get_bands(signature)):
+                candidates.update(bucket.get(band, []))
+            scored = [
+                (self.topics[i], self.get_similarity(signature, self.signatures[i]))
+                for i in candidates
+            ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def is_near_duplicate(self, topic: str, threshold: float = 0.5) -> bool:
+        """Check if the topic is too similar to an indexed one."""
+        if normalize_text(topic) in self._known:
+            return True
+        nearest = self.get_nearest(topic, k=1)
+        return bool(nearest) and nearest[0][1] >= threshold
+
+    def iter_diverse(self, max_candidates: int = 500) -> Iterator[str]:
+        """Iterate over the topics, most diverse first.
+
+        Greedily pick the topic least similar to the ones already picked,
+        so any prefix of the iteration is a diverse subset,
+        and the caller can stop as soon as its budget is spent.
+
+        Args:
+            max_candidates (int): Sample at most this many topics to pick from,
+                to bound the cost on large indexes.
+        """
+        with self._lock:
+            ids = list(range(len(self.topics)))
+            if len(ids) > max_candidates:
+                ids = random.Random(len(ids)).sample(ids, max_candidates)
+            signatures = {i: self.signatures[i] for i in ids}
+            topics = {i: self.topics[i] for i in ids}
+        if not ids:
+            return
+        max_sim = {i: 0.0 for i in ids}
+        best = ids[0]
+        while True:
+            yield topics[best]
+            del max_sim[best]
+            if not max_sim:
+                return
+            for i in max_sim:
+                sim = self.get_similarity(signatures[i], signatures[best])
+                if sim > max_sim[i]:
+                    max_sim[i] = sim
+            best = min(max_sim, key=max_sim.__getitem__)
+
+    def select_diverse(self, max_topics: int, max_candidates: int = 500) -> list[str]:
+        """Select a representative subset of at most ``max_topics`` topics."""
+        return list(islice(self.iter_diverse(max_candidates), max_topics))
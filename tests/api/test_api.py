@@ -0,0 +1,117 @@
+"""Test the headless API against the fake LLM backend."""
+
+from pathlib import Path
+import threading
+from typing import Iterator
+
+import pytest
+
+from convo_craft.api.app_service import AppService
+from convo_craft.api.client import ApiClientError, ConvoCraftClient
+from convo_craft.api.server import ApiServer, build_server
+from convo_craft.api.session_store import SessionConflictError, SessionStore
+from convo_craft.app.app_state import AppState
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.fake_llm import FAKE_MODEL
+from convo_craft.llm.llm_cache import get_llm_cache
+
+
+@pytest.fixture(autouse=True)
+def tmp_llm_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Keep the LLM cache of the app in the temporary folder."""
+    llm_cache_fp = tmp_path / "llm_cache.sqlite"
+    monkeypatch.setattr(CONVO_CRAFT_PATHS, "llm_cache_fp", llm_cache_fp)
+    get_llm_cache.cache_clear()
+    yield
+    get_llm_cache.cache_clear()
+
+
+def start_worker(tmp_path: Path) -> ApiServer:
+    """Start a worker on a free port, with its own connections to the stores."""
+    server = build_server("127.0.0.1", 0)
+    server.service = AppService(
+        session_store=SessionStore(tmp_path / "sessions.sqlite"),
+        lesson_store=LessonStore(tmp_path / "lessons"),
+        chat_openai_config=ChatOpenAIConfig(model=FAKE_MODEL),
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def workers(tmp_path: Path) -> Iterator[list[ApiServer]]:
+    """Start two workers sharing the same stores."""
+    servers = [start_worker(tmp_path) for _ in range(2)]
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_session_across_workers(workers: list[ApiServer]) -> None:
+    """Test that a session can be played by alternating between the workers."""
+    clients = [
+        ConvoCraftClient(f"http://127.0.0.1:{server.server_port}")
+        for server in workers
+    ]
+    session_id = clients[0].create_session()
+    clients[1].session_id = session_id
+    topics = clients[1].set_api_key("fake")
+    assert topics.topics
+    clients[0].api_key = "fake"
+    assert clients[0].get_topics() == topics
+    step = clients[0].choose_topic(topics.topics[0])
+    assert step.conversation_step == 0
+    assert clients[1].get_step() == step
+    # half of the conversation on each worker
+    clients[1].play_conversation(max_guesses=5)
+    clients[0].play_conversation()
+    step = clients[1].get_step()
+    assert step.done
+    assert step.conversation_step == step.num_steps - 1
+    with pytest.raises(ApiClientError) as exc_info:
+        clients[0].guess(0, 0)
+    assert exc_info.value.status == 400
+
+
+def test_api_key_not_stored(workers: list[ApiServer], tmp_path: Path) -> None:
+    """Test that the key is not in the stored session, and is sent by the client."""
+    client = ConvoCraftClient(f"http://127.0.0.1:{workers[0].server_port}")
+    session_id = client.create_session()
+    topics = client.set_api_key("sk-not-stored")
+    for fp in tmp_path.glob("sessions.sqlite*"):
+        assert b"sk-not-stored" not in fp.read_bytes()
+    # the reads need no key, the changes do
+    other = ConvoCraftClient(client.base_url)
+    other.session_id = session_id
+    assert other.get_topics() == topics
+    with pytest.raises(ApiClientError) as exc_info:
+        other.choose_topic(topics.topics[0])
+    assert exc_info.value.status == 400
+    client.choose_topic(topics.topics[0])
+
+
+def test_unknown_session(workers: list[ApiServer]) -> None:
+    """Test the errors on a missing session and on a missing topic."""
+    client = ConvoCraftClient(f"http://127.0.0.1:{workers[0].server_port}")
+    client.session_id = "0" * 32
+    with pytest.raises(ApiClientError) as exc_info:
+        client.get_step()
+    assert exc_info.value.status == 404
+    client.create_session()
+    client.set_api_key("fake")
+    with pytest.raises(ApiClientError) as exc_info:
+        client.choose_topic("Not an offered topic")
+    assert exc_info.value.status == 400
+
+
+def test_session_conflict(tmp_path: Path) -> None:
+    """Test that a stale state is not saved over a newer one."""
+    store = SessionStore(tmp_path / "sessions.sqlite")
+    session_id = store.create(AppState(user_id="user"))
+    state, version = store.get(session_id)
+    assert store.put(session_id, state, version) == version + 1
+    with pytest.raises(SessionConflictError):
+        store.put(session_id, state, version)
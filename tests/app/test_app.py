@@ -0,0 +1,241 @@
+"""Test the app flows against the fake LLM backend."""
+
+from pathlib import Path
+import threading
+import time
+from typing import Iterator
+
+import pytest
+
+from convo_craft.app.app import App, AppConversation
+from convo_craft.app.app_state import AppState
+from convo_craft.app.prefetch import PREFETCH_MAX_WORKERS
+from convo_craft.app.simulate import play_conversation
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.convo_craft_config import CONVO_CRAFT_PATHS
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.client_registry import ChatModelRegistry
+from convo_craft.llm.fake_llm import FAKE_MODEL, FakeLatency, FakeLLM
+from convo_craft.llm.llm_cache import get_llm_cache
+from convo_craft.llm.rate_scheduler import call_priority
+
+
+@pytest.fixture(autouse=True)
+def tmp_llm_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """Keep the LLM cache of the app in the temporary folder."""
+    llm_cache_fp = tmp_path / "llm_cache.sqlite"
+    monkeypatch.setattr(CONVO_CRAFT_PATHS, "llm_cache_fp", llm_cache_fp)
+    get_llm_cache.cache_clear()
+    yield
+    get_llm_cache.cache_clear()
+
+
+@pytest.fixture
+def lesson_store(tmp_path: Path) -> LessonStore:
+    """Return an empty lesson store."""
+    return LessonStore(tmp_path / "lessons")
+
+
+def make_app(lesson_store: LessonStore) -> App:
+    """Build an app on the fake backend, with the key entered."""
+    app = App(
+        lesson_store=lesson_store,
+        chat_openai_config=ChatOpenAIConfig(model=FAKE_MODEL),
+    )
+    app.set_openai_api_key("fake")
+    return app
+
+
+def test_full_flow(lesson_store: LessonStore) -> None:
+    """Test that a whole conversation can be played, and is then stored."""
+    app = make_app(lesson_store)
+    assert app.struct_llm_config.model == FAKE_MODEL
+    topic = app.topic.topics[0]
+    app.set_topic_by_value(topic)
+    num_steps = len(app.conversation.conversation)
+    assert num_steps > 0
+    num_guesses = play_conversation(app, num_wrong_guesses=1)
+    assert app.conversation.done
+    assert num_guesses > num_steps
+    assert app.llm_metrics.get_total().calls > 0
+    # the lesson is saved in the background
+    for _ in range(100):
+        if len(lesson_store) == 1:
+            break
+        time.sleep(0.01)
+    assert len(lesson_store) == 1
+    # another user is served the stored lesson
+    other = make_app(lesson_store)
+    other.topic.set_topics([topic])
+    other.set_topic_by_value(topic)
+    assert other.conversation.lesson is not None
+    play_conversation(other)
+    assert other.conversation.done
+    # once the user has seen it, a new lesson about the topic is stored too
+    lesson_id = app.conversation.lesson_id
+    app.set_topic_by_value(topic)
+    assert app.conversation.lesson is None
+    assert app.conversation.lesson_id != lesson_id
+    play_conversation(app)
+    for _ in range(100):
+        if len(lesson_store) == 2:
+            break
+        time.sleep(0.01)
+    assert len(lesson_store) == 2
+
+
+def test_prefetch_priorities(
+    lesson_store: LessonStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Test that only the current step is translated at interactive priority."""
+    calls = []
+    translate_steps = AppConversation.translate_steps
+
+    def record(conversation: AppConversation, steps: list[int]) -> list:
+        calls.append((steps, call_priority.get()))
+        return translate_steps(conversation, steps)
+
+    monkeypatch.setattr(AppConversation, "translate_steps", record)
+    app = make_app(lesson_store)
+    app.set_topic_by_value(app.topic.topics[0])
+    play_conversation(app)
+    num_steps = len(app.conversation.conversation)
+    assert sorted(calls) == [
+        ([0], "interactive"),
+        (list(range(1, num_steps)), "prefetch"),
+    ]
+
+
+def test_state_roundtrip(lesson_store: LessonStore) -> None:
+    """Test that an app rebuilt from its state continues the same session."""
+    app = make_app(lesson_store)
+    app.set_topic_by_value(app.topic.topics[0])
+    play_conversation(app, num_wrong_guesses=1, max_guesses=7)
+    state = app.dump_state()
+    assert "fake" not in state.model_dump_json()
+    restored = App.load_state(
+        AppState.model_validate_json(state.model_dump_json()),
+        lesson_store=lesson_store,
+        chat_openai_config=ChatOpenAIConfig(model=FAKE_MODEL),
+        api_key="fake",
+    )
+    assert restored.dump_state() == state
+    assert restored.openai_api_key.get_secret_value() == "fake"
+    play_conversation(restored)
+    assert restored.conversation.done
+
+
+def test_state_restored_without_key(lesson_store: LessonStore) -> None:
+    """Test that a session restored without the key keeps its progress."""
+    app = make_app(lesson_store)
+    app.set_topic_by_value(app.topic.topics[0])
+    play_conversation(app, max_guesses=3)
+    state = app.dump_state()
+    restored = App.load_state(
+        state,
+        lesson_store=lesson_store,
+        chat_openai_config=ChatOpenAIConfig(model=FAKE_MODEL),
+    )
+    assert not restored.openai_api_key_is_set
+    assert restored.dump_state() == state
+    # entering the key again continues the same conversation
+    restored.set_openai_api_key("fake")
+    assert restored.dump_state() == state
+    play_conversation(restored)
+    assert restored.conversation.done
+
+
+def test_snapshot_references_stored_lesson(
+    lesson_store: LessonStore, tmp_path: Path
+) -> None:
+    """Test that a snapshot references the stored lesson instead of including it."""
+    app = make_app(lesson_store)
+    app.set_topic_by_value(app.topic.topics[0])
+    play_conversation(app, max_guesses=3)
+    snapshot = app.snapshot()
+    assert len(lesson_store) == 1
+    state = AppState.model_validate_json(snapshot)
+    assert state.conversation.lesson is None
+    assert state.conversation.lesson_id == app.conversation.lesson_id
+    restored = App.restore(
+        snapshot,
+        lesson_store=lesson_store,
+        chat_openai_config=ChatOpenAIConfig(model=FAKE_MODEL),
+    )
+    assert restored.snapshot() == snapshot
+    assert "translator" not in vars(restored.conversation)
+    play_conversation(restored)
+    assert restored.conversation.done
+    with pytest.raises(ValueError):
+        App.restore(snapshot, lesson_store=LessonStore(tmp_path / "other"))
+
+
+def test_speculate_next_topic(lesson_store: LessonStore) -> None:
+    """Test that the speculated lesson is served on a hit, and kept on a miss."""
+    app = App(
+        lesson_store=lesson_store,
+        chat_openai_config=ChatOpenAIConfig(model=FAKE_MODEL),
+        speculate=True,
+    )
+    app.set_openai_api_key("fake")
+    topics = app.topic.topics
+    app.set_topic_by_value(topics[0])
+    slot = app.speculation
+    assert slot is not None and slot.topic == topics[1]
+    slot.future.result()
+    play_conversation(app)
+    calls = app.llm_metrics.get_total().calls
+    app.set_topic_by_value(topics[1])
+    assert slot.hits == 1
+    assert app.conversation.lesson is not None
+    assert app.conversation.lesson_in_store
+    assert app.llm_metrics.get_total().calls == calls
+    # picking another topic discards the speculation, its lesson is stored
+    future = slot.future
+    app.set_topic_by_value(topics[4])
+    assert slot.misses == 1
+    if not future.cancelled():
+        lesson_id = future.result().lesson_id
+        for _ in range(100):
+            if lesson_id in lesson_store:
+                break
+            time.sleep(0.01)
+        assert lesson_id in lesson_store
+    # past the cost cap, the slot stops speculating
+    slot.wasted_tokens = slot.max_wasted_tokens
+    slot.discard()
+    assert not app.speculate_next_topic()
+
+
+def test_stream_saves_more_sessions_than_workers(lesson_store: LessonStore) -> None:
+    """Test that the lesson saves waiting on the steps do not starve the prefetches.
+
+    With more streamed sessions than prefetch workers,
+    the saves must not hold all the workers the splits of the turns need.
+    """
+    registry = ChatModelRegistry()
+    old_fake_llm = registry.fake_llm
+    registry.set_fake_llm(FakeLLM(latency=FakeLatency(per_item_s=0.1)))
+    try:
+        num_sessions = PREFETCH_MAX_WORKERS + 4
+        apps = []
+        for i in range(num_sessions):
+            app = make_app(lesson_store)
+            app.topic.set_topics([f"Streamed topic {i}"])
+            app.topic.set_topic_by_index(0)
+            apps.append(app)
+        starters = [
+            threading.Thread(target=AppConversation, kwargs={"app": a, "stream": True})
+            for a in apps
+        ]
+        for starter in starters:
+            starter.start()
+        for starter in starters:
+            starter.join()
+        for _ in range(1000):
+            if len(lesson_store) == num_sessions:
+                break
+            time.sleep(0.01)
+        assert len(lesson_store) == num_sessions
+    finally:
+        registry.set_fake_llm(old_fake_llm)
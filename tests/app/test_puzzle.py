@@ -0,0 +1,57 @@
+"""Test the word puzzle engine."""
+
+from convo_craft.app.puzzle import WordPuzzle
+
+PORTION_WORDS = [["eu", "gosto", "de", "eu"], ["sim", "não"]]
+
+
+def find_pos(puzzle: WordPuzzle, word: str) -> int:
+    """Find a button of the current portion not guessed yet."""
+    si = puzzle.current_sent
+    for wi, button in enumerate(puzzle.get_shuffled_words(si)):
+        if button.word == word and button.state != "correct":
+            return puzzle.get_pos(si, wi)
+    raise ValueError(word)
+
+
+def test_repeated_words() -> None:
+    """Test that either copy of a repeated word is accepted, and marked."""
+    puzzle = WordPuzzle(PORTION_WORDS, seed=1)
+    buttons = puzzle.get_shuffled_words(0)
+    positions = [pos for pos, button in enumerate(buttons) if button.word == "eu"]
+    # guess the copies in the reverse of their shuffled order
+    assert puzzle.guess_pos(positions[1])
+    assert puzzle.get_shuffled_words(0)[positions[1]].state == "correct"
+    assert puzzle.get_shuffled_words(0)[positions[0]].state == "normal"
+    assert not puzzle.guess_pos(positions[1])
+    assert puzzle.guess_pos(find_pos(puzzle, "gosto"))
+    assert puzzle.guess_pos(find_pos(puzzle, "de"))
+    assert puzzle.guess_pos(positions[0])
+    assert puzzle.current_sent == 1
+    assert puzzle.get_sent_guessed() == "eu gosto de eu "
+
+
+def test_undo_replay_and_bytes() -> None:
+    """Test that the guesses can be undone, replayed and packed."""
+    puzzle = WordPuzzle(PORTION_WORDS, seed=2)
+    for word in ["eu", "gosto", "de"]:
+        assert not puzzle.guess_pos(find_pos(puzzle, "de" if word == "eu" else "eu"))
+        assert puzzle.guess_pos(find_pos(puzzle, word))
+    assert puzzle.guess_pos(find_pos(puzzle, "eu"))
+    assert puzzle.current_sent == 1
+    data = puzzle.to_bytes()
+    assert len(data) == 4 + 2
+    restored = WordPuzzle.from_bytes(PORTION_WORDS, data)
+    assert restored.states == puzzle.states
+    assert (restored.cursor, restored.current_sent) == (4, 1)
+    replayed = WordPuzzle(PORTION_WORDS, seed=2)
+    replayed.replay(puzzle.get_guess_positions())
+    assert replayed.states == puzzle.states
+    # undo down to the start of the puzzle
+    while puzzle.undo():
+        pass
+    assert puzzle.states == bytearray(6)
+    assert (puzzle.cursor, puzzle.current_sent) == (0, 0)
+    assert puzzle.get_sent_guessed() == ""
+    # the words of the next portion are wrong in the current one
+    assert not puzzle.guess_pos(puzzle.get_pos(1, 0))
@@ -0,0 +1,49 @@
+"""Test the topic pool."""
+
+import time
+
+from convo_craft.app.topic_pool import TopicPool, get_topic_pool
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.fake_llm import FAKE_MODEL
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_dedup() -> None:
+    """Test that the duplicate topics are not added."""
+    pool = TopicPool("Brazilian Portuguese", "beginner", seed_topics=["Food", "Food."])
+    assert pool.add_topics(["food", "Travel", "  travel!"]) == 1
+    assert pool.topics == ["Food", "Travel"]
+
+
+def test_take_and_refill() -> None:
+    """Test that the topics are served at once and refilled in the background."""
+    seeds = ["Food", "Travel", "Weather"]
+    pool = TopicPool("Brazilian Portuguese", "beginner", seed_topics=seeds)
+    config = ChatOpenAIConfig(model=FAKE_MODEL, api_key=convert_to_secret_str_v2("f"))
+    shown: set[str] = set()
+    topics = pool.take(2, shown, chat_openai_config=config)
+    assert len(topics) == 2
+    assert set(topics) <= set(seeds)
+    shown.update(topics)
+    # the refill runs in the background
+    for _ in range(100):
+        if not pool.refilling and len(pool.topics) > len(seeds):
+            break
+        time.sleep(0.01)
+    assert len(pool.topics) > len(seeds)
+    new_topics = pool.take(4, shown)
+    assert not set(new_topics) & shown
+
+
+def test_get_topic_pool_seeds_once() -> None:
+    """Test that the seed topics are only read to create the pool."""
+    calls = []
+
+    def get_seed_topics() -> list[str]:
+        calls.append(1)
+        return ["Stored topic"]
+
+    pool = get_topic_pool("Test language", "beginner", get_seed_topics)
+    assert get_topic_pool("Test language", "beginner", get_seed_topics) is pool
+    assert len(calls) == 1
+    assert "Stored topic" in pool.topics
@@ -0,0 +1,127 @@
+"""Test the indexed lesson store."""
+
+import multiprocessing
+from pathlib import Path
+
+from convo_craft.lesson.lesson import Lesson, LessonStep, new_lesson_id
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.llm.conversation_generator import ConversationRole
+
+
+def make_lesson(level: str, topic: str) -> Lesson:
+    """Build a one step lesson."""
+    language = "Brazilian Portuguese"
+    step = LessonStep(
+        role=ConversationRole.USER,
+        content="Oi, tudo bem?",
+        translation="Hi, how are you?",
+        portions=["Oi, tudo bem?"],
+        words=[["Oi,", "tudo", "bem?"]],
+    )
+    return Lesson(
+        lesson_id=new_lesson_id(),
+        language=language,
+        understanding_level=level,
+        topic=topic,
+        steps=[step],
+    )
+
+
+def test_add_get(tmp_path: Path) -> None:
+    """Test that the lessons are stored once and read back by id."""
+    store = LessonStore(tmp_path)
+    lesson_a = make_lesson("beginner", "Greetings")
+    lesson_b = make_lesson("beginner", "Food")
+    assert store.add(lesson_a)
+    assert store.add(lesson_b)
+    assert not store.add(lesson_a)
+    assert len(store) == 2
+    assert lesson_a.lesson_id in store
+    assert store.get(lesson_b.lesson_id) == lesson_b
+    # the parsed lesson is shared by the readers
+    assert store.get(lesson_b.lesson_id) is store.get(lesson_b.lesson_id)
+    assert store.get("missing") is None
+    assert sorted(store.get_topics("Brazilian Portuguese", "beginner")) == [
+        "Food",
+        "Greetings",
+    ]
+
+
+def test_index_tail(tmp_path: Path) -> None:
+    """Test that the lessons appended by someone else are indexed on open."""
+    store = LessonStore(tmp_path)
+    store.add(make_lesson("beginner", "Greetings"))
+    lesson = make_lesson("advanced", "Politics")
+    with store.lessons_fp.open("a", encoding="utf-8") as f:
+        f.write(lesson.model_dump_json() + "\n")
+    reopened = LessonStore(tmp_path)
+    assert len(reopened) == 2
+    assert reopened.get(lesson.lesson_id) == lesson
+
+
+def test_sample_unseen(tmp_path: Path) -> None:
+    """Test that the sampled lessons are not seen by the user."""
+    store = LessonStore(tmp_path)
+    for topic in ["Greetings", "Food", "Travel"]:
+        store.add(make_lesson("beginner", topic))
+    language = "Brazilian Portuguese"
+    seen = set()
+    for _ in range(3):
+        lesson = store.sample_unseen("user", language, "beginner")
+        assert lesson is not None
+        assert lesson.lesson_id not in seen
+        seen.add(lesson.lesson_id)
+        store.mark_seen("user", lesson.lesson_id)
+    assert store.sample_unseen("user", language, "beginner") is None
+    assert store.sample_unseen("other", language, "beginner", "Food") is not None
+    assert store.sample_unseen("other", language, "advanced") is None
+
+
+def test_lessons_per_topic(tmp_path: Path) -> None:
+    """Test that several lessons about the same topic are served in turn."""
+    store = LessonStore(tmp_path)
+    lesson_a = make_lesson("beginner", "Greetings")
+    lesson_b = make_lesson("beginner", "Greetings")
+    assert store.add(lesson_a)
+    assert store.add(lesson_b)
+    assert store.get_topics("Brazilian Portuguese", "beginner") == ["Greetings"]
+    args = ("user", "Brazilian Portuguese", "beginner", "Greetings")
+    store.mark_seen("user", lesson_a.lesson_id)
+    assert store.has_unseen(*args)
+    assert store.sample_unseen(*args) == lesson_b
+    store.mark_seen("user", lesson_b.lesson_id)
+    assert not store.has_unseen(*args)
+    assert store.sample_unseen(*args) is None
+
+
+def add_lessons(store_fol: Path, worker: int, num_lessons: int) -> None:
+    """Add lessons to the store from a worker process."""
+    store = LessonStore(store_fol)
+    for i in range(num_lessons):
+        store.add(make_lesson("beginner", f"Topic {worker} {i}"))
+
+
+def test_add_across_processes(tmp_path: Path) -> None:
+    """Test that the lessons added by concurrent processes are all readable."""
+    num_workers, num_lessons = 8, 200
+    LessonStore(tmp_path)
+    ctx = multiprocessing.get_context("fork")
+    processes = [
+        ctx.Process(target=add_lessons, args=(tmp_path, worker, num_lessons))
+        for worker in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    store = LessonStore(tmp_path)
+    assert len(store) == num_workers * num_lessons
+    topics = {
+        f"Topic {worker} {i}"
+        for worker in range(num_workers)
+        for i in range(num_lessons)
+    }
+    assert set(store.get_topics("Brazilian Portuguese", "beginner")) == topics
+    for lesson in store.iter_lessons():
+        assert store.get(lesson.lesson_id) == lesson
@@ -0,0 +1,47 @@
+"""Test the lesson pregeneration against the fake backend."""
+
+from pathlib import Path
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.lesson.lesson_store import LessonStore
+from convo_craft.lesson.pregenerate import main, pregenerate
+from convo_craft.llm.fake_llm import FAKE_MODEL
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_pregenerate(tmp_path: Path) -> None:
+    """Test that the grid is generated and resumed."""
+    store = LessonStore(tmp_path)
+    config = ChatOpenAIConfig(
+        model=FAKE_MODEL, api_key=convert_to_secret_str_v2("fake")
+    )
+    kwargs = dict(
+        chat_openai_config=config,
+        topics=["Ordering food", "Asking for directions"],
+        levels=["beginner", "intermediate"],
+        languages=["Brazilian Portuguese"],
+        concurrency=3,
+        use_cache=False,
+    )
+    report = pregenerate(store, **kwargs)
+    assert report.num_done == 4
+    assert report.num_failed == 0
+    lessons = list(LessonStore(tmp_path).iter_lessons())
+    assert len(lessons) == 4
+    for lesson in lessons:
+        for step in lesson.steps:
+            assert "".join(step.portions).replace(" ", "") == step.content.replace(
+                " ", ""
+            )
+            assert len(step.words) == len(step.portions)
+    # a second run resumes from the store
+    report = pregenerate(store, **kwargs)
+    assert report.num_skipped == 4
+    assert report.num_done == 0
+
+
+def test_main_bundle(tmp_path: Path) -> None:
+    """Test the command line, in bundle mode."""
+    argv = ["--fake-llm", "--no-cache", "--bundle", "--store-fol", str(tmp_path)]
+    main(argv + ["--topics", "Ordering food", "--levels", "beginner"])
+    assert len(LessonStore(tmp_path)) == 1
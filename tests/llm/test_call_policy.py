@@ -0,0 +1,91 @@
+"""Test the hedging and the circuit breaker of the call policy."""
+
+import itertools
+import time
+
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.runnables import RunnableLambda
+import pytest
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.call_policy import CallPolicy, CircuitBreaker, CircuitOpenError
+from convo_craft.llm.rate_scheduler import use_priority
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.llm.translator import TranslatorResult
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_hedge_slow_call() -> None:
+    """Test that a slow call is raced by a duplicate, and the first one wins."""
+    counter = itertools.count()
+
+    def call() -> int:
+        num = next(counter)
+        if num == 0:
+            time.sleep(1)
+        return num
+
+    policy = CallPolicy(default_hedge_delay_s=0.05)
+    t0 = time.perf_counter()
+    result, hedged = policy.run(call)
+    assert (result, hedged) == (1, True)
+    assert time.perf_counter() - t0 < 0.5
+    # a fast call is not hedged
+    assert policy.run(lambda: 7) == (7, False)
+
+
+def test_timeout() -> None:
+    """Test that the latency is bounded by the timeout."""
+    policy = CallPolicy(default_hedge_delay_s=0.02, timeout_s=0.1)
+    with pytest.raises(TimeoutError):
+        policy.run(lambda: time.sleep(0.5))
+
+
+def test_circuit_breaker() -> None:
+    """Test that the calls fail fast once the provider keeps failing."""
+    calls = []
+
+    def failing_call() -> None:
+        calls.append(1)
+        raise ConnectionError("down")
+
+    policy = CallPolicy(
+        default_hedge_delay_s=0.01,
+        breaker=CircuitBreaker(failure_threshold=2, reset_timeout_s=0.05),
+    )
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            policy.run(failing_call)
+    num_calls = len(calls)
+    with pytest.raises(CircuitOpenError):
+        policy.run(failing_call)
+    assert len(calls) == num_calls
+    # a trial call is let through after the reset timeout
+    time.sleep(0.06)
+    assert policy.run(lambda: 1) == (1, False)
+    assert not policy.breaker.is_open
+
+
+def test_hedge_interactive_only() -> None:
+    """Test that the structured calls are hedged only in the interactive class."""
+    sllm = StructuredLLM(
+        chat_openai_config=ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-h")),
+        schema=TranslatorResult,
+        use_cache=False,
+        hedge=True,
+        coalesce=False,
+    )
+    sllm.call_policy = CallPolicy(default_hedge_delay_s=0.02)
+    model_calls = []
+
+    def slow_model(_) -> TranslatorResult:
+        model_calls.append(1)
+        time.sleep(0.1)
+        return TranslatorResult(target_text="Hi")
+
+    sllm.runnable = RunnableLambda(slow_model)
+    with use_priority("bulk"):
+        sllm.invoke(StringPromptValue(text="Oi"))
+    assert len(model_calls) == 1
+    sllm.invoke(StringPromptValue(text="Oi"))
+    assert len(model_calls) == 3
@@ -0,0 +1,23 @@
+"""Test the chat model registry."""
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.client_registry import ChatModelRegistry
+from convo_craft.llm.translator import TranslatorResult
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_shared_models() -> None:
+    """Test that equal configs share the model and the runnable."""
+    registry = ChatModelRegistry()
+    config_a = ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-a"))
+    config_a_bis = ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-a"))
+    config_b = ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-b"))
+    model_a = registry.get_model(config_a)
+    assert registry.get_model(config_a_bis) is model_a
+    assert registry.get_model(config_b) is not model_a
+    runnable_a = registry.get_structured_runnable(config_a, TranslatorResult)
+    assert registry.get_structured_runnable(config_a_bis, TranslatorResult) is (
+        runnable_a
+    )
+    # all the models share the connection pool
+    assert model_a.root_client._client is registry.http_client
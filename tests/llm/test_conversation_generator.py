@@ -0,0 +1,47 @@
+"""Test the conversation generator streaming."""
+
+from typing import Iterator
+
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableGenerator
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.conversation_generator import (
+    CONVERSATION_SAMPLE,
+    TOPIC_SAMPLE,
+    ConversationGenerator,
+    ConversationRole,
+)
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def fake_partial_stream(prompt_values: Iterator[PromptValue]) -> Iterator[dict]:
+    """Stream the partial dicts of a two turn conversation."""
+    yield {}
+    yield {"turns": [{"role": "user", "content": "Oi"}]}
+    yield {"turns": [{"role": "user", "content": "Oi, tudo bem?"}]}
+    yield {"turns": [{"role": "user", "content": "Oi, tudo bem?"}, {"role": "sys"}]}
+    yield {
+        "turns": [
+            {"role": "user", "content": "Oi, tudo bem?"},
+            {"role": "system", "content": "Tudo ótimo."},
+        ]
+    }
+
+
+def test_stream() -> None:
+    """Test that the turns are yielded only once complete."""
+    cg = ConversationGenerator(
+        chat_openai_config=ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-t")),
+        language="Brazilian Portuguese",
+        num_messages=2,
+        num_sentences=1,
+        understanding_level="intermediate",
+        topic_sample=TOPIC_SAMPLE,
+        conversation_sample=CONVERSATION_SAMPLE,
+        use_cache=False,
+    )
+    cg.structured_llm.partial_runnable = RunnableGenerator(fake_partial_stream)
+    turns = list(cg.stream("Greetings"))
+    assert [turn.content for turn in turns] == ["Oi, tudo bem?", "Tudo ótimo."]
+    assert turns[1].role == ConversationRole.SYSTEM
@@ -0,0 +1,39 @@
+"""Test that the llm stack is only loaded when first used."""
+
+import subprocess
+import sys
+
+LAZY_CHECK = """
+import sys
+import convo_craft.app.app
+from convo_craft.config.convo_craft_config import ConvoCraftConfig
+from convo_craft.meta.singleton import Singleton
+providers = ("langchain_openai", "langchain_ollama", "openai")
+loaded = [m for m in providers if m in sys.modules]
+print(*loaded, ConvoCraftConfig in Singleton._instances)
+"""
+
+
+def test_import_is_lazy() -> None:
+    """Test that importing the app loads no provider package and builds no config."""
+    proc = subprocess.run(
+        [sys.executable, "-c", LAZY_CHECK], capture_output=True, text=True, check=True
+    )
+    assert proc.stdout.split() == ["False"]
+
+
+def test_prompt_built_on_first_use() -> None:
+    """Test that the prompts are compiled once per configuration.
+
+    The static prefix is shared by the calls, and comes before the input.
+    """
+    from convo_craft.llm.translator import get_translation_prompt
+
+    prompt = get_translation_prompt("A", "B")
+    assert get_translation_prompt("A", "B") is prompt
+    assert get_translation_prompt("A", "C") is not prompt
+    first = prompt.invoke({"source_text": "Oi"})
+    second = prompt.invoke({"source_text": "Tchau"})
+    assert first.messages[0] is second.messages[0]
+    assert "from A to B" in first.messages[0].content
+    assert first.messages[-1].content == "Oi"
@@ -0,0 +1,92 @@
+"""Test the LLM cache module."""
+
+from pathlib import Path
+
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.runnables import RunnableLambda
+import pytest
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.llm_cache import LLMCache
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.llm.translator import TranslatorResult
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+@pytest.fixture
+def llm_cache(tmp_path: Path) -> LLMCache:
+    """Return a cache stored in a temporary folder."""
+    return LLMCache(tmp_path / "llm_cache.sqlite", max_entries=3)
+
+
+@pytest.fixture
+def chat_openai_config() -> ChatOpenAIConfig:
+    """Return a config with a fake API key."""
+    return ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-test"))
+
+
+def test_get_set(llm_cache: LLMCache) -> None:
+    """Test that a value can be stored and retrieved."""
+    assert llm_cache.get("key") is None
+    llm_cache.set("key", "value")
+    assert llm_cache.get("key") == "value"
+    assert len(llm_cache) == 1
+
+
+def test_build_key(chat_openai_config: ChatOpenAIConfig) -> None:
+    """Test that the key depends on the prompt, the model and the schema."""
+    prompt = StringPromptValue(text="Translate this")
+    key = LLMCache.build_key(prompt, chat_openai_config, TranslatorResult)
+    other_prompt = StringPromptValue(text="Translate that")
+    assert key != LLMCache.build_key(other_prompt, chat_openai_config, TranslatorResult)
+    other_config = chat_openai_config.model_copy(update={"temperature": 0.9})
+    assert key != LLMCache.build_key(prompt, other_config, TranslatorResult)
+    other_key = chat_openai_config.model_copy(
+        update={"api_key": convert_to_secret_str_v2("sk-other")}
+    )
+    assert key == LLMCache.build_key(prompt, other_key, TranslatorResult)
+
+
+def test_evict_size(llm_cache: LLMCache) -> None:
+    """Test that the least recently used entries are evicted."""
+    for i in range(5):
+        llm_cache.set(f"key_{i}", "value")
+    llm_cache.evict()
+    assert len(llm_cache) == 3
+    assert llm_cache.get("key_0") is None
+    assert llm_cache.get("key_4") == "value"
+
+
+def test_evict_age(tmp_path: Path) -> None:
+    """Test that the expired entries are not returned."""
+    llm_cache = LLMCache(tmp_path / "llm_cache.sqlite", max_age_s=-1)
+    llm_cache.set("key", "value")
+    assert llm_cache.get("key") is None
+    assert len(llm_cache) == 0
+
+
+def test_structured_llm_cache(
+    llm_cache: LLMCache,
+    chat_openai_config: ChatOpenAIConfig,
+) -> None:
+    """Test that a repeated call is served from the cache."""
+    calls = []
+
+    def fake_invoke(prompt_value: StringPromptValue) -> TranslatorResult:
+        calls.append(prompt_value)
+        return TranslatorResult(target_text=prompt_value.to_string().upper())
+
+    sllm = StructuredLLM(
+        chat_openai_config=chat_openai_config,
+        schema=TranslatorResult,
+        cache=llm_cache,
+    )
+    sllm.runnable = RunnableLambda(fake_invoke)
+    prompt = StringPromptValue(text="oi")
+    assert sllm.invoke(prompt) == TranslatorResult(target_text="OI")
+    assert sllm.invoke(prompt) == TranslatorResult(target_text="OI")
+    assert len(calls) == 1
+    # opting out skips the cache
+    sllm.use_cache = False
+    sllm.invoke(prompt)
+    assert len(calls) == 2
@@ -0,0 +1,90 @@
+"""Test the LLM call metrics."""
+
+from pathlib import Path
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.runnables import RunnableLambda
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.fake_llm import FAKE_MODEL
+from convo_craft.llm.llm_metrics import LLMMetrics, track_session
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.llm.translator import Translator, TranslatorResult
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_fake_call_metrics(tmp_path: Path) -> None:
+    """Test that the calls and the cache hits are recorded with their tokens."""
+    config = ChatOpenAIConfig(model=FAKE_MODEL, api_key=convert_to_secret_str_v2("f"))
+    sllm = StructuredLLM(
+        chat_openai_config=config,
+        schema=TranslatorResult,
+        component="translator",
+        use_cache=False,
+    )
+    metrics = LLMMetrics()
+    with track_session(metrics):
+        sllm.invoke(StringPromptValue(text="Oi, tudo bem?"))
+        sllm.invoke(StringPromptValue(text="Tchau!"))
+    stats = metrics.stats[("translator", FAKE_MODEL)]
+    assert stats.calls == 2
+    assert stats.cache_hits == 0
+    assert stats.prompt_tokens > 0
+    assert stats.completion_tokens > 0
+    prom = metrics.to_prometheus()
+    assert (
+        f'convo_craft_llm_calls_total{{component="translator",model="{FAKE_MODEL}"}} 2'
+        in prom
+    )
+    metrics.write(tmp_path / "metrics.json")
+    assert '"calls": 2' in (tmp_path / "metrics.json").read_text()
+    # the calls outside the session are not recorded in it
+    sllm.invoke(StringPromptValue(text="Tchau!"))
+    assert metrics.get_total().calls == 2
+
+
+def test_parse_retry() -> None:
+    """Test that an unparsable output is retried and counted."""
+    config = ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-t"))
+    sllm = StructuredLLM(chat_openai_config=config, schema=TranslatorResult)
+    sllm.use_cache = False
+    outputs = [
+        {"raw": AIMessage(content=""), "parsed": None, "parsing_error": None},
+        {
+            "raw": AIMessage(content=""),
+            "parsed": None,
+            "parsing_error": OutputParserException("bad"),
+        },
+        {
+            "raw": AIMessage(content=""),
+            "parsed": TranslatorResult(target_text="Hi"),
+            "parsing_error": None,
+        },
+    ]
+    sllm.runnable = RunnableLambda(lambda _: outputs.pop(0))
+    sllm.max_parse_retries = 2
+    metrics = LLMMetrics()
+    with track_session(metrics):
+        assert sllm.invoke(StringPromptValue(text="Oi")).target_text == "Hi"
+    assert metrics.stats[("TranslatorResult", "gpt-4o-mini")].retries == 2
+
+
+def test_cached_prefix_ratio() -> None:
+    """Test that the repeated calls of a component report their cached prefix."""
+    config = ChatOpenAIConfig(model=FAKE_MODEL, api_key=convert_to_secret_str_v2("f"))
+    translator = Translator(
+        chat_openai_config=config,
+        source_language="Brazilian Portuguese",
+        target_language="English",
+        use_cache=False,
+    )
+    metrics = LLMMetrics()
+    with track_session(metrics):
+        translator.invoke("Oi, tudo bem?")
+        translator.invoke("Tchau!")
+    stats = metrics.stats[("translator", FAKE_MODEL)]
+    assert 0 < stats.cached_tokens < stats.prompt_tokens
+    assert 0 < stats.cached_ratio < 1
+    assert metrics.get_summary()[0]["cached ratio"] == round(stats.cached_ratio, 3)
@@ -0,0 +1,115 @@
+"""Test the routing of the llm components to a local Ollama-compatible server."""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from typing import Iterator
+
+from langchain_core.prompt_values import StringPromptValue
+import pytest
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.config.model_routing import ModelRouting
+from convo_craft.llm.llm_metrics import LLMMetrics, track_session
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.llm.translator import Translator, TranslatorResult
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+class StandInOllama(BaseHTTPRequestHandler):
+    """Answer the chat requests like an Ollama server, with canned JSON."""
+
+    requests: list[dict] = []
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.requests.append(body)
+        content = json.dumps({"target_text": "Hello, how are you?"})
+        final = {
+            "model": body["model"],
+            "created_at": "2024-01-01T00:00:00Z",
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": 42,
+            "eval_count": 7,
+        }
+        chunks = [
+            {
+                "model": body["model"],
+                "created_at": "2024-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": part},
+                "done": False,
+            }
+            for part in (content[:10], content[10:])
+        ]
+        lines = [json.dumps(chunk) for chunk in chunks + [final]]
+        data = ("\n".join(lines) + "\n").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def ollama_url() -> Iterator[str]:
+    """Serve the stand-in Ollama server on a free local port."""
+    StandInOllama.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInOllama)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_config(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the routes get the default API key, and the others the default."""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-server")
+    default = ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-user"))
+    route = ChatOpenAIConfig(model="gpt-4o")
+    routing = ModelRouting(conversation_generator=route)
+    config = routing.get_config("conversation_generator", default)
+    assert config.model == "gpt-4o"
+    assert config.api_key == default.api_key
+    own_key = ModelRouting(conversation_generator=route, key_from_user=False)
+    config = own_key.get_config("conversation_generator", default)
+    assert config.api_key.get_secret_value() == "sk-server"
+    assert routing.get_config("translator", default) is default
+    local = ModelRouting.local_cheap_tasks(model="small")
+    assert local.get_config("translator", default).provider == "ollama"
+    assert local.get_config("conversation_generator", default) is default
+
+
+def test_local_translator(ollama_url: str) -> None:
+    """Test that the routed translator calls the local server."""
+    default = ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-user"))
+    routing = ModelRouting.local_cheap_tasks(model="small", base_url=ollama_url)
+    translator = Translator(
+        chat_openai_config=routing.get_config("translator", default),
+        source_language="Brazilian Portuguese",
+        target_language="English",
+        use_cache=False,
+    )
+    metrics = LLMMetrics()
+    with track_session(metrics):
+        result = translator.invoke("Oi, tudo bem?")
+    assert result.target_text == "Hello, how are you?"
+    request = StandInOllama.requests[0]
+    assert request["model"] == "small"
+    assert request["format"]["title"] == "TranslatorResult"
+    stats = metrics.stats[("translator", "small")]
+    assert (stats.prompt_tokens, stats.completion_tokens) == (42, 7)
+
+
+def test_local_stream(ollama_url: str) -> None:
+    """Test that the local model streams the partial results."""
+    config = ChatOpenAIConfig(model="small", provider="ollama", base_url=ollama_url)
+    sllm = StructuredLLM(chat_openai_config=config, schema=TranslatorResult)
+    sllm.use_cache = False
+    partials = list(sllm.stream(StringPromptValue(text="Oi")))
+    assert partials[-1] == {"target_text": "Hello, how are you?"}
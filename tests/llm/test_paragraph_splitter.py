@@ -0,0 +1,34 @@
+"""Test the paragraph split invariants."""
+
+from convo_craft.llm.conversation_generator import ConversationRole, LessonTurn
+from convo_craft.llm.paragraph_splitter import (
+    ParagraphSplitterResult,
+    portions_match_paragraph,
+)
+
+PARAGRAPH = "Oi! Você já decidiu o que vai pedir no restaurante?"
+
+
+def test_portions_match_paragraph() -> None:
+    """Test that the portions must concatenate back to the paragraph."""
+    assert portions_match_paragraph(PARAGRAPH, ["Oi!", "Você já decidiu", PARAGRAPH[19:]])
+    assert not portions_match_paragraph(PARAGRAPH, ["Oi!", "Você decidiu?"])
+    assert not portions_match_paragraph(PARAGRAPH, [PARAGRAPH, " "])
+    assert not portions_match_paragraph(PARAGRAPH, [])
+    assert ParagraphSplitterResult(portions=[PARAGRAPH]).matches(PARAGRAPH)
+
+
+def test_lesson_turn_split() -> None:
+    """Test that a lesson turn exposes only valid splits."""
+    turn = LessonTurn(
+        role=ConversationRole.USER,
+        content=PARAGRAPH,
+        translation="Hi! Have you decided what to order at the restaurant?",
+        portions=["Oi!", "Você já decidiu o que vai pedir", "no restaurante?"],
+    )
+    split_result = turn.get_split_result()
+    assert split_result is not None
+    assert split_result.portions == turn.portions
+    assert turn.to_conversation_turn().content == PARAGRAPH
+    bad_turn = turn.model_copy(update={"portions": ["Oi!", "Você já decidiu?"]})
+    assert bad_turn.get_split_result() is None
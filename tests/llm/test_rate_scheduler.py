@@ -0,0 +1,103 @@
+"""Test the rate limits and the priority classes of the LLM calls."""
+
+import threading
+import time
+
+from langchain_core.prompt_values import StringPromptValue
+import pytest
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.fake_llm import FAKE_MODEL
+from convo_craft.llm.rate_scheduler import (
+    EXPECTED_COMPLETION_TOKENS,
+    RateScheduler,
+    SchedulerQueueFullError,
+    get_rate_scheduler,
+    schedulers_to_prometheus,
+    use_priority,
+)
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.llm.translator import TranslatorResult
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_interactive_uses_reserve() -> None:
+    """Test that the background calls leave a reserve to the interactive ones."""
+    scheduler = RateScheduler(requests_per_minute=10, background_reserve=0.2)
+    for _ in range(8):
+        assert scheduler.acquire(1, priority="bulk") < 0.05
+    waiter = threading.Thread(target=scheduler.acquire, args=(1, "bulk"), daemon=True)
+    waiter.start()
+    time.sleep(0.05)
+    assert scheduler.stats["bulk"].queued == 1
+    # the interactive call jumps ahead, and uses the reserve
+    assert scheduler.acquire(1, priority="interactive") < 0.05
+    assert scheduler.stats["bulk"].queued == 1
+
+
+def test_priority_order() -> None:
+    """Test that the waiting calls are served by priority class."""
+    scheduler = RateScheduler(requests_per_minute=600, background_reserve=0)
+    for _ in range(600):
+        scheduler.acquire(1)
+    granted = []
+
+    def acquire(priority: str) -> None:
+        scheduler.acquire(1, priority=priority)
+        granted.append(priority)
+
+    threads = []
+    for priority in ("bulk", "prefetch", "interactive"):
+        threads.append(threading.Thread(target=acquire, args=(priority,)))
+        threads[-1].start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=2)
+    assert granted == ["interactive", "prefetch", "bulk"]
+    assert scheduler.stats["bulk"].wait_s > scheduler.stats["interactive"].wait_s
+
+
+def test_backpressure_and_settle() -> None:
+    """Test that a full background queue rejects, and the usage is corrected."""
+    scheduler = RateScheduler(tokens_per_minute=1000, max_background_queue=0)
+    with use_priority("prefetch"), pytest.raises(SchedulerQueueFullError):
+        scheduler.acquire(10)
+    assert scheduler.stats["prefetch"].rejected == 1
+    scheduler.acquire(500)
+    scheduler.settle(estimated_tokens=500, actual_tokens=100)
+    assert scheduler.tokens.level == pytest.approx(900, abs=1)
+
+
+def test_structured_llm_scheduled() -> None:
+    """Test that the structured calls go through the shared scheduler."""
+    config = ChatOpenAIConfig(
+        model=FAKE_MODEL,
+        api_key=convert_to_secret_str_v2("sk-rate"),
+        requests_per_minute=120,
+    )
+    assert get_rate_scheduler(ChatOpenAIConfig(api_key=None)) is None
+    scheduler = get_rate_scheduler(config)
+    assert scheduler is get_rate_scheduler(config.model_copy())
+    llm = StructuredLLM(config, TranslatorResult, use_cache=False, coalesce=False)
+    assert llm.rate_scheduler is scheduler
+    llm.invoke(StringPromptValue(text="hello"))
+    with use_priority("bulk"):
+        llm.invoke(StringPromptValue(text="hello again"))
+    assert scheduler.stats["interactive"].granted == 1
+    assert scheduler.stats["bulk"].granted == 1
+    assert 'priority="bulk"' in schedulers_to_prometheus()
+
+
+def test_structured_llm_stream_settled() -> None:
+    """Test that a streamed call corrects the tokens it was granted."""
+    config = ChatOpenAIConfig(
+        model=FAKE_MODEL,
+        api_key=convert_to_secret_str_v2("sk-stream"),
+        tokens_per_minute=6000,
+    )
+    scheduler = get_rate_scheduler(config)
+    llm = StructuredLLM(config, TranslatorResult, use_cache=False, coalesce=False)
+    partials = list(llm.stream(StringPromptValue(text="hello")))
+    assert partials
+    # the expected completion is released, only the streamed output is kept
+    assert scheduler.tokens.level > 6000 - EXPECTED_COMPLETION_TOKENS / 2
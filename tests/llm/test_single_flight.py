@@ -0,0 +1,120 @@
+"""Test the coalescing of the identical calls in flight."""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.runnables import RunnableLambda
+import pytest
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.llm_metrics import LLMMetrics, track_session
+from convo_craft.llm.single_flight import SingleFlight
+from convo_craft.llm.structured_llm import StructuredLLM
+from convo_craft.llm.translator import TranslatorResult
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_single_flight() -> None:
+    """Test that the concurrent calls share one run, and its failure."""
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def slow_call() -> int:
+        runs.append(1)
+        started.set()
+        release.wait(5)
+        return 42
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(single_flight.run, "key", slow_call)
+        started.wait(5)
+        waiters = [
+            executor.submit(single_flight.run, "key", slow_call) for _ in range(3)
+        ]
+        while single_flight.coalesced < 3:
+            time.sleep(0.01)
+        release.set()
+        assert leader.result() == (42, False)
+        assert [w.result() for w in waiters] == [(42, True)] * 3
+    assert len(runs) == 1
+    assert single_flight.in_flight == 0
+    assert single_flight.coalesced_ratio == 0.75
+    # a finished call is not shared: the next one runs again
+    assert single_flight.run("key", lambda: 7) == (7, False)
+
+    def failing_call() -> int:
+        raise ValueError("upstream failed")
+
+    with pytest.raises(ValueError):
+        single_flight.run("other", failing_call)
+
+
+def test_structured_llm_coalescing() -> None:
+    """Test that the sessions asking the same prompt at once share a model call."""
+    config = ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-t"))
+    sllm = StructuredLLM(
+        chat_openai_config=config,
+        schema=TranslatorResult,
+        component="translator",
+        use_cache=False,
+        single_flight=SingleFlight(),
+    )
+    model_calls = []
+
+    def slow_model(_) -> TranslatorResult:
+        model_calls.append(1)
+        time.sleep(0.2)
+        return TranslatorResult(target_text="Hi")
+
+    sllm.runnable = RunnableLambda(slow_model)
+    metrics = LLMMetrics()
+
+    def invoke_in_session(text: str) -> TranslatorResult:
+        with track_session(metrics):
+            return sllm.invoke(StringPromptValue(text=text))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(invoke_in_session, ["Oi"] * 8))
+    assert len(model_calls) == 1
+    assert all(result == TranslatorResult(target_text="Hi") for result in results)
+    # the callers do not share the same object
+    assert len({id(result) for result in results}) == 8
+    stats = metrics.stats[("translator", config.model)]
+    assert stats.calls == 8
+    assert stats.coalesced == 7
+    assert stats.model_calls == 1
+
+
+def test_structured_llm_coalescing_per_key() -> None:
+    """Test that the calls with different API keys do not share a model call."""
+    single_flight = SingleFlight()
+    model_calls = []
+
+    def slow_model(_) -> TranslatorResult:
+        model_calls.append(1)
+        time.sleep(0.2)
+        return TranslatorResult(target_text="Hi")
+
+    sllms = []
+    for api_key in ["sk-a", "sk-b"]:
+        sllm = StructuredLLM(
+            chat_openai_config=ChatOpenAIConfig(
+                api_key=convert_to_secret_str_v2(api_key)
+            ),
+            schema=TranslatorResult,
+            use_cache=False,
+            single_flight=single_flight,
+        )
+        sllm.runnable = RunnableLambda(slow_model)
+        sllms.append(sllm)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(
+            executor.map(
+                lambda sllm: sllm.invoke(StringPromptValue(text="Oi")), sllms * 2
+            )
+        )
+    assert len(model_calls) == 2
@@ -0,0 +1,32 @@
+"""Test the topic picker."""
+
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableLambda
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.topic_picker import TopicsPicker, TopicsPickerResult
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_bounded_prompt_and_dedup() -> None:
+    """Test that the prompt is bounded and the near-duplicates are dropped."""
+    tp = TopicsPicker(
+        chat_openai_config=ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-t")),
+        understanding_level="beginner",
+        use_cache=False,
+        old_topics_max_tokens=50,
+    )
+    prompts: list[str] = []
+
+    def fake_picker(prompt_value: PromptValue) -> TopicsPickerResult:
+        prompts.append(prompt_value.to_string())
+        return TopicsPickerResult(
+            topics=["Topic number 7 of the list", "Playing chess in the park"]
+        )
+
+    tp.structured_llm.runnable = RunnableLambda(fake_picker)
+    old_topics = [f"Topic number {i} of the list" for i in range(200)]
+    res = tp.invoke(old_topics)
+    assert res.topics == ["Playing chess in the park"]
+    assert 0 < prompts[0].count("Topic number") < 10
+    assert tp.invoke([]).topics == []
@@ -0,0 +1,58 @@
+"""Test the batch translation."""
+
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import RunnableLambda
+import pytest
+
+from convo_craft.config.chat_openai import ChatOpenAIConfig
+from convo_craft.llm.token_budget import chunk_by_token_budget
+from convo_craft.llm.translator import (
+    TranslationPair,
+    Translator,
+    TranslatorBatchResult,
+)
+from convo_craft.utils.u_pydantic import convert_to_secret_str_v2
+
+
+def test_chunk_by_token_budget() -> None:
+    """Test that the chunks respect the budget and keep the order."""
+    texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 400]
+    chunks = chunk_by_token_budget(texts, max_tokens=25)
+    assert chunks == [["a" * 40, "b" * 40], ["c" * 40], ["d" * 400]]
+    assert chunk_by_token_budget([], max_tokens=25) == []
+
+
+@pytest.fixture
+def translator() -> Translator:
+    """Return a translator with a fake batch model."""
+    translator = Translator(
+        chat_openai_config=ChatOpenAIConfig(api_key=convert_to_secret_str_v2("sk-t")),
+        source_language="Brazilian Portuguese",
+        target_language="English",
+        use_cache=False,
+        max_batch_tokens=8,
+    )
+    translator.batch_calls = []
+
+    def fake_batch(prompt_value: PromptValue) -> TranslatorBatchResult:
+        translator.batch_calls.append(prompt_value)
+        # echo back the texts in reverse order, to check the mapping
+        texts = prompt_value.to_string().split("Text ")[1:]
+        texts = [t.split(":\n", 1)[1].strip() for t in texts]
+        pairs = [TranslationPair(source_text=t, target_text=t.upper()) for t in texts]
+        return TranslatorBatchResult(translations=pairs[::-1])
+
+    translator.structured_llm_batch.runnable = RunnableLambda(fake_batch)
+    return translator
+
+
+def test_invoke_batch(translator: Translator) -> None:
+    """Test that the translations map to the source texts, across chunks."""
+    source_texts = ["Oi, tudo bem?", "Tudo ótimo.", "E você, como está?"]
+    result = translator.invoke_batch(source_texts)
+    assert [p.source_text for p in result.translations] == source_texts
+    assert [p.target_text for p in result.translations] == [
+        t.upper() for t in source_texts
+    ]
+    assert result.get_translation_map()["Tudo ótimo."] == "TUDO ÓTIMO."
+    assert len(translator.batch_calls) == 2
@@ -0,0 +1,48 @@
+"""Test the local paragraph splitter."""
+
+import pytest
+
+from convo_craft.llm.conversation_generator import CONVERSATION_SAMPLE
+from convo_craft.text.split_paragraph import LocalParagraphSplitter
+
+
+@pytest.fixture
+def local_splitter() -> LocalParagraphSplitter:
+    """Return the Portuguese paragraph splitter."""
+    splitter = LocalParagraphSplitter.for_language("Brazilian Portuguese")
+    assert splitter is not None
+    return splitter
+
+
+def test_concatenation(local_splitter: LocalParagraphSplitter) -> None:
+    """Test that the portions reproduce the paragraph exactly."""
+    for paragraph in CONVERSATION_SAMPLE.splitlines() + ["  Oi!  Tudo bem? ", ""]:
+        portions = local_splitter.invoke(paragraph)
+        assert "".join(portions) == paragraph
+
+
+def test_sentences(local_splitter: LocalParagraphSplitter) -> None:
+    """Test that the sentences are split, without single word portions."""
+    paragraph = "Gosto sim! E a pizza, qual sabor você recomenda?"
+    portions = local_splitter.invoke(paragraph)
+    assert portions == ["Gosto sim! ", "E a pizza, qual sabor você recomenda?"]
+    portions = local_splitter.invoke("Oi! Eu estou bem.")
+    assert portions == ["Oi! Eu estou bem."]
+
+
+def test_long_sentence(local_splitter: LocalParagraphSplitter) -> None:
+    """Test that only the long sentences are split on clauses."""
+    paragraph = (
+        "Eu acordei cedo hoje porque tinha uma reunião importante no escritório,"
+        " mas o ônibus atrasou e eu cheguei tarde."
+    )
+    portions = local_splitter.invoke(paragraph)
+    assert portions[0] == "Eu acordei cedo hoje "
+    assert portions[1].startswith("porque")
+    assert local_splitter.get_ambiguity(portions) == 0.0
+    assert local_splitter.get_ambiguity([" ".join(["palavra"] * 30)]) == 1.0
+
+
+def test_unknown_language() -> None:
+    """Test that there is no local splitter for unknown languages."""
+    assert LocalParagraphSplitter.for_language("Klingon") is None
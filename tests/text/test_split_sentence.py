@@ -36,3 +36,45 @@ def test_long_words(sentence_splitter_long_words: SentenceSplitter) -> None:
     sentence = "This is a sentence."
     words = sentence_splitter_long_words.invoke(sentence)
     assert words == ["This is", "a sentence."]
+
+
+def test_short_word_chain(sentence_splitter_default: SentenceSplitter) -> None:
+    """Test that a chain of short words is merged until long enough."""
+    words = sentence_splitter_default.invoke("É a o mercado")
+    assert words == ["É a o", "mercado"]
+
+
+def test_punctuation_alone(sentence_splitter_default: SentenceSplitter) -> None:
+    """Test that the punctuation alone goes with the previous word."""
+    words = sentence_splitter_default.invoke("Então , vamos lá ?")
+    assert words == ["Então ,", "vamos", "lá ?"]
+
+
+def test_batch_offsets(sentence_splitter_default: SentenceSplitter) -> None:
+    """Test that a batch keeps the offsets of the words in each sentence."""
+    sentences = ["Eu vou lá.", "", "Você já pensou  nisso?"]
+    splits = sentence_splitter_default.invoke_batch(sentences)
+    assert len(splits) == 3
+    assert list(splits.iter_words()) == [
+        sentence_splitter_default.invoke(sentence) for sentence in sentences
+    ]
+    assert splits.get_words(1) == []
+    assert splits.get_spans(2) == [(0, 4), (5, 14), (16, 22)]
+
+
+def test_other_whitespace(sentence_splitter_default: SentenceSplitter) -> None:
+    """Test that any whitespace separates the tokens, and a line break the words."""
+    sentences = ["Eu\tvou  lá", "É a\no mercado"]
+    splits = sentence_splitter_default.invoke_batch(sentences)
+    assert list(splits.iter_words()) == [["Eu\tvou", "lá"], ["É a", "o mercado"]]
+    assert splits.get_spans(0) == [(0, 6), (8, 10)]
+
+
+def test_long_min_word_len() -> None:
+    """Test that a long minimum word length merges the whole sentence quickly."""
+    sentence = " ".join(["a"] * 1000)
+    assert SentenceSplitter(min_word_len=40).invoke(sentence[:79]) == [sentence[:79]]
+    words = SentenceSplitter(min_word_len=400).invoke(sentence)
+    assert words == [sentence[:799], sentence[800:1599], sentence[1600:]]
+    with pytest.raises(ValueError):
+        SentenceSplitter(min_word_len=0)
@@ -0,0 +1,33 @@
+"""Test the MinHash topic index."""
+
+from convo_craft.text.topic_index import TopicIndex
+
+
+def test_near_duplicate() -> None:
+    """Test that the reworded topics are found as near-duplicates."""
+    index = TopicIndex()
+    assert index.add_many(["How to order food at a restaurant", "Going to the doctor"]) == 2
+    assert not index.add("how to order food at a restaurant!")
+    nearest = index.get_nearest("How to order food in a restaurant")
+    assert nearest[0][0] == "How to order food at a restaurant"
+    assert index.is_near_duplicate("How to order food in a restaurant")
+    assert not index.is_near_duplicate("Talking about the weather")
+
+
+def test_select_diverse() -> None:
+    """Test that the diverse subset skips the similar topics."""
+    index = TopicIndex()
+    index.add_many(
+        [
+            "Talking about the weather",
+            "Talking about the weather today",
+            "Talking about the weather tomorrow",
+            "Going to the doctor",
+            "Buying a train ticket",
+        ]
+    )
+    selected = index.select_diverse(3)
+    assert len(selected) == 3
+    assert "Going to the doctor" in selected
+    assert "Buying a train ticket" in selected
+    assert len(index.select_diverse(10)) == 5
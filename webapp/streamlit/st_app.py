@@ -1,16 +1,67 @@
-"""Streamlit app for the conversation crafting project."""
+"""Streamlit app for the conversation crafting project.
+
+The guessing UI is a fragment: a guess reruns only the word grid
+and the guessed sentence, not the sidebar, the topic and the past turns.
+
+The progress of each session is saved in the session store after every action,
+and the session id is kept in the URL, so a session survives a restart.
+The API key is not saved: a restored session asks for it again.
+"""
 
 from functools import partial
 from itertools import cycle
 import os
+import uuid
 
 from loguru import logger as lg
 import streamlit as st
 
+from convo_craft.api.session_store import (
+    SessionNotFoundError,
+    SessionStore,
+    get_session_store,
+)
 from convo_craft.app.app import App
+from convo_craft.lesson.lesson_store import LessonStore, get_lesson_store
 
 ss = st.session_state
 
+OPTIONS_DICT = {
+    "inactive": {
+        # gray
+        "type": "primary",
+        "disabled": True,
+    },
+    "correct": {
+        # gray
+        "type": "secondary",
+        "disabled": True,
+    },
+    "normal": {
+        # normal
+        "type": "secondary",
+        "disabled": False,
+    },
+    "wrong": {
+        # red
+        "type": "primary",
+        "disabled": False,
+    },
+}
+"""The style of the word buttons, by state."""
+
+
+@st.cache_resource
+def get_shared_lesson_store() -> LessonStore:
+    """Get the lesson store, shared by all the sessions."""
+    return get_lesson_store()
+
+
+@st.cache_resource
+def get_shared_session_store() -> SessionStore:
+    """Get the session store, shared by all the sessions."""
+    return get_session_store()
+
 
 def setup_app() -> None:
     """Set up the app."""
@@ -21,15 +72,49 @@ def setup_app() -> None:
 
     load_api_key()
 
+    show_llm_metrics()
+
 
 def init_app_state() -> None:
     """Initialize the app state."""
     if "app" not in ss:
         lg.info("Initializing app state")
-        ss.app = App()
+        ss.app = restore_app()
     lg.info("App state initialized")
 
 
+def restore_app() -> App:
+    """Restore the app of the session in the URL, or start a new one.
+
+    The restored progress is played once the API key is entered again.
+    """
+    lesson_store = get_shared_lesson_store()
+    session_id = st.query_params.get("session")
+    if session_id is not None:
+        try:
+            state, _ = get_shared_session_store().get(session_id)
+            lg.info(f"Restoring session {session_id}")
+            return App.load_state(state, lesson_store=lesson_store)
+        except (SessionNotFoundError, ValueError) as e:
+            lg.warning(f"Could not restore session {session_id}: {e!r}")
+        del st.query_params["session"]
+    return App(lesson_store=lesson_store)
+
+
+def save_app() -> None:
+    """Save the progress of the session.
+
+    A new conversation is only saved once its lesson is complete,
+    so the action never waits for the generation.
+    """
+    a = get_app()
+    if hasattr(a, "conversation") and not a.conversation.lesson_in_store:
+        return
+    if "session" not in st.query_params:
+        st.query_params["session"] = uuid.uuid4().hex
+    get_shared_session_store().save(st.query_params["session"], a.dump_state())
+
+
 def load_api_key() -> None:
     """Load the API key."""
     st.sidebar.text_input(
@@ -49,6 +134,23 @@ def load_api_key_cb() -> None:
     lg.info("Loading the API key")
     a = get_app()
     a.set_openai_api_key(ss.api_key)
+    save_app()
+
+
+def show_llm_metrics() -> None:
+    """Show the summary of the LLM calls of the session."""
+    a = get_app()
+    summary = a.llm_metrics.get_summary()
+    if not summary:
+        return
+    with st.sidebar.expander("LLM calls"):
+        total = a.llm_metrics.get_total()
+        st.write(
+            f"{total.calls} calls, {total.cache_hits} cached,"
+            f" {total.prompt_tokens + total.completion_tokens} tokens,"
+            f" {total.wall_s:.1f} s"
+        )
+        st.dataframe(summary, hide_index=True)
 
 
 def get_app() -> App:
@@ -94,14 +196,17 @@ def choose_topic_cb() -> None:
     lg.info(f"Choosing topic {topic}")
     a: App = ss.app
     a.set_topic_by_value(topic)
+    save_app()
 
 
 def setup_conversation() -> None:
     """Set up the conversation."""
     # st.write(a.conversation)
     show_done_conv()
-    show_current_turn()
-    show_options()
+    # remember which step the full page was rendered for
+    a: App = ss.app
+    ss.rendered_step = (id(a.conversation), a.conversation.conversation_step)
+    show_guessing()
     show_next_turn()
 
 
@@ -117,6 +222,21 @@ def show_done_conv() -> None:
         st.write(turn.content)
 
 
+@st.fragment
+def show_guessing() -> None:
+    """Show the current turn and the word grid.
+
+    A guess reruns only this fragment. When the guess completes the step,
+    the whole page is rerun to show the new past turn.
+    """
+    a: App = ss.app
+    ac = a.conversation
+    if ss.get("rendered_step") != (id(ac), ac.conversation_step):
+        st.rerun()
+    show_current_turn()
+    show_options()
+
+
 def show_current_turn() -> None:
     """Show the current turn."""
     a: App = ss.app
@@ -129,47 +249,25 @@ def show_current_turn() -> None:
 
 def show_options() -> None:
     """Show the options to choose from."""
-    options_dict = {
-        "inactive": {
-            # gray
-            "type": "primary",
-            "disabled": True,
-        },
-        "correct": {
-            # gray
-            "type": "secondary",
-            "disabled": True,
-        },
-        "normal": {
-            # normal
-            "type": "secondary",
-            "disabled": False,
-        },
-        "wrong": {
-            # red
-            "type": "primary",
-            "disabled": False,
-        },
-    }
-    # for key in options_dict: st.button(key, **options_dict[key])
+    # for key in OPTIONS_DICT: st.button(key, **OPTIONS_DICT[key])
     # st.subheader("Options")
     a: App = ss.app
     w = a.conversation.words
-    for si, sentence in enumerate(w.words_shuffled):
-        # only show the current sentence
-        if si != w.current_sent:
-            continue
-        cols = cycle(st.columns(6))
-        for wi, word in enumerate(sentence):
-            col = next(cols)
-            col.button(
-                word.word,
-                on_click=option_index_cb,
-                **options_dict[word.state],
-                key=f"button_options_{si}_{wi}",
-                args=(si, wi),
-            )
-        st.divider()
+    if w.done:
+        return
+    # only show the current sentence
+    si = w.current_sent
+    cols = cycle(st.columns(6))
+    for wi, word in enumerate(w.get_shuffled_words(si)):
+        col = next(cols)
+        col.button(
+            word.word,
+            on_click=option_index_cb,
+            **OPTIONS_DICT[word.state],
+            key=f"button_options_{si}_{wi}",
+            args=(si, wi),
+        )
+    st.divider()
 
 
 def option_index_cb(sentence: int, word: int) -> None:
@@ -177,6 +275,7 @@ def option_index_cb(sentence: int, word: int) -> None:
     lg.debug(f"Option index: {sentence}, {word}")
     a = get_app()
     a.receive_guess(sentence, word)
+    save_app()
 
 
 def show_next_turn() -> None:
@@ -190,7 +289,9 @@ def show_next_turn_cb() -> None:
     ac = a.conversation
     # FIXME leave the option for the user to skip the current turn
     # ! but check that we are using the correct logic
-    ac.next_conversation_step()
+    with a.track_llm_metrics():
+        ac.next_conversation_step()
+    save_app()
 
 
 def app() -> None: